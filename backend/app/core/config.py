@@ -7,7 +7,7 @@ class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
     # API Keys - Support multiple keys for rotation (up to 15 keys)
-    GEMINI_API_KEY: str
+    GEMINI_API_KEY: Optional[str] = None  # Required unless LLM_PROVIDER=fake
     GEMINI_API_KEY_2: Optional[str] = None
     GEMINI_API_KEY_3: Optional[str] = None
     GEMINI_API_KEY_4: Optional[str] = None
@@ -27,22 +27,125 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # 7 days
+    AUTH_CACHE_ENABLED: bool = True  # Cache token -> user principal (skips the users query)
+    AUTH_CACHE_TTL_SECONDS: int = 60  # Upper bound on staleness across worker processes
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    BCRYPT_ROUNDS: int = 12  # Work factor; older hashes are upgraded on the next login
+    PASSWORD_HASH_WORKERS: int = 2  # Bounded bcrypt pool (0 = hash on the request thread)
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 10.0  # Queue + hashing time before answering 503
     
     # Database
     DATABASE_URL: str = "sqlite:///./chatbot.db"
+    DB_ENGINE_PROFILE: str = "tuned"  # "tuned" (profile below, chosen from DATABASE_URL) or "default"
+    DB_POOL_SIZE: int = 10  # Pooled connections kept open
+    DB_MAX_OVERFLOW: int = 20  # Extra connections under bursts
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0  # Wait for a free connection before failing
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # Reconnect older connections (PostgreSQL)
+    DB_POOL_PRE_PING: bool = True  # Check connections before use (PostgreSQL)
+    SQLITE_WAL: bool = True  # Readers don't block the writer
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL, far fewer fsyncs than FULL
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait for the write lock instead of "database is locked"
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MB memory-mapped reads (0 disables)
     
     # CORS
     FRONTEND_URL: str = "http://localhost:3000"
     
+    # Monitoring
+    METRICS_ENABLED: bool = False  # Serve Prometheus metrics at /metrics (not public: see METRICS_TOKEN)
+    METRICS_TOKEN: str = ""  # Bearer token /metrics requires; empty = no check (internal network only)
+    PROMETHEUS_MULTIPROC_DIR: Optional[str] = None  # Shared by all workers; empty it before each start
+    
+    # Request Timing and Profiling
+    SERVER_TIMING_ENABLED: bool = True  # Per-stage durations in a Server-Timing response header
+    PROFILER_SAMPLE_RATE: float = 0.0  # Fraction of requests run under the sampling profiler (0 = off)
+    PROFILER_HEADER_ENABLED: bool = False  # Also profile requests sent with "X-Profile: 1"
+    PROFILER_SLOW_MS: float = 2000.0  # Sampled requests slower than this are saved (X-Profile ones always)
+    PROFILER_INTERVAL_MS: float = 5.0  # Stack sampling interval
+    PROFILER_DIR: str = "profiles"  # Collapsed stacks for flamegraph.pl / speedscope
+    
+    # Startup
+    PRELOAD_SERVICES: bool = False  # Build the LLM/RAG services at startup instead of on the first request
+    
+    # LLM Provider
+    LLM_PROVIDER: str = "gemini"  # "gemini" or "fake" (local, for tests and load testing)
+    GEMINI_MODEL: str = "gemini-2.0-flash"
+    GEMINI_CONTEXT_CACHE_ENABLED: bool = False  # Cache SYSTEM_PROMPT server-side (needs a cacheable model/size)
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: int = 3600  # Context cache lifetime per key
+    GEMINI_OCR_MODEL: str = "gemini-1.5-flash"
+    
+    # Fake LLM Provider (LLM_PROVIDER=fake)
+    FAKE_LLM_KEYS: int = 3
+    FAKE_LLM_LATENCY_MS: float = 800  # Median latency per call
+    FAKE_LLM_LATENCY_DISTRIBUTION: str = "lognormal"  # "fixed", "uniform" or "lognormal"
+    FAKE_LLM_LATENCY_SIGMA: float = 0.5  # Spread (uniform: ±fraction, lognormal: sigma)
+    FAKE_LLM_QUOTA_ERROR_RATE: float = 0.0
+    FAKE_LLM_SERVER_ERROR_RATE: float = 0.0
+    FAKE_LLM_STREAM_CHUNKS: int = 8
+    FAKE_LLM_SEED: int = 42
+    
     # PDF Processing - Gemini Vision OCR for scanned PDFs
     USE_VISION_OCR: bool = False  # Enable for scanned PDFs
     
     # RAG Configuration
     CHUNK_SIZE: int = 1000  # Larger chunks for better context
     CHUNK_OVERLAP: int = 200  # More overlap to preserve context
+    TEXT_SPLITTER: str = "vietnamese"  # "vietnamese" (sentence-aware) or "recursive" (same chunks as langchain)
     TOP_K_CHUNKS: int = 5  # Top 5 most relevant chunks (increased)
     SIMILARITY_THRESHOLD: float = 0.08  # Lower threshold for more results
     
+    # Retrieval Gate - skip RAG for purely emotional/conversational messages
+    RETRIEVAL_GATE_ENABLED: bool = True
+    RETRIEVAL_GATE_MIN_KEYWORDS: int = 2  # Fewer meaningful words → no search
+    RETRIEVAL_GATE_MODEL_PATH: Optional[str] = None  # Optional naive Bayes model (JSON)
+    RETRIEVAL_GATE_THRESHOLD: float = 0.5  # Classifier probability needed to retrieve
+    
+    # Prompt Context Budget (tokens)
+    CONTEXT_TOKEN_BUDGET: int = 8000  # System prompt + history + RAG chunks + message
+    CONTEXT_MAX_HISTORY_MESSAGES: int = 10  # Never send more history turns than this
+    CONTEXT_MIN_HISTORY_MESSAGES: int = 2  # Recent turns kept before RAG chunks
+    CONTEXT_MIN_CHUNK_TOKENS: int = 64  # Drop a chunk instead of truncating below this
+    CONTEXT_TOKEN_ENCODING: str = "cl100k_base"  # tiktoken encoding used for counting
+    
+    # Rolling Conversation Summary
+    SUMMARY_ENABLED: bool = True
+    SUMMARY_EVERY_N_MESSAGES: int = 6  # Re-summarize once this many older messages pile up
+    SUMMARY_RECENT_MESSAGES: int = 4  # Latest messages always sent verbatim
+    SUMMARY_MAX_TOKENS: int = 400  # Cap on summary size inside the prompt
+    SUMMARIZER: str = "gemini"  # "gemini" or "stub" (local, for tests)
+    
+    # LLM Call Resilience
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 30.0  # Deadline per chat reply (all keys/retries)
+    LLM_TITLE_TIMEOUT_SECONDS: float = 8.0  # Deadline for chat title generation
+    LLM_OCR_TIMEOUT_SECONDS: float = 60.0  # Deadline per scanned page, waiting for a slot included
+    LLM_MAX_WORKERS: int = 16  # Threads running Gemini calls
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 3  # Consecutive failures before a key is skipped
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 20.0  # Slower successful calls count as failures
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 60.0  # How long a tripped key is skipped
+    LLM_HEDGING_ENABLED: bool = False  # Fire a second call on another key past p95
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 2.0  # Never hedge earlier than this
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Latency samples needed before trusting p95
+    
+    # Admission Control (per-student rate limit + global LLM concurrency cap)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per process) or "sqlite" (shared by workers on one host)
+    RATE_LIMIT_SQLITE_PATH: str = "./rate_limits.db"  # Bucket file for the sqlite backend
+    RATE_LIMIT_BURST: int = 5  # Messages a student can send back to back
+    RATE_LIMIT_PER_MINUTE: float = 6.0  # Sustained messages per minute per student
+    RATE_LIMIT_CRISIS_BURST: int = 20  # Crisis-flagged messages use a separate, larger bucket
+    RATE_LIMIT_CRISIS_PER_MINUTE: float = 20.0
+    LLM_MAX_CONCURRENT_CALLS: int = 8  # In-flight Gemini calls across all users (0 = no cap)
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 5.0  # Wait for a free slot before answering 429
+    LLM_CRISIS_RESERVED_SLOTS: int = 2  # Slots of the cap only crisis-flagged messages may use
+    LLM_CRISIS_RESERVED_KEYS: int = 0  # Last N API keys serve only crisis-flagged messages
+    
+    # Risk Screening (local lexicon scan of every student message)
+    RISK_LEXICON_PATH: Optional[str] = None  # Extra JSON {category: [terms]} merged into the built-in lexicon
+    
+    # LLM Usage Accounting (llm_call_logs)
+    LLM_USAGE_TRACKING_ENABLED: bool = True
+    LLM_USAGE_FLUSH_EVERY: int = 20  # Buffered calls written in one batch
+    LLM_USAGE_FLUSH_SECONDS: float = 10.0  # ... or once the oldest buffered call is this old
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,14 +1,70 @@
 """Database connection and session management"""
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """Applied to every new SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+
+def create_db_engine(database_url: str = None, profile: str = None):
+    """
+    Engine for database_url with the settings.DB_ENGINE_PROFILE profile
+    
+    - SQLite file: WAL, synchronous/busy_timeout/mmap pragmas, pooled connections
+    - PostgreSQL (and others): pool size/overflow/timeout, pre-ping, recycle
+    - "default": SQLAlchemy defaults (kept for comparison in benchmarks)
+    """
+    database_url = database_url or settings.DATABASE_URL
+    profile = profile or settings.DB_ENGINE_PROFILE
+    url = make_url(database_url)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+    
+    if profile == "default":
+        return create_engine(database_url, connect_args=connect_args)
+    
+    if is_sqlite:
+        if url.database in (None, "", ":memory:"):
+            # In-memory databases live in one connection: no WAL or pool sizing
+            return create_engine(database_url, connect_args=connect_args)
+        connect_args["timeout"] = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        engine = create_engine(
+            database_url,
+            connect_args=connect_args,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS
+        )
+        event.listen(engine, "connect", _sqlite_pragmas)
+        return engine
+    
+    return create_engine(
+        database_url,
+        connect_args=connect_args,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
+
+
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+engine = create_db_engine()
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -24,3 +80,120 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Fill the denormalized session list columns from existing messages
+SESSION_LIST_BACKFILL = """
+UPDATE chat_sessions SET
+    message_count = (SELECT COUNT(*) FROM chat_messages m WHERE m.session_id = chat_sessions.id),
+    last_message_at = (SELECT MAX(m.created_at) FROM chat_messages m WHERE m.session_id = chat_sessions.id),
+    last_message_preview = (
+        SELECT substr(m.content, 1, 200) FROM chat_messages m
+        WHERE m.session_id = chat_sessions.id
+        ORDER BY m.created_at DESC, m.id DESC LIMIT 1
+    )
+"""
+
+# Rebuild the analytics rollups from chat_sessions/chat_messages (tables must be empty)
+ANALYTICS_BACKFILL = [
+    """
+    INSERT INTO student_daily_activity (day, user_id, messages)
+    SELECT date(m.created_at), s.user_id, COUNT(*)
+    FROM chat_messages m
+    JOIN chat_sessions s ON s.id = m.session_id
+    JOIN users u ON u.id = s.user_id
+    WHERE u.role = 'student'
+    GROUP BY date(m.created_at), s.user_id
+    """,
+    """
+    INSERT INTO daily_activity (day, messages, user_messages, new_sessions, active_students)
+    SELECT day, SUM(messages), SUM(user_messages), SUM(new_sessions), SUM(active_students)
+    FROM (
+        SELECT date(created_at) AS day, COUNT(*) AS messages,
+               SUM(CASE WHEN role = 'user' THEN 1 ELSE 0 END) AS user_messages,
+               0 AS new_sessions, 0 AS active_students
+        FROM chat_messages GROUP BY date(created_at)
+        UNION ALL
+        SELECT date(created_at), 0, 0, COUNT(*), 0 FROM chat_sessions GROUP BY date(created_at)
+        UNION ALL
+        SELECT day, 0, 0, 0, COUNT(*) FROM student_daily_activity GROUP BY day
+    ) activity
+    GROUP BY day
+    """,
+]
+
+# Student messages screened per batch when the risk columns are first added
+RISK_BACKFILL_BATCH = 1000
+
+
+def _backfill_risk_flags(conn):
+    """Run the risk screen over existing student messages (once, when the columns are added)"""
+    from app.utils.risk import risk_screener
+    
+    last_id, flagged = 0, 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, content FROM chat_messages WHERE role = 'user' AND id > :last_id ORDER BY id LIMIT :batch"),
+            {"last_id": last_id, "batch": RISK_BACKFILL_BATCH}
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for message_id, content in rows:
+            result = risk_screener.screen(content)
+            if result:
+                updates.append({"id": message_id, "level": result.level, "categories": ",".join(result.categories)})
+        if updates:
+            conn.execute(
+                text("UPDATE chat_messages SET risk_level = :level, risk_categories = :categories WHERE id = :id"),
+                updates
+            )
+        flagged += len(updates)
+        last_id = rows[-1][0]
+    if flagged:
+        logger.info(f"🚨 Risk screen flagged {flagged} existing messages")
+
+
+def ensure_schema():
+    """
+    Create missing tables and add columns introduced after the first release
+    
+    There is no migration tool in this project, so new nullable/defaulted
+    columns are added in place with ALTER TABLE (and missing indexes created).
+    """
+    import app.models  # noqa: F401 - register all tables on Base.metadata
+    
+    new_rollups = not inspect(engine).has_table("daily_activity")
+    Base.metadata.create_all(bind=engine)
+    
+    inspector = inspect(engine)
+    added = set()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                added.add((table.name, column.name))
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+                conn.execute(text(ddl))
+            
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+        
+        if ("chat_sessions", "message_count") in added:
+            conn.execute(text(SESSION_LIST_BACKFILL))
+        if new_rollups:
+            for statement in ANALYTICS_BACKFILL:
+                conn.execute(text(statement))
+        if ("chat_messages", "risk_level") in added:
+            _backfill_risk_flags(conn)
+    
+    from app.utils.message_search import ensure_index
+    ensure_index(engine)
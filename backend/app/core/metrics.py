@@ -0,0 +1,180 @@
+"""
+Prometheus metrics, served at GET /metrics
+
+Request latency per route, SQL statements per request, search_chunks latency
+and candidate counts, Gemini call latency and errors per key, document
+ingestion stages and cache lookups. Hot paths only touch pre-built metric
+objects; the per-request work is one pure ASGI middleware and a counter
+bumped by a SQLAlchemy event.
+
+With several worker processes (uvicorn/gunicorn --workers) set
+PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the workers (empty it
+before each start): every worker writes its samples there and /metrics sums
+them, so any worker can answer the scrape.
+
+Metrics are off by default (METRICS_ENABLED). Route names, request rates,
+LLM key and database stats are not for the public: set METRICS_TOKEN and
+configure Prometheus with the same bearer token, or leave it empty only when
+the API port is reachable from the internal network alone.
+"""
+import os
+import secrets
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+from fastapi import Header, HTTPException, Response, status
+from app.core.config import settings
+
+if settings.PROMETHEUS_MULTIPROC_DIR:
+    # Must be in the environment before prometheus_client is imported
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency (until the last body byte is sent)",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed while handling one request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+RAG_SEARCH_LATENCY = Histogram(
+    "rag_search_duration_seconds", "search_chunks_with_scores latency", buckets=REQUEST_BUCKETS
+)
+RAG_SEARCH_CANDIDATES = Histogram(
+    "rag_search_candidates", "Document chunks scored per search",
+    buckets=(0, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+)
+LLM_CALL_LATENCY = Histogram(
+    "llm_call_duration_seconds", "LLM call latency including failover, by answering key",
+    ["operation", "key"], buckets=LLM_BUCKETS
+)
+LLM_CALL_ERRORS = Counter(
+    "llm_call_errors_total", "Failed LLM attempts by key and exception type", ["key", "error"]
+)
+INGESTION_STAGE_LATENCY = Histogram(
+    "ingestion_stage_duration_seconds", "Document upload processing time per stage",
+    ["stage"], buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"]
+)
+
+
+def key_label(key_index: Optional[int]) -> str:
+    """1-based API key number as shown in logs ("none" if no key was tried)"""
+    return str(key_index + 1) if key_index is not None else "none"
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class _QueryCount:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+
+# Mutable counter shared with the threadpool running sync routes (contexts are copied, not the object)
+_request_queries: ContextVar[Optional[_QueryCount]] = ContextVar("request_queries", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    count = _request_queries.get()
+    if count is not None:
+        count.value += 1
+
+
+def instrument_engine(engine):
+    """Count SQL statements per request on this engine"""
+    from sqlalchemy import event
+    event.listen(engine, "before_cursor_execute", _count_query)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request
+
+    Routes are labelled by their path template ("/api/chat/sessions/{session_id}")
+    so label cardinality stays fixed; requests no route matched share "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[object, str] = {}  # endpoint -> path template
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            router = scope.get("router")
+            for candidate in getattr(router, "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            self._routes[endpoint] = route = route or "unmatched"
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        queries = _QueryCount()
+        token = _request_queries.set(queries)
+        state = {"status": 500, "observed": False}
+
+        def observe():
+            # Background tasks run after the body is sent and are not counted
+            state["observed"] = True
+            route = self._route(scope)
+            REQUEST_LATENCY.labels(scope["method"], route, str(state["status"])).observe(time.perf_counter() - start)
+            REQUEST_DB_QUERIES.labels(route).observe(queries.value)
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            if not state["observed"]:
+                observe()
+            _request_queries.reset(token)
+
+
+def render_metrics() -> tuple:
+    """(body, content type) of the Prometheus text exposition for all workers"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def metrics_endpoint(authorization: Optional[str] = Header(None)) -> Response:
+    """Prometheus scrape endpoint; requires "Authorization: Bearer <METRICS_TOKEN>" when the token is set"""
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        (authorization or "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,29 +1,68 @@
 """Security utilities for authentication and authorization"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.metrics import record_cache_lookup
+from app.core.timing import stage
+from app.models.models import User
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context (hashes with another work factor need an update)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Bounded pool for bcrypt: a login burst uses at most PASSWORD_HASH_WORKERS
+# cores instead of one per request thread, leaving the rest for chat traffic
+# (bcrypt releases the GIL, so threads hash in parallel)
+_hash_pool = (
+    ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    if settings.PASSWORD_HASH_WORKERS > 0 else None
+)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 
+def _run_hashing(func, *args):
+    """Run a bcrypt operation in the bounded pool and wait for it"""
+    if _hash_pool is None:
+        return func(*args)
+    future = _hash_pool.submit(func, *args)
+    try:
+        return future.result(timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        future.cancel()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins right now, please try again",
+            headers={"Retry-After": "5"},
+        )
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password; also returns a new hash when the stored one uses an
+    outdated work factor (None otherwise)
+    """
+    return _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return _run_hashing(pwd_context.hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -41,10 +80,114 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get the current authenticated user from JWT token"""
-    from app.models.models import User
+class Principal:
+    """Lightweight authenticated user (what authorization needs, no ORM state)"""
+    __slots__ = ("id", "role", "username")
+
+    def __init__(self, id: int, role: str, username: str):
+        self.id = id
+        self.role = role
+        self.username = username
+
+    def __repr__(self):
+        return f"Principal(id={self.id}, role={self.role!r}, username={self.username!r})"
+
+
+class PrincipalCache:
+    """
+    TTL cache of access token -> Principal
     
+    Entries expire after ttl_seconds (or when the token does) and are dropped
+    as soon as the user row is updated or deleted through the ORM. The cache
+    is per process, so the TTL bounds staleness across workers.
+    """
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None, enabled: bool = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.AUTH_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.AUTH_CACHE_MAX_ENTRIES
+        self.enabled = enabled if enabled is not None else settings.AUTH_CACHE_ENABLED
+        self._entries: Dict[str, Tuple[Principal, float]] = {}
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                principal = entry[0]
+            else:
+                if entry is not None:
+                    self._remove(token)
+                self.misses += 1
+                principal = None
+        record_cache_lookup("auth_principal", principal is not None)
+        return principal
+
+    def put(self, token: str, principal: Principal, token_expires_at: Optional[float] = None):
+        """Cache a principal; token_expires_at is the JWT exp as a unix timestamp"""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, time.monotonic() + token_expires_at - time.time())
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[token] = (principal, expires_at)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of a user (called on user update/delete)"""
+        with self._lock:
+            for token in self._tokens_by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token: str):
+        principal, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.id]
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones if still full"""
+        now = time.monotonic()
+        for token in [token for token, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            self._remove(token)
+        while len(self._entries) >= self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+
+# Global instance
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    # Bulk query.update()/delete() bypass these events; the TTL covers them
+    principal_cache.invalidate_user(target.id)
+
+
+@stage("auth")
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """
+    Get the current authenticated user from JWT token
+    
+    Returns a Principal (id, role, username). Valid tokens seen recently are
+    answered from principal_cache without a database round trip.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -61,15 +204,36 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
     
-    if user is None:
+    row = db.query(User.id, User.role, User.username).filter(User.id == user_id).first()
+    
+    if row is None:
         raise credentials_exception
-        
+    
+    principal = Principal(row.id, row.role, row.username)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
+
+
+def get_current_user_record(
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> User:
+    """Full User row of the authenticated user (for endpoints returning profile data)"""
+    user = db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
-def get_current_teacher(current_user = Depends(get_current_user)):
+def get_current_teacher(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Verify that the current user is a teacher"""
     if current_user.role != "teacher":
         raise HTTPException(
@@ -0,0 +1,191 @@
+"""
+Per-request stage timings and an opt-in sampling profiler
+
+Code wraps the expensive parts of a request in `with stage("llm"):` (or
+decorates a function with @stage("auth")). ServerTimingMiddleware adds up
+the stages of each request and returns them in a Server-Timing header, which
+browser devtools show next to the request:
+
+    Server-Timing: auth;dur=0.4, history;dur=2.1, search;dur=14.0, prompt;dur=1.2, llm;dur=912.5, persist;dur=3.3, total;dur=936.0
+
+Profiling (off by default): a PROFILER_SAMPLE_RATE fraction of requests, and
+requests sent with "X-Profile: 1" when PROFILER_HEADER_ENABLED, are sampled
+every PROFILER_INTERVAL_MS by a background thread. Only threads currently
+inside a stage of that request are sampled, so concurrent requests don't
+leak into its profile. Profiles of requests slower than PROFILER_SLOW_MS (and
+every header-triggered one) are written to PROFILER_DIR as collapsed stacks,
+one "stage;frame;frame... count" line per stack - the input format of
+flamegraph.pl and speedscope.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+
+
+class RequestTimings:
+    """Stage durations of one request; shared with the threadpool running its sync code"""
+
+    def __init__(self, profiling: bool = False):
+        self.stages: Dict[str, float] = {}
+        self.profiling = profiling
+        self.active_threads: Dict[int, str] = {}  # thread ident -> stage (only while profiling)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def header(self, total_seconds: float) -> bytes:
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts).encode("latin-1")
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block (or, as a decorator, a function) as one stage of the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    ident = previous = None
+    if timings.profiling:
+        ident = threading.get_ident()
+        previous = timings.active_threads.get(ident)
+        timings.active_threads[ident] = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+        if ident is not None:
+            if previous is None:
+                timings.active_threads.pop(ident, None)
+            else:
+                timings.active_threads[ident] = previous
+
+
+class SamplingProfiler:
+    """Samples the stacks of a request's threads until stopped"""
+
+    def __init__(self, timings: RequestTimings, interval: float = None):
+        self.timings = timings
+        self.interval = interval or settings.PROFILER_INTERVAL_MS / 1000
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            active = dict(self.timings.active_threads)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, stage_name in active.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[self._collapse(stage_name, frame)] += 1
+
+    @staticmethod
+    def _collapse(stage_name: str, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        stack.append(stage_name)
+        return ";".join(reversed(stack))
+
+    def dump(self, directory: str, label: str) -> Optional[str]:
+        """Write the collapsed stacks to directory; returns the file path"""
+        if not self.samples:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^\w.-]+', '_', label).strip('_')
+        path = os.path.join(directory, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{name}.folded")
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware: Server-Timing header plus opt-in sampling profiles"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _should_profile(self, scope) -> tuple:
+        """(profile this request, forced by header)"""
+        if settings.PROFILER_HEADER_ENABLED:
+            for key, value in scope["headers"]:
+                if key == PROFILE_HEADER and value == b"1":
+                    return True, True
+        rate = settings.PROFILER_SAMPLE_RATE
+        return rate > 0 and random.random() < rate, False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        profiling, forced = self._should_profile(scope)
+        timings = RequestTimings(profiling)
+        token = _current.set(timings)
+        profiler = None
+        if profiling:
+            profiler = SamplingProfiler(timings)
+            profiler.start()
+
+        response_seconds = []  # Until the response starts; background tasks run after it
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                response_seconds.append(time.perf_counter() - start)
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_ENABLED:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header(response_seconds[0])))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if profiler is not None:
+                elapsed_ms = (response_seconds[0] if response_seconds else time.perf_counter() - start) * 1000
+                # Thread join and file write: keep them off the event loop
+                await run_in_threadpool(self._finish_profile, profiler, scope, elapsed_ms, forced)
+
+    @staticmethod
+    def _finish_profile(profiler: SamplingProfiler, scope, elapsed_ms: float, forced: bool):
+        """Stop sampling and save the profile if the request was slow (or profiling was requested)"""
+        profiler.stop()
+        if forced or elapsed_ms >= settings.PROFILER_SLOW_MS:
+            path = profiler.dump(settings.PROFILER_DIR, f"{scope['method']} {scope['path']} {elapsed_ms:.0f}ms")
+            if path:
+                logger.info(f"🔥 Profile of {scope['method']} {scope['path']} ({elapsed_ms:.0f}ms) saved to {path}")
@@ -1,17 +1,42 @@
 """Main FastAPI application"""
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.core.database import Base, engine
+from app.core.database import engine, ensure_schema
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown
+    
+    Importing this module touches no database: the schema is checked here, and the
+    LLM/RAG services are built by their dependency providers on first use
+    (or here with PRELOAD_SERVICES).
+    """
+    from app.services.gemini import get_gemini_service, shutdown_gemini_service
+    
+    # Create database tables (and add new columns to existing ones)
+    ensure_schema()
+    if settings.PRELOAD_SERVICES:
+        try:
+            get_gemini_service()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not preload the LLM service: {e}")
+    yield
+    shutdown_gemini_service()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Student Chatbot API",
     description="AI-powered chatbot for student psychological support",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -21,15 +46,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "X-Message-Saved", "Server-Timing"],  # The chat page reads the first two on 429
 )
 
+# Server-Timing header and sampling profiler
+if settings.SERVER_TIMING_ENABLED or settings.PROFILER_SAMPLE_RATE > 0 or settings.PROFILER_HEADER_ENABLED:
+    from app.core.timing import ServerTimingMiddleware
+    
+    app.add_middleware(ServerTimingMiddleware)
+
+# Prometheus metrics (outermost, so CORS preflights are timed too)
+if settings.METRICS_ENABLED:
+    from app.core.metrics import MetricsMiddleware, instrument_engine, metrics_endpoint
+    
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+    if not settings.METRICS_TOKEN:
+        logger.warning("⚠️ /metrics is served without METRICS_TOKEN - keep the API port off the public internet")
+
 # Import and include routers
-from app.routers import auth_router, chat_router, teacher_router, document_router
+from app.routers import auth_router, chat_router, teacher_router, document_router, system_router
 
 app.include_router(auth_router.router)
 app.include_router(chat_router.router)
 app.include_router(teacher_router.router)
 app.include_router(document_router.router)
+app.include_router(system_router.router)
 
 
 @app.get("/")
@@ -4,7 +4,10 @@ from app.models.models import (
     ChatSession,
     ChatMessage,
     SchoolDocument,
-    DocumentChunk
+    DocumentChunk,
+    LLMCallLog,
+    DailyActivity,
+    StudentDailyActivity
 )
 
 __all__ = [
@@ -12,5 +15,8 @@ __all__ = [
     "ChatSession",
     "ChatMessage",
     "SchoolDocument",
-    "DocumentChunk"
+    "DocumentChunk",
+    "LLMCallLog",
+    "DailyActivity",
+    "StudentDailyActivity"
 ]
@@ -1,9 +1,14 @@
 """Database models for the chatbot application"""
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Float, Boolean, Index
+from sqlalchemy import func, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import List
 from app.core.database import Base
 
+LAST_MESSAGE_PREVIEW_CHARS = 200
+DEFAULT_SESSION_TITLE = "Cuộc trò chuyện mới"
+
 
 class User(Base):
     """User model for students and teachers"""
@@ -27,13 +32,35 @@ class ChatSession(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    title = Column(String, default="Cuộc trò chuyện mới")
+    title = Column(String, default=DEFAULT_SESSION_TITLE)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Rolling summary of older messages (maintained in the background)
+    summary = Column(Text)
+    summary_message_count = Column(Integer, default=0)  # Messages covered by summary
+    
+    # Denormalized for the session list (updated by chat_router._save_messages)
+    message_count = Column(Integer, default=0)
+    last_message_preview = Column(String)
+    last_message_at = Column(DateTime)
+    
     # Relationships
     user = relationship("User", back_populates="chat_sessions")
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_chat_sessions_user_updated", "user_id", "updated_at"),
+    )
+    
+    @staticmethod
+    def list_columns_after(messages: List["ChatMessage"]) -> dict:
+        """New values of the list columns once messages are added (count is incremented in SQL)"""
+        return {
+            "message_count": func.coalesce(ChatSession.message_count, 0) + len(messages),
+            "last_message_preview": messages[-1].content[:LAST_MESSAGE_PREVIEW_CHARS],
+            "last_message_at": messages[-1].created_at or datetime.utcnow(),
+        }
 
 
 class ChatMessage(Base):
@@ -45,9 +72,23 @@ class ChatMessage(Base):
     role = Column(String, nullable=False)  # "user" or "assistant"
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Local risk screen of student messages (app/utils/risk.py); NULL = not flagged
+    risk_level = Column(String, nullable=True)  # "high" or "medium"
+    risk_categories = Column(String, nullable=True)  # Comma-separated, e.g. "self_harm,suicide"
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
+    
+    __table_args__ = (
+        # Keyset pagination and history tails: WHERE session_id = ? ORDER BY created_at, id
+        Index("ix_chat_messages_session_created", "session_id", "created_at", "id"),
+        # Teacher alert feed: flagged messages newest first (only flagged rows are indexed)
+        Index(
+            "ix_chat_messages_risk", "id",
+            sqlite_where=text("risk_level IS NOT NULL"),
+            postgresql_where=text("risk_level IS NOT NULL")
+        ),
+    )
 
 
 class SchoolDocument(Base):
@@ -75,3 +116,41 @@ class DocumentChunk(Base):
     
     # Relationships
     document = relationship("SchoolDocument", back_populates="chunks")
+
+
+class LLMCallLog(Base):
+    """One LLM call - tokens, latency and retries (for key capacity planning)"""
+    __tablename__ = "llm_call_logs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    operation = Column(String, nullable=False)  # "chat", "title", "summary" or "ocr"
+    provider = Column(String)
+    key_index = Column(Integer)  # 0-based key that answered (or failed last)
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    retries = Column(Integer, default=0)  # Failed attempts on other keys
+    latency_ms = Column(Float, nullable=False)
+    used_rag = Column(Boolean, default=False)
+    success = Column(Boolean, default=True)
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class DailyActivity(Base):
+    """Per-day rollup for dashboard charts (updated as messages are saved)"""
+    __tablename__ = "daily_activity"
+    
+    day = Column(Date, primary_key=True)  # UTC
+    messages = Column(Integer, default=0, nullable=False)  # Student + assistant messages
+    user_messages = Column(Integer, default=0, nullable=False)
+    new_sessions = Column(Integer, default=0, nullable=False)
+    active_students = Column(Integer, default=0, nullable=False)
+
+
+class StudentDailyActivity(Base):
+    """Messages per student per day - its row count per day is active_students"""
+    __tablename__ = "student_daily_activity"
+    
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    messages = Column(Integer, default=0, nullable=False)
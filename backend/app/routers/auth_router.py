@@ -5,9 +5,9 @@ from app.core.database import get_db
 from app.core.config import settings
 from app.core.security import (
     get_password_hash, 
-    verify_password, 
+    verify_and_update_password,
     create_access_token,
-    get_current_user
+    get_current_user_record
 )
 from app.models.models import User
 from app.schemas import UserCreate, UserLogin, Token, UserResponse
@@ -32,13 +32,16 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
             detail="Email already registered"
         )
     
+    db.commit()  # Don't hold a pooled connection while bcrypt runs
+    hashed_password = get_password_hash(user_data.password)
+    
     # Create new user
     new_user = User(
         email=user_data.email,
         username=user_data.username,
         full_name=user_data.full_name,
         role=user_data.role,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=hashed_password
     )
     
     db.add(new_user)
@@ -63,14 +66,26 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
 def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     """Login user"""
     user = db.query(User).filter(User.username == user_credentials.username).first()
+    hashed_password = user.hashed_password if user else None
+    db.commit()  # Don't hold a pooled connection while bcrypt runs
+    
+    verified, new_hash = (
+        verify_and_update_password(user_credentials.password, hashed_password)
+        if user else (False, None)
+    )
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade the stored hash if BCRYPT_ROUNDS changed
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+    
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -86,7 +101,7 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: User = Depends(get_current_user_record)):
     """Get current user information"""
     return current_user
 
@@ -1,26 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+import base64
+import logging
+import math
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from app.core.database import get_db
-from app.core.security import get_current_user
-from app.models.models import User, ChatSession, ChatMessage
+from app.core.security import Principal, get_current_user
+from app.core.timing import stage
+from app.models.models import DEFAULT_SESSION_TITLE, ChatSession, ChatMessage
 from app.schemas import (
     ChatSessionCreate, 
     ChatSessionResponse, 
     MessageCreate, 
     MessageResponse,
+    MessagePage,
     ChatSessionListResponse
 )
-from app.services.gemini import gemini_service
+from app.core.config import settings
+from app.services import analytics
+from app.services.admission import Priority, crisis_rate_limiter, llm_slots, rate_limiter
+from app.services.resilience import LLMBusyError
+from app.services.gemini import GeminiService, get_gemini_service
+from app.services.summary import summary_service
+from app.utils.risk import risk_screener
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
 
+def _encode_cursor(message: ChatMessage) -> str:
+    """Opaque cursor pointing at a message's (created_at, id)"""
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def load_history_tail(db: Session, session_id: int, limit: int, exclude_id: int = None) -> List[Dict[str, str]]:
+    """
+    Last `limit` messages of a session, oldest first, as {"role", "content"}
+    
+    Reads newest-first with LIMIT on the (session_id, created_at, id) index,
+    so the cost doesn't grow with the length of the session.
+    """
+    if limit <= 0:
+        return []
+    query = db.query(ChatMessage.role, ChatMessage.content).filter(ChatMessage.session_id == session_id)
+    if exclude_id is not None:
+        query = query.filter(ChatMessage.id != exclude_id)
+    rows = query.order_by(
+        ChatMessage.created_at.desc(), ChatMessage.id.desc()
+    ).limit(limit).all()
+    return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+
 @router.post("/sessions", response_model=ChatSessionResponse)
 def create_chat_session(
     session_data: ChatSessionCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new chat session"""
@@ -29,6 +78,7 @@ def create_chat_session(
         title=session_data.title
     )
     db.add(new_session)
+    analytics.record_new_session(db)
     db.commit()
     db.refresh(new_session)
     return new_session
@@ -36,36 +86,40 @@ def create_chat_session(
 
 @router.get("/sessions", response_model=List[ChatSessionListResponse])
 def get_user_sessions(
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all chat sessions for current user"""
-    sessions = db.query(ChatSession).filter(
+    """Get chat sessions for current user (most recently active first)"""
+    sessions = db.query(
+        ChatSession.id,
+        ChatSession.title,
+        ChatSession.created_at,
+        ChatSession.updated_at,
+        ChatSession.message_count,
+        ChatSession.last_message_preview
+    ).filter(
         ChatSession.user_id == current_user.id
-    ).order_by(ChatSession.updated_at.desc()).all()
-    
-    result = []
-    for session in sessions:
-        messages = db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).order_by(ChatMessage.created_at.desc()).all()
-        
-        result.append({
+    ).order_by(ChatSession.updated_at.desc(), ChatSession.id.desc()).offset(offset).limit(limit).all()
+    
+    return [
+        {
             "id": session.id,
             "title": session.title,
             "created_at": session.created_at,
             "updated_at": session.updated_at,
-            "message_count": len(messages),
-            "last_message": messages[0].content if messages else None
-        })
-    
-    return result
+            "message_count": session.message_count or 0,
+            "last_message": session.last_message_preview
+        }
+        for session in sessions
+    ]
 
 
 @router.get("/sessions/{session_id}", response_model=ChatSessionResponse)
 def get_chat_session(
     session_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific chat session with all messages"""
@@ -83,14 +137,91 @@ def get_chat_session(
     return session
 
 
+@router.get("/sessions/{session_id}/messages", response_model=MessagePage)
+def get_session_messages(
+    session_id: int,
+    before: Optional[str] = None,
+    limit: int = Query(30, ge=1, le=200),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a page of messages, newest first
+    
+    Pass next_before from the previous page as `before` to load older messages.
+    """
+    session = db.query(ChatSession.id).filter(
+        ChatSession.id == session_id,
+        ChatSession.user_id == current_user.id
+    ).first()
+    
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found"
+        )
+    
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    if before:
+        created_at, message_id = _decode_cursor(before)
+        query = query.filter(or_(
+            ChatMessage.created_at < created_at,
+            and_(ChatMessage.created_at == created_at, ChatMessage.id < message_id)
+        ))
+    messages = query.order_by(
+        ChatMessage.created_at.desc(), ChatMessage.id.desc()
+    ).limit(limit + 1).all()
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    return {
+        "messages": messages,
+        "next_before": _encode_cursor(messages[-1]) if has_more else None,
+        "has_more": has_more
+    }
+
+
 @router.post("/sessions/{session_id}/messages", response_model=MessageResponse)
 def send_message(
     session_id: int,
     message_data: MessageCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    gemini_service: GeminiService = Depends(get_gemini_service)
 ):
-    """Send a message in a chat session and get AI response"""
+    """
+    Send a message in a chat session and get AI response
+    
+    Reads happen first and their transaction ends before the LLM call, so no
+    connection is held while Gemini answers. Both messages, the session
+    update and analytics are then written in one short transaction.
+    
+    Answers 429 with Retry-After when the student is over their rate limit or
+    no LLM slot frees up in time. The local risk screen tags the student's
+    message for the teacher alert feed; crisis messages are charged to a
+    larger bucket of their own and scheduled ahead of other LLM calls.
+    Flagged messages are committed before the LLM call, so the alert doesn't
+    wait for the reply or get lost without one; other messages are only
+    saved with the reply (or on a 503). X-Message-Saved on a 429 tells the
+    client whether to offer the text again.
+    """
+    risk = risk_screener.screen(message_data.content)
+    priority = Priority.CRISIS if risk.is_crisis else Priority.CHAT
+    if risk:
+        logger.warning(f"🚨 Risk screen flagged a message in session {session_id}: {risk.level} {risk.categories}")
+    if settings.RATE_LIMIT_ENABLED:
+        if risk.is_crisis:
+            retry_after = crisis_rate_limiter.acquire(f"crisis:{current_user.id}")
+        else:
+            retry_after = rate_limiter.acquire(current_user.id)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many messages, please slow down",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+    
     # Verify session belongs to user
     session = db.query(ChatSession).filter(
         ChatSession.id == session_id,
@@ -103,55 +234,138 @@ def send_message(
             detail="Chat session not found"
         )
     
-    # Save user message
+    # Reads: unsummarized history tail, summary and RAG chunks
+    message_count = session.message_count or 0
+    summarized = session.summary_message_count or 0
+    summary = session.summary
+    needs_title = _needs_title(db, session)
+    author = (current_user.id, current_user.role == "student")
+    with stage("history"):
+        history_for_ai = load_history_tail(
+            db,
+            session_id,
+            limit=min(settings.CONTEXT_MAX_HISTORY_MESSAGES, message_count - summarized)
+        )
+    with stage("search"):
+        scored_chunks, _ = gemini_service.get_relevant_context(message_data.content, db)
+    
     user_message = ChatMessage(
         session_id=session_id,
         role="user",
-        content=message_data.content
+        content=message_data.content,
+        created_at=datetime.utcnow(),
+        risk_level=risk.level,
+        risk_categories=",".join(risk.categories) or None
     )
-    db.add(user_message)
-    db.commit()
+    unsaved = [user_message]
+    if risk:
+        # Teacher alert feed: flagged messages are visible before the reply exists
+        _save_messages(db, session_id, author, unsaved)
+        unsaved = []
+    db.commit()  # End the read transaction before the LLM call
     
-    # Get chat history
-    chat_history = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.created_at.asc()).all()
-    
-    history_for_ai = [
-        {"role": msg.role, "content": msg.content} 
-        for msg in chat_history[:-1]  # Exclude the current message
-    ]
-    
-    # Generate AI response with Simple RAG (no embedding API needed!)
-    ai_response_text = gemini_service.generate_response(
-        message_data.content,
-        history_for_ai,
-        db  # Pass database session for RAG search
-    )
+    try:
+        ai_response_text = gemini_service.generate_response(
+            message_data.content,
+            history_for_ai,
+            summary=summary,
+            scored_chunks=scored_chunks,
+            priority=priority
+        )
+        title = (
+            gemini_service.generate_chat_title(message_data.content, priority=priority)
+            if needs_title else None
+        )
+    except LLMBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="AI service is busy, please retry shortly",
+            headers={
+                "Retry-After": str(llm_slots.retry_after()),
+                "X-Message-Saved": "false" if unsaved else "true"
+            }
+        )
+    except Exception as e:
+        # Compensation: keep the student's message so it isn't lost, report the failure
+        logger.error(f"❌ Reply generation failed for session {session_id}: {e}")
+        if unsaved:
+            _save_messages(db, session_id, author, unsaved)
+            db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service is temporarily unavailable"
+        )
     
-    # Save AI response
+    # Single write transaction: both messages, session metadata and analytics
     ai_message = ChatMessage(
         session_id=session_id,
         role="assistant",
-        content=ai_response_text
+        content=ai_response_text,
+        created_at=datetime.utcnow()
     )
-    db.add(ai_message)
+    with stage("persist"):
+        _save_messages(db, session_id, author, unsaved + [ai_message], title=title)
+        response = MessageResponse.model_validate(ai_message)
+        db.commit()
     
-    # Update session timestamp and title if first message
-    session.updated_at = datetime.utcnow()
-    if len(chat_history) == 1:  # First message
-        session.title = gemini_service.generate_chat_title(message_data.content)
+    # Fold older messages into the session summary after responding
+    if settings.SUMMARY_ENABLED and summary_service.needs_update(message_count + 2, summarized):
+        background_tasks.add_task(summary_service.update_session_summary, session_id)
     
-    db.commit()
-    db.refresh(ai_message)
+    return response
+
+
+def _needs_title(db: Session, session: ChatSession) -> bool:
+    """
+    True until the session's first reply is saved
     
-    return ai_message
+    Not just message_count == 0: a flagged first message is saved before the
+    LLM call, and a failed call must not leave the default title for good.
+    """
+    if not session.message_count:
+        return True
+    if session.title != DEFAULT_SESSION_TITLE:
+        return False
+    return db.query(ChatMessage.id).filter(
+        ChatMessage.session_id == session.id,
+        ChatMessage.role == "assistant"
+    ).first() is None
+
+
+def _save_messages(
+    db: Session,
+    session_id: int,
+    author: Tuple[int, bool],
+    messages: List[ChatMessage],
+    title: Optional[str] = None
+):
+    """
+    Insert messages and update session list columns and analytics (caller commits)
+    
+    author is (user_id, is_student); the session is updated with one UPDATE
+    so nothing has to be reloaded after the read transaction.
+    """
+    db.add_all(messages)
+    values = ChatSession.list_columns_after(messages)
+    values["updated_at"] = messages[-1].created_at
+    if title:
+        values["title"] = title
+    db.query(ChatSession).filter(ChatSession.id == session_id).update(values, synchronize_session=False)
+    user_id, is_student = author
+    analytics.record_messages(
+        db,
+        user_id,
+        is_student,
+        user_messages=sum(1 for message in messages if message.role == "user"),
+        assistant_messages=sum(1 for message in messages if message.role == "assistant")
+    )
+    db.flush()
 
 
 @router.delete("/sessions/{session_id}")
 def delete_chat_session(
     session_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a chat session"""
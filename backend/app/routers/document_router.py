@@ -4,10 +4,10 @@ from typing import List
 import os
 import shutil
 from app.core.database import get_db
-from app.core.security import get_current_teacher
-from app.models.models import User, SchoolDocument
+from app.core.security import Principal, get_current_teacher
+from app.models.models import SchoolDocument
 from app.schemas import DocumentUploadResponse
-from app.services.gemini import gemini_service
+from app.services.gemini import GeminiService, get_gemini_service
 
 router = APIRouter(prefix="/api/documents", tags=["Documents"])
 
@@ -18,8 +18,9 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 @router.post("/upload", response_model=DocumentUploadResponse)
 async def upload_school_document(
     file: UploadFile = File(...),
-    current_teacher: User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    current_teacher: Principal = Depends(get_current_teacher),
+    db: Session = Depends(get_db),
+    gemini_service: GeminiService = Depends(get_gemini_service)
 ):
     """Upload school PDF document (teacher only)"""
     if not file.filename.endswith('.pdf'):
@@ -51,7 +52,7 @@ async def upload_school_document(
 
 @router.get("/", response_model=List[DocumentUploadResponse])
 def get_documents(
-    current_teacher: User = Depends(get_current_teacher),
+    current_teacher: Principal = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
     """Get all uploaded documents (teacher only)"""
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.core.security import Principal, get_current_teacher
+from app.schemas.system import LLMUsageReport
+from app.services.admission import crisis_rate_limiter, llm_slots, rate_limiter
+from app.services.gemini import GeminiService, get_gemini_service
+from app.services.usage import usage_recorder
+
+router = APIRouter(prefix="/api/system", tags=["System"])
+
+
+@router.get("/stats")
+def get_service_stats(
+    current_teacher: Principal = Depends(get_current_teacher),
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
+    """Runtime counters of the chat pipeline (teacher only)"""
+    return {
+        "coalescing": gemini_service.get_coalescing_stats(),
+        "keys": gemini_service.get_key_health(),
+        "retrieval_gate": gemini_service.retrieval_gate.stats(),
+        "admission": {
+            "rate_limit": rate_limiter.stats(),
+            "crisis_rate_limit": crisis_rate_limiter.stats(),
+            "llm_slots": llm_slots.stats(),
+        },
+        "context_usage": list(gemini_service.recent_context_usage)[-10:],
+    }
+
+
+@router.get("/usage", response_model=LLMUsageReport)
+def get_llm_usage(
+    days: int = Query(7, ge=1, le=90),
+    current_teacher: Principal = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """LLM latency percentiles and tokens per day per key (teacher only)"""
+    return usage_recorder.report(db, days=days)
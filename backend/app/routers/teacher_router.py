@@ -1,20 +1,189 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from app.core.database import get_db
-from app.core.security import get_current_teacher
+from app.core.security import Principal, get_current_teacher
 from app.models.models import User, ChatSession, ChatMessage
-from app.schemas import StudentChatHistoryResponse, ChatSessionResponse
+from app.schemas import (
+    StudentChatHistoryResponse,
+    ChatSessionResponse,
+    StudentOverviewPage,
+    TeacherSessionSummary,
+    MessageSearchPage,
+    AnalyticsResponse,
+    RiskAlertPage
+)
+from app.services import analytics
+from app.utils.message_search import make_snippet, search_messages
+from app.utils.risk import risk_screener
 
 router = APIRouter(prefix="/api/teacher", tags=["Teacher Dashboard"])
 
 
-@router.get("/students", response_model=List[StudentChatHistoryResponse])
+@router.get("/overview", response_model=StudentOverviewPage)
+def get_students_overview(
+    search: Optional[str] = None,
+    active_since: Optional[datetime] = None,
+    sort: str = Query("last_activity", pattern="^(last_activity|messages|name)$"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_teacher: Principal = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """
+    Paginated students list with session/message counts and last activity (teacher only)
+    
+    One grouped query over users and chat_sessions; messages are not read.
+    """
+    session_count = func.count(ChatSession.id)
+    message_count = func.coalesce(func.sum(ChatSession.message_count), 0)
+    last_activity = func.max(func.coalesce(ChatSession.last_message_at, ChatSession.updated_at))
+    
+    query = db.query(
+        User.id,
+        User.username,
+        User.full_name,
+        User.email,
+        session_count.label("session_count"),
+        message_count.label("message_count"),
+        last_activity.label("last_activity")
+    ).outerjoin(
+        ChatSession, ChatSession.user_id == User.id
+    ).filter(User.role == "student")
+    
+    if search:
+        pattern = f"%{search.strip()}%"
+        query = query.filter(or_(
+            User.username.ilike(pattern),
+            User.full_name.ilike(pattern),
+            User.email.ilike(pattern)
+        ))
+    query = query.group_by(User.id, User.username, User.full_name, User.email)
+    if active_since:
+        query = query.having(last_activity >= active_since)
+    
+    total = query.count()
+    if sort == "messages":
+        order = (message_count.desc(), User.id)
+    elif sort == "name":
+        order = (func.coalesce(User.full_name, User.username), User.id)
+    else:
+        order = (last_activity.desc().nulls_last(), User.id)
+    rows = query.order_by(*order).offset(offset).limit(limit).all()
+    
+    return {
+        "total": total,
+        "items": [
+            {
+                "user_id": row.id,
+                "username": row.username,
+                "full_name": row.full_name,
+                "email": row.email,
+                "session_count": row.session_count,
+                "message_count": row.message_count,
+                "last_activity": row.last_activity
+            }
+            for row in rows
+        ]
+    }
+
+
+@router.get("/search", response_model=MessageSearchPage)
+def search_conversations(
+    q: str = Query(..., min_length=2, max_length=200),
+    role: Optional[str] = Query(None, pattern="^(user|assistant)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_teacher: Principal = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over all conversations, diacritics ignored (teacher only)"""
+    total, rows = search_messages(db, q, role=role, limit=limit, offset=offset)
+    items = []
+    for row in rows:
+        snippet, highlights = make_snippet(row["content"], q)
+        items.append({**row, "snippet": snippet, "highlights": highlights})
+    return {"total": total, "items": items}
+
+
+@router.get("/alerts", response_model=RiskAlertPage)
+def get_risk_alerts(
+    level: Optional[str] = Query(None, pattern="^(high|medium)$"),
+    before: Optional[int] = Query(None, description="next_before of the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    current_teacher: Principal = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Student messages flagged by the risk screen, newest first (teacher only)"""
+    query = db.query(
+        ChatMessage.id,
+        ChatMessage.session_id,
+        ChatMessage.content,
+        ChatMessage.risk_level,
+        ChatMessage.risk_categories,
+        ChatMessage.created_at,
+        ChatSession.title,
+        User.id.label("user_id"),
+        User.username,
+        User.full_name
+    ).join(
+        ChatSession, ChatSession.id == ChatMessage.session_id
+    ).join(
+        User, User.id == ChatSession.user_id
+    ).filter(ChatMessage.risk_level.isnot(None))
+    if level:
+        query = query.filter(ChatMessage.risk_level == level)
+    if before is not None:
+        query = query.filter(ChatMessage.id < before)
+    rows = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+    
+    items = [
+        {
+            "message_id": row.id,
+            "session_id": row.session_id,
+            "session_title": row.title,
+            "user_id": row.user_id,
+            "username": row.username,
+            "full_name": row.full_name,
+            "content": row.content,
+            "risk_level": row.risk_level,
+            "categories": row.risk_categories.split(",") if row.risk_categories else [],
+            "terms": risk_screener.screen(row.content).terms,
+            "created_at": row.created_at,
+        }
+        for row in rows[:limit]
+    ]
+    return {"items": items, "next_before": items[-1]["message_id"] if len(rows) > limit else None}
+
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+def get_analytics(
+    days: int = Query(30, ge=1, le=365),
+    current_teacher: Principal = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Messages, new sessions and active students per day, from rollups only (teacher only)"""
+    return analytics.get_daily_activity(db, days=days)
+
+
+@router.post("/analytics/rebuild")
+def rebuild_analytics(
+    current_teacher: Principal = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Recompute the analytics rollups from chat history (teacher only)"""
+    analytics.rebuild_rollups(db)
+    return {"message": "Analytics rebuilt successfully"}
+
+
+@router.get("/students", response_model=List[StudentChatHistoryResponse], deprecated=True)
 def get_all_students_history(
-    current_teacher: User = Depends(get_current_teacher),
+    current_teacher: Principal = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
-    """Get chat history of all students (teacher only)"""
+    """Get chat history of all students (teacher only) - use /overview instead"""
     students = db.query(User).filter(User.role == "student").all()
     
     result = []
@@ -34,14 +203,16 @@ def get_all_students_history(
     return result
 
 
-@router.get("/students/{student_id}/sessions", response_model=List[ChatSessionResponse])
+@router.get("/students/{student_id}/sessions", response_model=List[TeacherSessionSummary])
 def get_student_sessions(
     student_id: int,
-    current_teacher: User = Depends(get_current_teacher),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_teacher: Principal = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
-    """Get all chat sessions for a specific student (teacher only)"""
-    student = db.query(User).filter(
+    """Get session summaries of a specific student, without messages (teacher only)"""
+    student = db.query(User.id).filter(
         User.id == student_id,
         User.role == "student"
     ).first()
@@ -49,17 +220,38 @@ def get_student_sessions(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    sessions = db.query(ChatSession).filter(
+    sessions = db.query(
+        ChatSession.id,
+        ChatSession.title,
+        ChatSession.created_at,
+        ChatSession.updated_at,
+        ChatSession.message_count,
+        ChatSession.last_message_preview,
+        ChatSession.last_message_at,
+        ChatSession.summary
+    ).filter(
         ChatSession.user_id == student_id
-    ).order_by(ChatSession.updated_at.desc()).all()
+    ).order_by(ChatSession.updated_at.desc(), ChatSession.id.desc()).offset(offset).limit(limit).all()
     
-    return sessions
+    return [
+        {
+            "id": session.id,
+            "title": session.title,
+            "created_at": session.created_at,
+            "updated_at": session.updated_at,
+            "message_count": session.message_count or 0,
+            "last_message": session.last_message_preview,
+            "last_message_at": session.last_message_at,
+            "summary": session.summary
+        }
+        for session in sessions
+    ]
 
 
 @router.get("/sessions/{session_id}", response_model=ChatSessionResponse)
 def get_session_details(
     session_id: int,
-    current_teacher: User = Depends(get_current_teacher),
+    current_teacher: Principal = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
     """Get details of a specific chat session (teacher only)"""
@@ -69,7 +261,3 @@ def get_session_details(
         raise HTTPException(status_code=404, detail="Session not found")
     
     return session
-
-
-
-
@@ -9,12 +9,25 @@ from app.schemas.auth import (
 from app.schemas.chat import (
     MessageCreate,
     MessageResponse,
+    MessagePage,
     ChatSessionCreate,
     ChatSessionResponse,
     ChatSessionListResponse
 )
 from app.schemas.document import DocumentUploadResponse
-from app.schemas.teacher import StudentChatHistoryResponse
+from app.schemas.teacher import (
+    StudentChatHistoryResponse,
+    StudentOverview,
+    StudentOverviewPage,
+    TeacherSessionSummary,
+    MessageSearchHit,
+    MessageSearchPage,
+    DailyActivityPoint,
+    AnalyticsResponse,
+    RiskAlert,
+    RiskAlertPage
+)
+from app.schemas.system import LatencyStats, DailyKeyUsage, LLMUsageReport
 
 __all__ = [
     # Auth
@@ -26,11 +39,25 @@ __all__ = [
     # Chat
     "MessageCreate",
     "MessageResponse",
+    "MessagePage",
     "ChatSessionCreate",
     "ChatSessionResponse",
     "ChatSessionListResponse",
     # Document
     "DocumentUploadResponse",
     # Teacher
-    "StudentChatHistoryResponse"
+    "StudentChatHistoryResponse",
+    "StudentOverview",
+    "StudentOverviewPage",
+    "TeacherSessionSummary",
+    "MessageSearchHit",
+    "MessageSearchPage",
+    "DailyActivityPoint",
+    "AnalyticsResponse",
+    "RiskAlert",
+    "RiskAlertPage",
+    # System
+    "LatencyStats",
+    "DailyKeyUsage",
+    "LLMUsageReport"
 ]
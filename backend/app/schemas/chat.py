@@ -20,6 +20,13 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+class MessagePage(BaseModel):
+    """One page of a session's messages, newest first"""
+    messages: List[MessageResponse]
+    next_before: Optional[str] = None  # Cursor for the next (older) page
+    has_more: bool = False
+
+
 class ChatSessionCreate(BaseModel):
     """Schema for creating a new chat session"""
     title: Optional[str] = "Cuộc trò chuyện mới"
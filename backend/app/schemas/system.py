@@ -0,0 +1,31 @@
+"""System / monitoring schemas"""
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, List, Dict
+
+
+class LatencyStats(BaseModel):
+    """Latency percentiles of successful LLM calls"""
+    count: int
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    p99_ms: Optional[float]
+
+
+class DailyKeyUsage(BaseModel):
+    """LLM calls and tokens of one API key on one day"""
+    day: str
+    key: Optional[int]  # 1-based key number
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    retries: int
+    errors: int
+    rag_calls: int
+
+
+class LLMUsageReport(BaseModel):
+    """Aggregated llm_call_logs for key capacity planning"""
+    since: datetime
+    latency: Dict[str, LatencyStats]  # Per operation, plus "all"
+    daily: List[DailyKeyUsage]
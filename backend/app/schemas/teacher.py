@@ -1,6 +1,7 @@
 """Teacher dashboard schemas"""
 from pydantic import BaseModel
-from typing import Optional, List
+from datetime import date, datetime
+from typing import Optional, List, Tuple, Dict
 from app.schemas.chat import ChatSessionResponse
 
 
@@ -14,3 +15,88 @@ class StudentChatHistoryResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class StudentOverview(BaseModel):
+    """Per-student activity counters for the dashboard list"""
+    user_id: int
+    username: str
+    full_name: Optional[str]
+    email: str
+    session_count: int
+    message_count: int
+    last_activity: Optional[datetime]
+
+
+class StudentOverviewPage(BaseModel):
+    """One page of the students overview"""
+    total: int
+    items: List[StudentOverview]
+
+
+class TeacherSessionSummary(BaseModel):
+    """Chat session without messages (teacher drill-down)"""
+    id: int
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    message_count: int
+    last_message: Optional[str] = None
+    last_message_at: Optional[datetime] = None
+    summary: Optional[str] = None  # Rolling summary of older messages
+
+
+class MessageSearchHit(BaseModel):
+    """A message matching a teacher search"""
+    message_id: int
+    session_id: int
+    session_title: Optional[str]
+    user_id: int
+    username: str
+    full_name: Optional[str]
+    role: str
+    created_at: datetime
+    snippet: str
+    highlights: List[Tuple[int, int]]  # (start, end) of matches within snippet
+
+
+class MessageSearchPage(BaseModel):
+    """One page of search hits, newest first"""
+    total: int
+    items: List[MessageSearchHit]
+
+
+class DailyActivityPoint(BaseModel):
+    """Dashboard chart point for one day (UTC)"""
+    day: date
+    messages: int
+    user_messages: int
+    new_sessions: int
+    active_students: int
+
+
+class AnalyticsResponse(BaseModel):
+    """Daily rollups and totals over the requested period"""
+    days: List[DailyActivityPoint]
+    totals: Dict[str, int]
+
+
+class RiskAlert(BaseModel):
+    """A student message flagged by the local risk screen"""
+    message_id: int
+    session_id: int
+    session_title: Optional[str]
+    user_id: int
+    username: str
+    full_name: Optional[str]
+    content: str
+    risk_level: str  # "high" or "medium"
+    categories: List[str]
+    terms: List[str]  # Lexicon terms found in the message
+    created_at: datetime
+
+
+class RiskAlertPage(BaseModel):
+    """Alerts newest first; pass next_before as `before` for the next page"""
+    items: List[RiskAlert]
+    next_before: Optional[int]
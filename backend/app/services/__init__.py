@@ -1,5 +1,5 @@
 """Business logic services"""
-from app.services.gemini import gemini_service
-from app.services.rag import rag_service
+from app.services.gemini import get_gemini_service
+from app.services.rag import get_rag_service
 
-__all__ = ["gemini_service", "rag_service"]
+__all__ = ["get_gemini_service", "get_rag_service"]
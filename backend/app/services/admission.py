@@ -0,0 +1,295 @@
+"""
+Admission control for chat generation
+- Per-user token buckets: a student can send RATE_LIMIT_BURST messages back
+  to back, then RATE_LIMIT_PER_MINUTE per minute; crisis-flagged messages
+  are charged to a separate, more generous bucket (the risk screen also
+  flags hyperbole, so they can't be left unlimited)
+- A global cap on concurrent LLM calls; callers wait briefly for a slot
+  instead of piling more requests onto the shared Gemini quota, and crisis
+  messages are served first from capacity reserved for them
+"""
+import heapq
+import itertools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.resilience import LatencyTracker, LLMBusyError
+
+logger = logging.getLogger(__name__)
+
+# Buckets kept in memory before full (idle) ones are dropped
+MAX_MEMORY_BUCKETS = 10000
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets in this process"""
+
+    backend = "memory"
+
+    def __init__(self, capacity: float = None, per_minute: float = None, clock=time.monotonic):
+        self.capacity = float(capacity or settings.RATE_LIMIT_BURST)
+        self.rate = (per_minute or settings.RATE_LIMIT_PER_MINUTE) / 60.0
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+
+    def acquire(self, key, cost: float = 1.0) -> float:
+        """Take cost tokens for key; returns 0 if allowed, else seconds until it would be"""
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = _refill(tokens, updated, now, self.capacity, self.rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                self.allowed += 1
+                if len(self._buckets) > MAX_MEMORY_BUCKETS:
+                    self._prune(now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            self.throttled += 1
+            return (cost - tokens) / self.rate
+
+    def _prune(self, now: float):
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if _refill(tokens, updated, now, self.capacity, self.rate) >= self.capacity:
+                del self._buckets[key]
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "burst": self.capacity,
+            "per_minute": self.rate * 60,
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+        }
+
+
+class SQLiteTokenBucketLimiter(TokenBucketLimiter):
+    """
+    Token buckets in a local SQLite file, shared by every worker process on
+    the host (uvicorn/gunicorn --workers). Counters in stats() are per process.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = None, capacity: float = None, per_minute: float = None, clock=time.time):
+        super().__init__(capacity, per_minute, clock)
+        self.path = path or settings.RATE_LIMIT_SQLITE_PATH
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key, cost: float = 1.0) -> float:
+        now = self._clock()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (str(key),)).fetchone()
+            tokens = _refill(*(row or (self.capacity, now)), now, self.capacity, self.rate)
+            allowed = tokens >= cost
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (str(key), tokens - cost if allowed else tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if allowed:
+            self.allowed += 1
+            return 0.0
+        self.throttled += 1
+        return (cost - tokens) / self.rate
+
+
+class Priority:
+    """Scheduling classes for LLM calls (lower runs first)"""
+    CRISIS = 0  # Messages flagged by the local risk screen
+    CHAT = 1  # Ordinary chat replies and titles
+    BACKGROUND = 2  # Summaries and other work nobody is waiting on
+
+    NAMES = {CRISIS: "crisis", CHAT: "chat", BACKGROUND: "background"}
+
+
+class _Waiter:
+    __slots__ = ("priority", "event", "granted", "cancelled")
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class _ClassStats:
+    def __init__(self):
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.wait_times = LatencyTracker()
+
+
+class ConcurrencyLimiter:
+    """
+    Global cap on in-flight LLM calls, with a priority queue
+
+    Callers over the cap wait up to queue_timeout seconds for a slot, then
+    get LLMBusyError. Freed slots go to the highest priority waiter (FIFO
+    within a class). reserved_for_crisis slots can only be used by crisis
+    calls, so they still start when chat traffic fills everything else.
+    max_concurrent=0 disables the cap.
+    """
+
+    def __init__(self, max_concurrent: int = None, queue_timeout: float = None, reserved_for_crisis: int = None):
+        self.max_concurrent = max_concurrent if max_concurrent is not None else settings.LLM_MAX_CONCURRENT_CALLS
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.LLM_QUEUE_TIMEOUT_SECONDS
+        reserved = reserved_for_crisis if reserved_for_crisis is not None else settings.LLM_CRISIS_RESERVED_SLOTS
+        self.reserved_for_crisis = min(reserved, max(0, self.max_concurrent - 1))
+        self._lock = threading.Lock()
+        self._queue = []  # Heap of (priority, sequence, _Waiter)
+        self._sequence = itertools.count()
+        self._classes = {priority: _ClassStats() for priority in Priority.NAMES}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _can_start(self, priority: int) -> bool:
+        if not self.max_concurrent:
+            return True
+        limit = self.max_concurrent if priority == Priority.CRISIS else self.max_concurrent - self.reserved_for_crisis
+        return self.in_flight < limit
+
+    def _head(self) -> Optional[_Waiter]:
+        while self._queue and self._queue[0][2].cancelled:
+            heapq.heappop(self._queue)
+        return self._queue[0][2] if self._queue else None
+
+    def _start(self, priority: int):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self._classes[priority].admitted += 1
+
+    def _dispatch(self):
+        """Hand free slots to waiters in priority order"""
+        while True:
+            waiter = self._head()
+            if waiter is None or not self._can_start(waiter.priority):
+                return
+            heapq.heappop(self._queue)
+            waiter.granted = True
+            self._classes[waiter.priority].waiting -= 1
+            self._start(waiter.priority)
+            waiter.event.set()
+
+    def acquire(self, priority: int = Priority.CHAT, timeout: float = None):
+        """Take a slot, waiting up to timeout (default queue_timeout) seconds"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        stats = self._classes[priority]
+        with self._lock:
+            head = self._head()
+            if self._can_start(priority) and (head is None or head.priority > priority):
+                self._start(priority)
+                return
+            waiter = _Waiter(priority)
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+            stats.queued += 1
+            stats.waiting += 1
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            if not waiter.granted:
+                waiter.cancelled = True
+                stats.waiting -= 1
+                stats.rejected += 1
+                raise LLMBusyError(f"No LLM slot free within {timeout:.0f}s")
+        stats.wait_times.record(time.monotonic() - start)
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: int = Priority.CHAT, timeout: float = None):
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def retry_after(self) -> int:
+        """Seconds a rejected caller should wait before retrying"""
+        return max(1, math.ceil(self.queue_timeout))
+
+    def stats(self) -> dict:
+        """Totals plus queue depth and wait-time percentiles per priority class"""
+        with self._lock:
+            in_flight = self.in_flight
+            classes = {}
+            for priority, name in Priority.NAMES.items():
+                stats = self._classes[priority]
+                wait_p50 = stats.wait_times.percentile(50)
+                wait_p95 = stats.wait_times.percentile(95)
+                classes[name] = {
+                    "waiting": stats.waiting,
+                    "admitted": stats.admitted,
+                    "queued": stats.queued,
+                    "rejected": stats.rejected,
+                    "queue_wait_p50_ms": round(wait_p50 * 1000, 1) if wait_p50 is not None else None,
+                    "queue_wait_p95_ms": round(wait_p95 * 1000, 1) if wait_p95 is not None else None,
+                }
+        totals = {
+            key: sum(stats[key] for stats in classes.values())
+            for key in ("waiting", "admitted", "queued", "rejected")
+        }
+        return {
+            "limit": self.max_concurrent,
+            "reserved_for_crisis": self.reserved_for_crisis,
+            "in_flight": in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            **totals,
+            "classes": classes,
+        }
+
+
+def get_rate_limiter(capacity: float = None, per_minute: float = None) -> TokenBucketLimiter:
+    """Limiter for settings.RATE_LIMIT_BACKEND ("memory" or "sqlite")"""
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteTokenBucketLimiter(capacity=capacity, per_minute=per_minute)
+    if settings.RATE_LIMIT_BACKEND != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}")
+    return TokenBucketLimiter(capacity, per_minute)
+
+
+# Global instances
+rate_limiter = get_rate_limiter()
+# Keys are prefixed so both limiters can share the sqlite bucket file
+crisis_rate_limiter = get_rate_limiter(settings.RATE_LIMIT_CRISIS_BURST, settings.RATE_LIMIT_CRISIS_PER_MINUTE)
+llm_slots = ConcurrencyLimiter()
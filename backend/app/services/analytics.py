@@ -0,0 +1,116 @@
+"""
+Analytics rollups for the teacher dashboard
+daily_activity / student_daily_activity are incremented in the same
+transaction that saves chat messages, so charts never scan chat_messages
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict
+from sqlalchemy import distinct, func, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.database import ANALYTICS_BACKFILL
+from app.models.models import DailyActivity, StudentDailyActivity
+
+
+def _insert_for(db: Session):
+    """Dialect insert() supporting ON CONFLICT DO UPDATE (None for other databases)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+def _increment(db: Session, model, keys: Dict, counts: Dict[str, int]) -> int:
+    """
+    Atomically add counts to the row identified by keys (creating it)
+    Returns the first counter's value after the update
+    """
+    insert = _insert_for(db)
+    if insert is None:
+        return _increment_portable(db, model, keys, counts)
+    first = next(iter(counts))
+    table = model.__table__
+    statement = insert(table).values(**keys, **counts).on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + value for column, value in counts.items()}
+    ).returning(table.c[first])
+    return db.execute(statement).scalar()
+
+
+def _increment_portable(db: Session, model, keys: Dict, counts: Dict[str, int]) -> int:
+    """_increment for databases without upserts: UPDATE, else INSERT (in a savepoint)"""
+    table = model.__table__
+    where = [table.c[column] == value for column, value in keys.items()]
+    update = table.update().where(*where).values(
+        {column: table.c[column] + value for column, value in counts.items()}
+    )
+    if not db.execute(update).rowcount:
+        try:
+            with db.begin_nested():
+                db.execute(table.insert().values(**keys, **counts))
+        except IntegrityError:  # Another transaction created the row first
+            db.execute(update)
+    return db.execute(select(table.c[next(iter(counts))]).where(*where)).scalar()
+
+
+def record_messages(db: Session, user_id: int, is_student: bool, user_messages: int, assistant_messages: int, day: date = None):
+    """Count messages saved in the current transaction"""
+    day = day or datetime.utcnow().date()
+    total = user_messages + assistant_messages
+    _increment(db, DailyActivity, {"day": day}, {"messages": total, "user_messages": user_messages})
+    if is_student:
+        student_total = _increment(db, StudentDailyActivity, {"day": day, "user_id": user_id}, {"messages": total})
+        if student_total == total:  # First messages of this student today
+            _increment(db, DailyActivity, {"day": day}, {"active_students": 1})
+
+
+def record_new_session(db: Session, day: date = None):
+    """Count a chat session created in the current transaction"""
+    _increment(db, DailyActivity, {"day": day or datetime.utcnow().date()}, {"new_sessions": 1})
+
+
+def get_daily_activity(db: Session, days: int = 30) -> dict:
+    """Last `days` days of rollups (missing days filled with zeros), oldest first"""
+    today = datetime.utcnow().date()
+    since = today - timedelta(days=days - 1)
+    rows = {
+        row.day: row
+        for row in db.query(DailyActivity).filter(DailyActivity.day >= since).all()
+    }
+
+    series = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        row = rows.get(day)
+        series.append({
+            "day": day,
+            "messages": row.messages if row else 0,
+            "user_messages": row.user_messages if row else 0,
+            "new_sessions": row.new_sessions if row else 0,
+            "active_students": row.active_students if row else 0,
+        })
+
+    totals = {
+        key: sum(point[key] for point in series)
+        for key in ("messages", "user_messages", "new_sessions")
+    }
+    totals["active_students"] = db.query(
+        func.count(distinct(StudentDailyActivity.user_id))
+    ).filter(StudentDailyActivity.day >= since).scalar()
+    return {"days": series, "totals": totals}
+
+
+def rebuild_rollups(db: Session):
+    """
+    Recompute the rollups from chat history (compaction job)
+    Use after deleting sessions or if the counters ever drift.
+    """
+    db.query(DailyActivity).delete(synchronize_session=False)
+    db.query(StudentDailyActivity).delete(synchronize_session=False)
+    for statement in ANALYTICS_BACKFILL:
+        db.execute(text(statement))
+    db.commit()
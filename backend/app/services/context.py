@@ -0,0 +1,213 @@
+"""
+Token-budgeted prompt context assembly
+Packs system prompt, chat history and RAG chunks into a fixed token budget
+"""
+import logging
+from typing import List, Dict, Tuple, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio for Vietnamese when tiktoken is unavailable
+FALLBACK_CHARS_PER_TOKEN = 3
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once (it may need network on first use)"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(settings.CONTEXT_TOKEN_ENCODING)
+        except Exception as e:
+            logger.warning(f"⚠️ tiktoken unavailable ({e}), using character estimate")
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens of a text (approximation of the Gemini tokenizer)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // FALLBACK_CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * FALLBACK_CHARS_PER_TOKEN]
+
+
+class ContextUsage:
+    """Token budget usage of a single request"""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.system_tokens = 0
+        self.message_tokens = 0
+        self.summary_tokens = 0
+        self.history_tokens = 0
+        self.context_tokens = 0
+        self.history_kept = 0
+        self.history_dropped = 0
+        self.chunks_kept = 0
+        self.chunks_dropped = 0
+        self.chunks_truncated = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return (
+            self.system_tokens + self.message_tokens + self.summary_tokens
+            + self.history_tokens + self.context_tokens
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "budget": self.budget,
+            "total_tokens": self.total_tokens,
+            "system_tokens": self.system_tokens,
+            "message_tokens": self.message_tokens,
+            "summary_tokens": self.summary_tokens,
+            "history_tokens": self.history_tokens,
+            "context_tokens": self.context_tokens,
+            "history_kept": self.history_kept,
+            "history_dropped": self.history_dropped,
+            "chunks_kept": self.chunks_kept,
+            "chunks_dropped": self.chunks_dropped,
+            "chunks_truncated": self.chunks_truncated,
+        }
+
+
+class ContextBuilder:
+    """
+    Select history turns and RAG chunks that fit into the token budget
+
+    Priority order:
+    1. System prompt, the current message and the session summary (always sent)
+    2. The most recent history turns (CONTEXT_MIN_HISTORY_MESSAGES)
+    3. RAG chunks by descending score (the last one may be truncated)
+    4. Older history turns, newest first, until the budget is used up
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        budget: int = None,
+        max_history: int = None,
+        min_history: int = None,
+        min_chunk_tokens: int = None
+    ):
+        self.budget = budget if budget is not None else settings.CONTEXT_TOKEN_BUDGET
+        self.max_history = max_history if max_history is not None else settings.CONTEXT_MAX_HISTORY_MESSAGES
+        self.min_history = min_history if min_history is not None else settings.CONTEXT_MIN_HISTORY_MESSAGES
+        self.min_chunk_tokens = min_chunk_tokens if min_chunk_tokens is not None else settings.CONTEXT_MIN_CHUNK_TOKENS
+        self.system_prompt = system_prompt
+        self._system_tokens = None
+
+    @property
+    def system_tokens(self) -> int:
+        """Token count of the static system prompt (computed once)"""
+        if self._system_tokens is None:
+            self._system_tokens = count_tokens(self.system_prompt)
+        return self._system_tokens
+
+    def build(
+        self,
+        message: str,
+        chat_history: Optional[List[Dict[str, str]]],
+        scored_chunks: Optional[List[Tuple[float, str]]],
+        message_overhead: int = 0,
+        summary: Optional[str] = None
+    ) -> Tuple[List[Dict[str, str]], List[str], ContextUsage]:
+        """
+        Pack history and chunks into the budget
+
+        Args:
+            message: Current user message
+            chat_history: Previous messages, oldest first
+            scored_chunks: (score, text) pairs, any order
+            message_overhead: Tokens of the prompt template wrapped around chunks
+            summary: Rolling summary of messages older than chat_history
+
+        Returns:
+            (history, chunks, usage) - history oldest first, chunks best first
+        """
+        usage = ContextUsage(self.budget)
+        usage.system_tokens = self.system_tokens
+        usage.message_tokens = count_tokens(message)
+        usage.summary_tokens = count_tokens(summary)
+        remaining = self.budget - usage.system_tokens - usage.message_tokens - usage.summary_tokens
+
+        history = list(chat_history or [])[-self.max_history:] if self.max_history > 0 else []
+        usage.history_dropped = len(chat_history or []) - len(history)
+        history_costs = [count_tokens(msg["content"]) for msg in history]
+
+        # Newest turns first
+        kept_turns = []
+        next_turn = len(history) - 1
+        while next_turn >= 0 and len(kept_turns) < self.min_history:
+            cost = history_costs[next_turn]
+            if cost > remaining:
+                break
+            kept_turns.append(next_turn)
+            remaining -= cost
+            usage.history_tokens += cost
+            next_turn -= 1
+
+        # RAG chunks by score, truncating the first one that does not fit
+        chunks = []
+        ranked = sorted(scored_chunks or [], key=lambda x: x[0], reverse=True)
+        if ranked:
+            remaining -= message_overhead
+            usage.context_tokens += message_overhead
+        for _, chunk_text in ranked:
+            cost = count_tokens(chunk_text)
+            if cost <= remaining:
+                chunks.append(chunk_text)
+                remaining -= cost
+                usage.context_tokens += cost
+                continue
+            if remaining >= self.min_chunk_tokens:
+                truncated = truncate_to_tokens(chunk_text, remaining)
+                cost = count_tokens(truncated)
+                chunks.append(truncated)
+                remaining -= cost
+                usage.context_tokens += cost
+                usage.chunks_truncated += 1
+            break
+        if ranked and not chunks:
+            # Template overhead is only paid when at least one chunk is sent
+            remaining += message_overhead
+            usage.context_tokens -= message_overhead
+        usage.chunks_kept = len(chunks)
+        usage.chunks_dropped = len(ranked) - len(chunks)
+
+        # Older turns fill what is left; history stays contiguous
+        while next_turn >= 0:
+            cost = history_costs[next_turn]
+            if cost > remaining:
+                break
+            kept_turns.append(next_turn)
+            remaining -= cost
+            usage.history_tokens += cost
+            next_turn -= 1
+
+        usage.history_kept = len(kept_turns)
+        usage.history_dropped += len(history) - len(kept_turns)
+        packed_history = history[next_turn + 1:]
+
+        return packed_history, chunks, usage
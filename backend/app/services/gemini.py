@@ -1,10 +1,30 @@
 """Gemini AI service for generating chat responses"""
-import google.generativeai as genai
 import logging
-from typing import List, Dict
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, List, Dict, Tuple, Optional
 from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.services.rag import rag_service
+from app.core.metrics import LLM_CALL_ERRORS, LLM_CALL_LATENCY, key_label
+from app.core.timing import stage
+from app.services.intent import RetrievalGate
+from app.services.context import ContextBuilder, count_tokens, truncate_to_tokens
+from app.services.llm_provider import LLMProvider, LLMResponse, get_llm_provider
+from app.services.rag import RAGService, get_rag_service
+from app.services.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    LLMBusyError,
+    LLMTimeoutError,
+    NoHealthyKeyError,
+    is_quota_error,
+    is_retryable_error
+)
+from app.services.admission import ConcurrencyLimiter, Priority, llm_slots
+from app.services.usage import UsageRecorder, usage_recorder
+from app.utils.singleflight import SingleFlight, normalize_request_key
 
 logger = logging.getLogger(__name__)
 
@@ -221,31 +241,211 @@ Từ bây giờ, trong mọi câu trả lời, hãy đóng vai **Cô Xiêm** the
 class GeminiService:
     """Service for interacting with Gemini AI"""
     
-    def __init__(self):
-        # Collect all available API keys (up to 15 keys)
-        self.api_keys = [getattr(settings, f'GEMINI_API_KEY{i}' if i > 1 else 'GEMINI_API_KEY') 
-                        for i in range(1, 16) 
-                        if getattr(settings, f'GEMINI_API_KEY{i}' if i > 1 else 'GEMINI_API_KEY', None)]
-        
-        if not self.api_keys:
-            raise ValueError("No Gemini API keys found!")
-        
+    def __init__(
+        self,
+        provider: LLMProvider = None,
+        usage: UsageRecorder = None,
+        slots: ConcurrencyLimiter = None,
+        rag: RAGService = None
+    ):
+        """
+        Args:
+            provider: LLM backend; defaults to settings.LLM_PROVIDER
+                (tests and load tests pass a FakeProvider)
+            usage: Where per-call usage is logged; defaults to the global recorder
+            slots: Global cap on in-flight calls; defaults to admission.llm_slots
+            rag: Document search; defaults to the shared RAGService
+        """
+        self.provider = provider or get_llm_provider()
+        self.usage = usage or usage_recorder
+        self.slots = slots or llm_slots
+        self.key_count = self.provider.key_count
         self.current_key_index = 0
-        self.model_name = 'gemini-2.0-flash'
-        self._init_model()
-        logger.info(f"🔑 Loaded {len(self.api_keys)} API keys, using key 1/{len(self.api_keys)}")
-        self.rag = rag_service
+        logger.info(f"🔑 Loaded {self.key_count} API keys ({self.provider.name}), using key 1/{self.key_count}")
+        self.rag = rag or get_rag_service()
+        self.context_builder = ContextBuilder(SYSTEM_PROMPT)
+        self._context_overhead_tokens = None
+        # Token budget usage of recent requests (newest last)
+        self.recent_context_usage = deque(maxlen=100)
+        # Identical concurrent requests share one search / one Gemini call
+        self.retrieval_flight = SingleFlight("retrieval_flight")
+        self.generation_flight = SingleFlight("generation_flight")
+        # Skips search_chunks for purely emotional/conversational messages
+        self.retrieval_gate = RetrievalGate.from_settings()
+        # Deadlines, per-key circuit breakers and hedging for Gemini calls
+        self.breakers = [CircuitBreaker() for _ in range(self.key_count)]
+        # Keys kept free for crisis-flagged messages (always leave one for everyone else)
+        reserved = min(settings.LLM_CRISIS_RESERVED_KEYS, self.key_count - 1)
+        self.crisis_keys = set(range(self.key_count - reserved, self.key_count)) if reserved > 0 else set()
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.LLM_MAX_WORKERS,
+            thread_name_prefix="gemini-call"
+        )
+        self.hedged_requests = 0
+        self.timed_out_requests = 0
+    
+    def _switch_to_key(self, key_index: int):
+        """Make key_index the key used by default for new calls"""
+        if key_index == self.current_key_index or key_index in self.crisis_keys:
+            return
+        self.current_key_index = key_index
+        logger.warning(f"🔄 Switched to key {key_index + 1}/{self.key_count}")
+    
+    def _pick_key(self, exclude: set, priority: int = Priority.CHAT) -> Optional[int]:
+        """
+        First key, starting at the current one, whose breaker lets a call through
+        
+        Crisis calls try the reserved crisis keys first, then the shared ones;
+        other calls never use the reserved keys.
+        """
+        shared = [
+            (self.current_key_index + offset) % self.key_count
+            for offset in range(self.key_count)
+            if (self.current_key_index + offset) % self.key_count not in self.crisis_keys
+        ]
+        candidates = sorted(self.crisis_keys) + shared if priority == Priority.CRISIS else shared
+        for key_index in candidates:
+            if key_index not in exclude and self.breakers[key_index].allow_request():
+                return key_index
+        return None
+    
+    def _run_on_key(self, key_index: int, operation: Callable, timeout: float):
+        """Run operation(key_index, timeout) on one key, feeding its breaker"""
+        start = time.monotonic()
+        try:
+            result = operation(key_index, timeout)
+        except Exception as e:
+            self.breakers[key_index].record_failure(trip=is_quota_error(e))
+            raise
+        latency = time.monotonic() - start
+        self.latency.record(latency)
+        self.breakers[key_index].record_success(latency)
+        return result
+    
+    def _submit(self, key_index: int, operation: Callable, deadline: float):
+        timeout = max(0.1, deadline - time.monotonic())
+        return self._executor.submit(self._run_on_key, key_index, operation, timeout)
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging on a second key (None = don't hedge)"""
+        if not settings.LLM_HEDGING_ENABLED or self.key_count < 2:
+            return None
+        if len(self.latency) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(settings.LLM_HEDGE_MIN_DELAY_SECONDS, self.latency.percentile(95))
     
-    def _init_model(self):
-        """Initialize model with current API key"""
-        genai.configure(api_key=self.api_keys[self.current_key_index])
-        self.model = genai.GenerativeModel(self.model_name, system_instruction=SYSTEM_PROMPT)
+    def _call_llm(
+        self,
+        contents: Any,
+        history: Optional[List[Dict]] = None,
+        timeout: float = None,
+        operation: str = "chat",
+        used_rag: bool = False,
+        priority: int = Priority.CHAT
+    ) -> LLMResponse:
+        """
+        Send contents (with chat history, if given) to a healthy key before a deadline
+        
+        - Keys whose circuit breaker is open are skipped
+        - Quota and transient errors move on to the next key
+        - If hedging is enabled and the call is slower than p95, a second call
+          is fired on another key and the first answer wins
+        - Waits for a slot under LLM_MAX_CONCURRENT_CALLS (LLMBusyError if none
+          frees up); crisis priority goes first and may use reserved slots/keys
+        
+        Every call is logged to llm_call_logs (operation, key, tokens, retries, latency)
+        """
+        def request(key_index: int, call_timeout: float) -> LLMResponse:
+            return self.provider.generate(
+                key_index,
+                contents,
+                history=history,
+                system_instruction=SYSTEM_PROMPT,
+                timeout=call_timeout
+            )
+        
+        attempt = {"key_index": None, "retries": 0}
+        start = time.monotonic()
+        try:
+            with stage("llm"), self.slots.slot(priority):
+                response = self._call_with_failover(request, timeout, attempt, priority)
+        except Exception as e:
+            elapsed = time.monotonic() - start
+            LLM_CALL_LATENCY.labels(operation, key_label(attempt["key_index"])).observe(elapsed)
+            if isinstance(e, (LLMBusyError, NoHealthyKeyError)):  # No key was called (attempts count per key)
+                LLM_CALL_ERRORS.labels("none", type(e).__name__).inc()
+            self.usage.record(
+                operation, self.provider.name, attempt["key_index"], elapsed,
+                retries=attempt["retries"], used_rag=used_rag, error=e
+            )
+            raise
+        LLM_CALL_LATENCY.labels(operation, key_label(attempt["key_index"])).observe(time.monotonic() - start)
+        self.usage.record(
+            operation, self.provider.name, attempt["key_index"], time.monotonic() - start,
+            prompt_tokens=response.prompt_tokens,
+            completion_tokens=response.completion_tokens,
+            retries=attempt["retries"],
+            used_rag=used_rag
+        )
+        return response
     
-    def _switch_to_next_key(self):
-        """Switch to next API key when quota exceeded"""
-        self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        self._init_model()
-        logger.warning(f"🔄 Switched to key {self.current_key_index + 1}/{len(self.api_keys)}")
+    def _call_with_failover(
+        self,
+        request: Callable,
+        timeout: Optional[float],
+        attempt: dict,
+        priority: int = Priority.CHAT
+    ) -> LLMResponse:
+        """Failover/hedging loop of _call_llm; fills attempt with the answering key and retries"""
+        timeout = timeout or settings.LLM_REQUEST_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout
+        tried = set()
+        last_error = None
+        
+        while True:
+            key_index = self._pick_key(tried, priority)
+            if key_index is None:
+                raise last_error or NoHealthyKeyError("All Gemini API keys are cooling down")
+            tried.add(key_index)
+            self._switch_to_key(key_index)
+            pending = {self._submit(key_index, request, deadline): key_index}
+            
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None and hedge_delay < deadline - time.monotonic():
+                done, _ = wait(pending, timeout=hedge_delay)
+                hedge_key = None if done else self._pick_key(tried, priority)
+                if hedge_key is not None:
+                    tried.add(hedge_key)
+                    self.hedged_requests += 1
+                    logger.info(f"⏱️ Key {key_index + 1} slower than {hedge_delay:.1f}s, hedging on key {hedge_key + 1}")
+                    pending[self._submit(hedge_key, request, deadline)] = hedge_key
+            
+            while pending:
+                done, _ = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    # Hung calls keep running in the pool but no longer hold the request
+                    for pending_key in pending.values():
+                        self.breakers[pending_key].record_failure()
+                        LLM_CALL_ERRORS.labels(key_label(pending_key), "LLMTimeoutError").inc()
+                    self.timed_out_requests += 1
+                    raise LLMTimeoutError(f"Gemini call exceeded {timeout:.0f}s deadline")
+                for future in done:
+                    answered_key = pending.pop(future)
+                    attempt["key_index"] = answered_key
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        last_error = e
+                        attempt["retries"] += 1
+                        LLM_CALL_ERRORS.labels(key_label(answered_key), type(e).__name__).inc()
+                        logger.warning(f"⚠️ Key {answered_key + 1} failed: {e}")
+            
+            if not is_retryable_error(last_error):
+                raise last_error
+            if time.monotonic() >= deadline:
+                self.timed_out_requests += 1
+                raise LLMTimeoutError(f"Gemini call exceeded {timeout:.0f}s deadline")
     
     def process_school_pdf(self, pdf_path: str, filename: str, db: Session):
         """Process and save school PDF document"""
@@ -273,13 +473,36 @@ Hãy trả lời tự nhiên như cô đang chia sẻ kiến thức của mình
         
         return natural_prompt
     
-    def get_relevant_context(self, query: str, db: Session) -> tuple[List[str], bool]:
+    def _integrate_summary(self, summary: str, prompt: str) -> str:
+        """Prepend the rolling summary of earlier messages to the prompt"""
+        if not summary:
+            return prompt
+        
+        return f"""[Tóm tắt những gì học sinh đã chia sẻ trước đó trong cuộc trò chuyện này:
+{summary}]
+
+{prompt}"""
+    
+    @property
+    def context_overhead_tokens(self) -> int:
+        """Tokens added by the RAG prompt template around the chunks"""
+        if self._context_overhead_tokens is None:
+            self._context_overhead_tokens = count_tokens(self._integrate_context_naturally("", [""]))
+        return self._context_overhead_tokens
+    
+    def get_relevant_context(self, query: str, db: Session) -> tuple[List[Tuple[float, str]], bool]:
         """
         Get relevant context from documents using RAG
-        Returns: (context_chunks, has_relevant_context)
+        Returns: (scored_chunks, has_relevant_context)
         """
+        if settings.RETRIEVAL_GATE_ENABLED and not self.retrieval_gate.should_retrieve(query):
+            return ([], False)
+        
         # Search with higher threshold for better quality
-        relevant_chunks = self.rag.search_chunks(query, db, top_k=3)
+        relevant_chunks = self.retrieval_flight.do(
+            normalize_request_key(query),
+            lambda: self.rag.search_chunks_with_scores(query, db, top_k=3)
+        )
         
         if relevant_chunks:
             return (relevant_chunks, True)
@@ -290,64 +513,89 @@ Hãy trả lời tự nhiên như cô đang chia sẻ kiến thức của mình
         self,
         message: str,
         chat_history: List[Dict[str, str]] = None,
-        db: Session = None
+        db: Session = None,
+        summary: Optional[str] = None,
+        scored_chunks: Optional[List[Tuple[float, str]]] = None,
+        priority: int = Priority.CHAT
     ) -> str:
         """
         Generate AI response with chat history and RAG context
         Enhanced with natural language and empathy
+        
+        chat_history holds only the messages not covered by summary.
+        scored_chunks, if given, are RAG results already fetched by the caller;
+        otherwise they are searched with db. priority orders the Gemini call
+        when the concurrency cap is full (Priority.CRISIS goes first).
+        
+        LLM errors are raised (LLMBusyError when no slot frees up in time) so
+        the caller can tell the student the reply failed instead of saving an
+        apology as the assistant's answer.
         """
-        try:
-            # Get RAG context if database provided
-            context_chunks, has_context = self.get_relevant_context(message, db) if db else ([], False)
-            
-            # Build chat history for Gemini
-            history = []
-            if chat_history:
-                for msg in chat_history[-10:]:  # Last 10 messages for context
-                    role = "user" if msg["role"] == "user" else "model"
-                    history.append({
-                        "role": role,
-                        "parts": [msg["content"]]
-                    })
-            
-            # Integrate RAG context naturally
-            if has_context:
-                enhanced_message = self._integrate_context_naturally(message, context_chunks)
-            else:
-                enhanced_message = message
-            
-            # Try with current key, auto-switch if quota exceeded
-            max_key_attempts = len(self.api_keys)
-            for key_attempt in range(max_key_attempts):
-                try:
-                    chat = self.model.start_chat(history=history)
-                    response = chat.send_message(enhanced_message)
-                    return response.text
-                except Exception as e:
-                    error_str = str(e)
-                    # Check if quota exceeded
-                    if ("429" in error_str or "ResourceExhausted" in error_str or "quota" in error_str.lower()) and key_attempt < max_key_attempts - 1:
-                        logger.warning(f"⚠️ Key {self.current_key_index + 1} quota exceeded, switching...")
-                        self._switch_to_next_key()
-                        continue
-                    raise
+        # Get RAG context if database provided
+        if scored_chunks is None:
+            scored_chunks, _ = self.get_relevant_context(message, db) if db else ([], False)
         
-        except Exception as e:
-            print(f"❌ Error generating response: {e}")
-            import traceback
-            traceback.print_exc()
-            
-            # Empathetic error message
-            return """Ối, cô xin lỗi em! Có vẻ cô đang gặp chút vấn đề kỹ thuật. 😅
-
-Em thử hỏi lại câu hỏi một lần nữa nhé? Hoặc nếu vấn đề vẫn tiếp diễn, em có thể thử:
-- Làm mới trang và thử lại
-- Liên hệ với ban quản lý kỹ thuật
-
-Cô sẽ cố gắng hỗ trợ em tốt hơn! 💪"""
+        # Pack history and chunks into the token budget
+        if summary:
+            summary = truncate_to_tokens(summary, settings.SUMMARY_MAX_TOKENS)
+        with stage("prompt"):
+            packed_history, context_chunks, usage = self.context_builder.build(
+                message,
+                chat_history,
+                scored_chunks,
+                message_overhead=self.context_overhead_tokens,
+                summary=summary
+            )
+        has_context = bool(context_chunks)
+        self.recent_context_usage.append(usage.to_dict())
+        logger.info(
+            f"📦 Context: {usage.total_tokens}/{usage.budget} tokens "
+            f"(history {usage.history_kept} kept/{usage.history_dropped} dropped, "
+            f"chunks {usage.chunks_kept} kept/{usage.chunks_dropped} dropped/{usage.chunks_truncated} truncated)"
+        )
+        
+        # Build chat history for Gemini
+        history = []
+        for msg in packed_history:
+            role = "user" if msg["role"] == "user" else "model"
+            history.append({
+                "role": role,
+                "parts": [msg["content"]]
+            })
+        
+        # Integrate RAG context naturally
+        if has_context:
+            enhanced_message = self._integrate_context_naturally(message, context_chunks)
+        else:
+            enhanced_message = message
+        enhanced_message = self._integrate_summary(summary, enhanced_message)
+        
+        if not history and not has_context and not summary:
+            # Context-free prompt: identical concurrent questions share one call
+            return self.generation_flight.do(
+                normalize_request_key(message),
+                lambda: self._send_chat(history, enhanced_message, priority=priority)
+            )
+        return self._send_chat(history, enhanced_message, used_rag=has_context, priority=priority)
+    
+    def _send_chat(
+        self,
+        history: List[Dict],
+        enhanced_message: str,
+        used_rag: bool = False,
+        priority: int = Priority.CHAT
+    ) -> str:
+        """Send one chat turn under the deadline, switching keys on failure"""
+        return self._call_llm(enhanced_message, history=history, used_rag=used_rag, priority=priority).text
     
-    def generate_chat_title(self, first_message: str) -> str:
+    def generate_chat_title(self, first_message: str, priority: int = Priority.CHAT) -> str:
         """Generate a friendly title for chat session"""
+        return self.generation_flight.do(
+            "title:" + normalize_request_key(first_message),
+            lambda: self._generate_chat_title(first_message, priority)
+        )
+    
+    def _generate_chat_title(self, first_message: str, priority: int = Priority.CHAT) -> str:
         prompt = f"""Tạo tiêu đề ngắn gọn (3-6 từ) cho cuộc tư vấn tâm lý này:
 "{first_message}"
 
@@ -358,19 +606,92 @@ Tiêu đề nên:
 
 Chỉ trả về tiêu đề, không giải thích."""
         
-        max_key_attempts = len(self.api_keys)
-        for key_attempt in range(max_key_attempts):
-            try:
-                response = self.model.generate_content(prompt)
-                title = response.text.strip().strip('"').strip("'")
-                return title if len(title) <= 50 else title[:47] + "..."
-            except Exception as e:
-                error_str = str(e)
-                if ("429" in error_str or "ResourceExhausted" in error_str or "quota" in error_str.lower()) and key_attempt < max_key_attempts - 1:
-                    self._switch_to_next_key()
-                    continue
+        try:
+            response = self._call_llm(
+                prompt,
+                timeout=settings.LLM_TITLE_TIMEOUT_SECONDS,
+                operation="title",
+                priority=priority
+            )
+            title = response.text.strip().strip('"').strip("'")
+            return title if len(title) <= 50 else title[:47] + "..."
+        except Exception as e:
+            logger.warning(f"⚠️ Could not generate chat title: {e}")
         return "Cuộc trò chuyện mới"
-
-
-# Global instance
-gemini_service = GeminiService()
+    
+    def get_coalescing_stats(self) -> dict:
+        """Counters of coalesced (shared) vs executed requests"""
+        return {
+            "retrieval": self.retrieval_flight.stats(),
+            "generation": self.generation_flight.stats(),
+        }
+    
+    def get_key_health(self) -> dict:
+        """Circuit breaker state per key and call latency percentiles"""
+        return {
+            "current_key": self.current_key_index + 1,
+            "keys": [breaker.to_dict() for breaker in self.breakers],
+            "crisis_keys": [key_index + 1 for key_index in sorted(self.crisis_keys)],
+            "latency_p50": self.latency.percentile(50),
+            "latency_p95": self.latency.percentile(95),
+            "hedged_requests": self.hedged_requests,
+            "timed_out_requests": self.timed_out_requests,
+        }
+    
+    def summarize_conversation(self, previous_summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """Fold new messages into the running summary of a chat session"""
+        transcript = "\n".join(
+            f"{'Học sinh' if msg['role'] == 'user' else 'Cô'}: {msg['content']}"
+            for msg in messages
+        )
+        prompt = f"""Cập nhật bản tóm tắt cuộc tư vấn dưới đây (tối đa 150 từ, tiếng Việt).
+
+Tóm tắt hiện có:
+{previous_summary or "(chưa có)"}
+
+Các tin nhắn mới:
+{transcript}
+
+Bản tóm tắt nên:
+- Giữ lại thông tin cá nhân học sinh đã chia sẻ (tên, lớp, hoàn cảnh)
+- Ghi rõ cảm xúc, vấn đề chính và những gì cô đã gợi ý
+- Đặc biệt giữ lại mọi dấu hiệu nguy cơ (tự hại, bạo hành, bắt nạt)
+
+Chỉ trả về bản tóm tắt, không giải thích."""
+        
+        return self._call_llm(prompt, operation="summary", priority=Priority.BACKGROUND).text.strip()
+    
+    def close(self):
+        """Stop the call pool and write buffered usage rows (app shutdown)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.usage.flush()
+
+
+# Global instance, built on first use
+_gemini_service: Optional[GeminiService] = None
+_gemini_service_lock = threading.Lock()
+
+
+def get_gemini_service() -> GeminiService:
+    """
+    Shared GeminiService, used as a FastAPI dependency
+
+    Built by the first request that needs it (or at startup with
+    PRELOAD_SERVICES), so importing the app loads no provider and needs no
+    API key; a missing key fails that request instead of the import.
+    """
+    global _gemini_service
+    if _gemini_service is None:
+        with _gemini_service_lock:
+            if _gemini_service is None:
+                _gemini_service = GeminiService()
+    return _gemini_service
+
+
+def shutdown_gemini_service():
+    """Close the shared GeminiService if it was ever built"""
+    global _gemini_service
+    with _gemini_service_lock:
+        service, _gemini_service = _gemini_service, None
+    if service is not None:
+        service.close()
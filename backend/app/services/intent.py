@@ -0,0 +1,219 @@
+"""
+Retrieval gate - decides whether a message needs school documents (RAG)
+Purely emotional or conversational messages skip search_chunks entirely
+"""
+import json
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.risk import risk_screener
+from app.utils.text import normalize_text
+
+
+def _phrase_pattern(phrases: Iterable[str]) -> re.Pattern:
+    """One regex matching any of the (unaccented) phrases as whole words"""
+    alternatives = sorted({normalize_text(p).strip() for p in phrases}, key=len, reverse=True)
+    return re.compile(r'\b(?:' + '|'.join(re.escape(p) for p in alternatives) + r')\b')
+
+
+# School / document topics - these are what the uploaded PDFs cover
+DOCUMENT_CUES = _phrase_pattern([
+    'quy chế', 'quy định', 'nội quy', 'thông tư', 'văn bản', 'tài liệu', 'điều lệ',
+    'học phí', 'học bổng', 'miễn giảm', 'tuyển sinh', 'điểm chuẩn', 'xét tuyển',
+    'lịch thi', 'lịch học', 'kỳ thi', 'thi cử', 'phúc khảo', 'thi lại', 'học lại',
+    'khen thưởng', 'kỷ luật', 'hạnh kiểm', 'xếp loại', 'rèn luyện', 'đánh giá',
+    'nhà trường', 'ban giám hiệu', 'giáo viên chủ nhiệm', 'phòng tư vấn', 'tư vấn học đường',
+    'sel', 'kỹ năng xã hội', 'cảm xúc xã hội', 'holland', 'trắc nghiệm', 'hướng nghiệp',
+    'trầm cảm', 'rối loạn', 'sức khỏe tâm thần', 'phòng ngừa', 'hành vi lệch chuẩn',
+    'bạo lực học đường', 'bắt nạt', 'thủ tục', 'hồ sơ', 'đăng ký',
+])
+
+# Informational and help-seeking question forms
+QUESTION_CUES = _phrase_pattern([
+    'là gì', 'như thế nào', 'thế nào', 'bao nhiêu', 'ở đâu', 'khi nào', 'bao giờ',
+    'có được không', 'có phải', 'cách nào', 'làm sao để', 'làm thế nào', 'quy trình',
+    'những gì', 'gồm những', 'bao gồm', 'hướng dẫn', 'giải thích', 'cho con hỏi', 'cho em hỏi',
+    'nên làm gì', 'phải làm gì', 'phải làm sao', 'nên làm sao', 'làm sao bây giờ', 'làm gì bây giờ',
+    'có nên', 'tìm ai', 'gặp ai',
+])
+
+# Greetings, thanks, acknowledgements and feelings
+# (no words whose unaccented form collides with common words, e.g. giận/gian, chán/chắn)
+CONVERSATIONAL_CUES = _phrase_pattern([
+    'xin chào', 'chào cô', 'chào', 'hello', 'hi', 'cảm ơn', 'cám ơn', 'thank', 'thanks',
+    'vâng', 'ok', 'oke', 'ừm', 'uh', 'hihi', 'haha', 'hic', 'huhu', 'tạm biệt', 'bye',
+    'buồn', 'chán quá', 'chán nản', 'mệt', 'khóc', 'cô đơn', 'sợ hãi', 'lo lắng', 'lo âu',
+    'tức giận', 'tủi thân', 'áp lực', 'căng thẳng', 'stress', 'bế tắc', 'thất vọng',
+    'tổn thương', 'vui', 'hạnh phúc', 'cảm thấy', 'tâm trạng',
+])
+
+
+_normalized_stopwords = None
+
+
+def _stopwords() -> set:
+    """RAG stopwords without diacritics (built on first use)"""
+    global _normalized_stopwords
+    if _normalized_stopwords is None:
+        from app.services.rag import VIETNAMESE_STOPWORDS
+        _normalized_stopwords = {normalize_text(word).strip() for word in VIETNAMESE_STOPWORDS}
+    return _normalized_stopwords
+
+
+class NaiveBayesIntentClassifier:
+    """
+    Tiny multinomial naive Bayes over unaccented words
+    Trained offline (see test/eval_retrieval_gate.py) and stored as JSON
+    """
+
+    def __init__(self, word_counts: Dict[str, Dict[str, int]] = None, class_counts: Dict[str, int] = None):
+        self.word_counts = word_counts or {"retrieve": {}, "skip": {}}
+        self.class_counts = class_counts or {"retrieve": 0, "skip": 0}
+        self._vocab_size = len(set(self.word_counts["retrieve"]) | set(self.word_counts["skip"]))
+        self._totals = {label: sum(counts.values()) for label, counts in self.word_counts.items()}
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return normalize_text(text).split()
+
+    @classmethod
+    def train(cls, samples: Iterable[Tuple[str, bool]]) -> "NaiveBayesIntentClassifier":
+        word_counts = {"retrieve": Counter(), "skip": Counter()}
+        class_counts = Counter()
+        for message, retrieve in samples:
+            label = "retrieve" if retrieve else "skip"
+            class_counts[label] += 1
+            word_counts[label].update(cls.tokenize(message))
+        return cls(
+            {label: dict(counts) for label, counts in word_counts.items()},
+            {"retrieve": class_counts["retrieve"], "skip": class_counts["skip"]}
+        )
+
+    def retrieve_probability(self, message: str) -> float:
+        total = sum(self.class_counts.values())
+        if not total:
+            return 0.5
+        log_probs = {}
+        for label in ("retrieve", "skip"):
+            log_prob = math.log((self.class_counts[label] + 1) / (total + 2))
+            denominator = self._totals[label] + self._vocab_size + 1
+            for word in self.tokenize(message):
+                log_prob += math.log((self.word_counts[label].get(word, 0) + 1) / denominator)
+            log_probs[label] = log_prob
+        diff = max(-50.0, min(50.0, log_probs["skip"] - log_probs["retrieve"]))
+        return 1 / (1 + math.exp(diff))
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"word_counts": self.word_counts, "class_counts": self.class_counts}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesIntentClassifier":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["word_counts"], data["class_counts"])
+
+
+class RetrievalGate:
+    """
+    Fast local decision: does this message need a search_chunks pass?
+
+    Rules, in order:
+    1. School/document topic or question (informational or "what should I
+       do") → retrieve, even when the message also expresses feelings
+    2. Flagged by the risk screen (app/utils/risk.py) → retrieve: the school's
+       self-harm and depression documents matter most for these messages
+    3. Greeting, thanks or feelings without such cues → skip
+    4. Fewer than RETRIEVAL_GATE_MIN_KEYWORDS meaningful words → skip
+    5. Optional classifier (RETRIEVAL_GATE_MODEL_PATH) → its verdict
+    6. Otherwise → retrieve (a missed document costs more than a wasted search)
+    """
+
+    def __init__(self, classifier: Optional[NaiveBayesIntentClassifier] = None, min_keywords: int = None):
+        self.classifier = classifier
+        self.min_keywords = min_keywords if min_keywords is not None else settings.RETRIEVAL_GATE_MIN_KEYWORDS
+        self._lock = threading.Lock()
+        self.performed = 0
+        self.skipped = 0
+        self.reasons = Counter()
+
+    @classmethod
+    def from_settings(cls) -> "RetrievalGate":
+        classifier = None
+        if settings.RETRIEVAL_GATE_MODEL_PATH:
+            classifier = NaiveBayesIntentClassifier.load(settings.RETRIEVAL_GATE_MODEL_PATH)
+        return cls(classifier)
+
+    def decide(self, message: str) -> Tuple[bool, str]:
+        """Returns (retrieve, reason) without touching the counters"""
+        text = normalize_text(message)
+        if DOCUMENT_CUES.search(text):
+            return True, "document_topic"
+        if QUESTION_CUES.search(text):
+            return True, "question"
+        if risk_screener.screen(message):
+            return True, "risk"
+        if CONVERSATIONAL_CUES.search(text):
+            return False, "conversational"
+        keywords = [w for w in text.split() if len(w) > 2 and w not in _stopwords()]
+        if len(keywords) < self.min_keywords:
+            return False, "too_short"
+        if self.classifier is not None:
+            retrieve = self.classifier.retrieve_probability(message) >= settings.RETRIEVAL_GATE_THRESHOLD
+            return retrieve, "classifier"
+        return True, "default"
+
+    def should_retrieve(self, message: str) -> bool:
+        """Decide and count the decision"""
+        retrieve, reason = self.decide(message)
+        with self._lock:
+            if retrieve:
+                self.performed += 1
+            else:
+                self.skipped += 1
+            self.reasons[reason] += 1
+        return retrieve
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "performed": self.performed,
+                "skipped": self.skipped,
+                "reasons": dict(self.reasons),
+            }
+
+    def evaluate(self, samples: Iterable[Tuple[str, bool]]) -> dict:
+        """
+        Compare gate decisions with labels (True = retrieval was useful)
+
+        Recall matters most: a false skip hides a relevant document.
+        """
+        tp = fp = tn = fn = 0
+        reasons = Counter()
+        missed = []
+        for message, label in samples:
+            retrieve, reason = self.decide(message)
+            reasons[reason] += 1
+            if retrieve and label:
+                tp += 1
+            elif retrieve:
+                fp += 1
+            elif label:
+                fn += 1
+                missed.append(message)
+            else:
+                tn += 1
+        total = tp + fp + tn + fn
+        return {
+            "total": total,
+            "skip_rate": (tn + fn) / total if total else 0.0,
+            "accuracy": (tp + tn) / total if total else 0.0,
+            "recall": tp / (tp + fn) if tp + fn else 1.0,
+            "precision": tp / (tp + fp) if tp + fp else 1.0,
+            "confusion": {"tp": tp, "fp": fp, "tn": tn, "fn": fn},
+            "reasons": dict(reasons),
+            "missed": missed[:20],
+        }
@@ -0,0 +1,312 @@
+"""
+LLM provider interface
+GeminiService and GeminiVisionOCR talk to an LLMProvider instead of
+google.generativeai directly, so a local fake can replace Gemini for tests
+and load testing (LLM_PROVIDER=fake)
+"""
+import logging
+import math
+import random
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Optional
+from app.core.config import settings
+from app.core.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponse:
+    """Text and token usage of one LLM call"""
+
+    def __init__(self, text: str, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class LLMProvider:
+    """
+    Backend serving LLM calls over one or more API keys
+
+    history=None sends a single prompt; a list (possibly empty) of
+    {"role": "user"|"model", "parts": [...]} turns starts a chat.
+    """
+
+    name = "base"
+
+    @property
+    def key_count(self) -> int:
+        raise NotImplementedError
+
+    def generate(
+        self,
+        key_index: int,
+        contents: Any,
+        history: Optional[List[Dict]] = None,
+        system_instruction: Optional[str] = None,
+        model_name: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        raise NotImplementedError
+
+    def stream(
+        self,
+        key_index: int,
+        contents: Any,
+        history: Optional[List[Dict]] = None,
+        system_instruction: Optional[str] = None,
+        model_name: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """google.generativeai backend"""
+
+    name = "gemini"
+
+    def __init__(self, api_keys: List[str] = None, model_name: str = None):
+        # Collect all available API keys (up to 15 keys)
+        self.api_keys = api_keys or [getattr(settings, f'GEMINI_API_KEY_{i}' if i > 1 else 'GEMINI_API_KEY')
+                        for i in range(1, 16)
+                        if getattr(settings, f'GEMINI_API_KEY_{i}' if i > 1 else 'GEMINI_API_KEY', None)]
+
+        if not self.api_keys:
+            raise ValueError("No Gemini API keys found!")
+
+        self.model_name = model_name or settings.GEMINI_MODEL
+        self._configure_lock = threading.Lock()
+        # One model per (key_index, model_name, system_instruction), built on first use:
+        # spec -> (model, expires_at); expires_at is set when the model uses a context cache
+        self._models: Dict[tuple, tuple] = {}
+        self._pool_lock = threading.Lock()
+        # (model_name, system_instruction) pairs the context cache rejected
+        self._cache_unsupported = set()
+
+    @property
+    def key_count(self) -> int:
+        return len(self.api_keys)
+
+    def _create_cached_content(self, genai, model_name: str, system_instruction: str):
+        """
+        Upload the system instruction once as a Gemini context cache
+
+        Returns None if caching is off or the model/prompt doesn't qualify
+        (e.g. below the minimum cacheable token count).
+        """
+        if not settings.GEMINI_CONTEXT_CACHE_ENABLED or (model_name, system_instruction) in self._cache_unsupported:
+            return None
+        try:
+            return genai.caching.CachedContent.create(
+                model=model_name,
+                system_instruction=system_instruction,
+                ttl=timedelta(seconds=settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+            )
+        except Exception as e:
+            self._cache_unsupported.add((model_name, system_instruction))
+            logger.warning(f"⚠️ Context cache unavailable for {model_name}, sending system prompt inline: {e}")
+            return None
+
+    def _build_model(self, key_index: int, model_name: str, system_instruction: Optional[str]):
+        """Create a model bound to one API key; returns (model, expires_at)"""
+        import google.generativeai as genai
+        from google.generativeai import client as genai_client
+
+        with self._configure_lock:  # genai.configure is process-global
+            genai.configure(api_key=self.api_keys[key_index])
+            cached = self._create_cached_content(genai, model_name, system_instruction) if system_instruction else None
+            if cached is not None:
+                model = genai.GenerativeModel.from_cached_content(cached)
+                # Rebuild a minute before the cache expires
+                expires_at = time.monotonic() + settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS - 60
+            else:
+                model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+                expires_at = None
+            # Bind the client now so a later configure() can't change this model's key
+            model._client = genai_client.get_default_generative_client()
+        logger.info(f"🧩 Built {model_name} model for key {key_index + 1}{' (cached system prompt)' if cached else ''}")
+        return model, expires_at
+
+    def _get_model(self, key_index: int, model_name: Optional[str], system_instruction: Optional[str]):
+        """Pooled model for this key - switching keys is a dict lookup"""
+        spec = (key_index, model_name or self.model_name, system_instruction)
+        entry = self._models.get(spec)
+        hit = entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+        record_cache_lookup("gemini_model", hit)
+        if not hit:
+            with self._pool_lock:
+                entry = self._models.get(spec)
+                if entry is None or (entry[1] is not None and entry[1] <= time.monotonic()):
+                    entry = self._build_model(*spec)
+                    self._models[spec] = entry
+        return entry[0]
+
+    def _request(self, key_index, contents, history, system_instruction, model_name, timeout, stream):
+        model = self._get_model(key_index, model_name, system_instruction)
+        request_options = {"timeout": timeout} if timeout else None
+        if history is None:
+            return model.generate_content(contents, stream=stream, request_options=request_options)
+        chat = model.start_chat(history=history)
+        return chat.send_message(contents, stream=stream, request_options=request_options)
+
+    def generate(self, key_index, contents, history=None, system_instruction=None, model_name=None, timeout=None):
+        response = self._request(key_index, contents, history, system_instruction, model_name, timeout, stream=False)
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            response.text,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            completion_tokens=getattr(usage, "candidates_token_count", None)
+        )
+
+    def stream(self, key_index, contents, history=None, system_instruction=None, model_name=None, timeout=None):
+        response = self._request(key_index, contents, history, system_instruction, model_name, timeout, stream=True)
+        for chunk in response:
+            yield chunk.text
+
+
+class FakeQuotaError(Exception):
+    """Mimics google.api_core.exceptions.ResourceExhausted"""
+    code = 429
+
+
+class FakeServerError(Exception):
+    """Mimics google.api_core.exceptions.ServiceUnavailable"""
+    code = 503
+
+
+class FakeKey:
+    """
+    Behaviour of one fake API key
+
+    Args:
+        latency_ms: Median latency of a call
+        distribution: "fixed", "uniform" (±sigma) or "lognormal" (sigma of log)
+        quota_error_rate / server_error_rate: Random error probabilities
+        errors: Exceptions raised by the next calls, in order (None = succeed)
+        hang: If True, calls block until release() is called
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        distribution: str = "fixed",
+        sigma: float = 0.0,
+        quota_error_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        errors: Optional[List[Optional[Exception]]] = None,
+        hang: bool = False,
+        reply: Optional[str] = None,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.sigma = sigma
+        self.quota_error_rate = quota_error_rate
+        self.server_error_rate = server_error_rate
+        self.errors = list(errors or [])
+        self.reply = reply
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._released = threading.Event()
+        if not hang:
+            self._released.set()
+
+    def release(self):
+        """Unblock calls of a hanging key"""
+        self._released.set()
+
+    def _sample_latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.distribution == "lognormal" and self.sigma > 0:
+            return self._random.lognormvariate(math.log(self.latency_ms), self.sigma) / 1000
+        if self.distribution == "uniform" and self.sigma > 0:
+            return self.latency_ms * self._random.uniform(1 - self.sigma, 1 + self.sigma) / 1000
+        return self.latency_ms / 1000
+
+    def begin_call(self) -> float:
+        """Draw this call's outcome; returns latency or raises the injected error"""
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+            roll = self._random.random()
+            latency = self._sample_latency()
+        self._released.wait()
+        if error is not None:
+            time.sleep(latency)
+            raise error
+        if roll < self.quota_error_rate:
+            raise FakeQuotaError("429 Resource has been exhausted (e.g. check quota).")
+        if roll < self.quota_error_rate + self.server_error_rate:
+            time.sleep(latency)
+            raise FakeServerError("503 The service is currently unavailable.")
+        return latency
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic local backend simulating latency, streaming and quota errors"""
+
+    name = "fake"
+
+    def __init__(self, keys: List[FakeKey] = None, stream_chunks: int = None):
+        self.keys = keys or [FakeKey()]
+        self.stream_chunks = stream_chunks or settings.FAKE_LLM_STREAM_CHUNKS
+
+    @classmethod
+    def from_settings(cls) -> "FakeProvider":
+        return cls([
+            FakeKey(
+                latency_ms=settings.FAKE_LLM_LATENCY_MS,
+                distribution=settings.FAKE_LLM_LATENCY_DISTRIBUTION,
+                sigma=settings.FAKE_LLM_LATENCY_SIGMA,
+                quota_error_rate=settings.FAKE_LLM_QUOTA_ERROR_RATE,
+                server_error_rate=settings.FAKE_LLM_SERVER_ERROR_RATE,
+                seed=settings.FAKE_LLM_SEED + i
+            )
+            for i in range(settings.FAKE_LLM_KEYS)
+        ])
+
+    @property
+    def key_count(self) -> int:
+        return len(self.keys)
+
+    def _reply(self, key: FakeKey, contents: Any) -> str:
+        if key.reply is not None:
+            return key.reply
+        prompt = contents if isinstance(contents, str) else " ".join(str(part) for part in contents)
+        return f"Cô hiểu điều con chia sẻ: “{prompt.strip()[-60:]}”. Con có thể kể thêm cho cô nghe không?"
+
+    def _usage(self, contents: Any, history: Optional[List[Dict]], system_instruction: Optional[str], text: str) -> LLMResponse:
+        prompt_chars = len(str(contents)) + len(system_instruction or "")
+        prompt_chars += sum(len(str(turn.get("parts", ""))) for turn in history or [])
+        return LLMResponse(text, prompt_tokens=prompt_chars // 3, completion_tokens=max(1, len(text) // 3))
+
+    def generate(self, key_index, contents, history=None, system_instruction=None, model_name=None, timeout=None):
+        key = self.keys[key_index]
+        latency = key.begin_call()
+        time.sleep(latency)
+        text = self._reply(key, contents)
+        return self._usage(contents, history, system_instruction, text)
+
+    def stream(self, key_index, contents, history=None, system_instruction=None, model_name=None, timeout=None):
+        key = self.keys[key_index]
+        latency = key.begin_call()
+        text = self._reply(key, contents)
+        step = max(1, math.ceil(len(text) / self.stream_chunks))
+        for start in range(0, len(text), step):
+            time.sleep(latency / self.stream_chunks)
+            yield text[start:start + step]
+
+
+def get_llm_provider() -> LLMProvider:
+    """Provider selected by settings.LLM_PROVIDER"""
+    if settings.LLM_PROVIDER == "fake":
+        logger.warning("🧪 Using fake LLM provider - responses are simulated")
+        return FakeProvider.from_settings()
+    if settings.LLM_PROVIDER == "gemini":
+        return GeminiProvider()
+    raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER}")
@@ -2,11 +2,12 @@
 RAG Service - Improved keyword-based RAG without embeddings
 Uses Gemini Vision OCR for scanned PDFs (optional)
 """
-import PyPDF2
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import threading
+from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
+from app.core.metrics import INGESTION_STAGE_LATENCY, RAG_SEARCH_CANDIDATES, RAG_SEARCH_LATENCY
 from app.models.models import SchoolDocument, DocumentChunk
+from app.services.text_splitter import get_text_splitter
 import re
 import unicodedata
 from collections import Counter
@@ -29,22 +30,17 @@ VIETNAMESE_STOPWORDS = {
 class RAGService:
     """Simple RAG using keyword matching - no embedding API needed"""
     
-    def __init__(self, use_vision_ocr: bool = False, gemini_api_key: str = None):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", ""],
-        )
+    def __init__(self, use_vision_ocr: bool = False, llm_provider=None):
+        self.text_splitter = get_text_splitter()
         
         # Gemini Vision OCR support (optional)
         self.use_vision_ocr = use_vision_ocr
         self.vision_ocr = None
         
-        if use_vision_ocr and gemini_api_key:
+        if use_vision_ocr:
             try:
                 from app.utils.ocr import init_gemini_vision_ocr
-                self.vision_ocr = init_gemini_vision_ocr(gemini_api_key)
+                self.vision_ocr = init_gemini_vision_ocr(llm_provider)
                 print("✅ Gemini Vision OCR enabled")
             except Exception as e:
                 print(f"⚠️ Cannot initialize Gemini Vision OCR: {e}")
@@ -62,6 +58,7 @@ class RAGService:
                 print("   Falling back to PyPDF2...")
         
         # Fallback to PyPDF2
+        import PyPDF2
         text = ""
         try:
             with open(pdf_path, 'rb') as file:
@@ -130,6 +127,20 @@ class RAGService:
         top_k: int = None,
         similarity_threshold: float = None
     ) -> List[str]:
+        """Search for relevant chunks, returning chunk texts only"""
+        return [
+            content for _, content in
+            self.search_chunks_with_scores(query, db, top_k, similarity_threshold)
+        ]
+    
+    @RAG_SEARCH_LATENCY.time()
+    def search_chunks_with_scores(
+        self, 
+        query: str, 
+        db: Session, 
+        top_k: int = None,
+        similarity_threshold: float = None
+    ) -> List[Tuple[float, str]]:
         """
         Search for relevant chunks using improved keyword matching
         
@@ -138,6 +149,8 @@ class RAGService:
         - Multi-factor scoring (Jaccard + frequency + position + phrase matching)
         - Both normalized and original text matching
         - Lower threshold for more results
+        
+        Returns: (score, chunk_text) pairs, best first
         """
         if top_k is None:
             top_k = settings.TOP_K_CHUNKS
@@ -158,6 +171,7 @@ class RAGService:
         
         # Get all chunks
         all_chunks = db.query(DocumentChunk).all()
+        RAG_SEARCH_CANDIDATES.observe(len(all_chunks))
         
         if not all_chunks:
             print("⚠️ No documents in database")
@@ -233,12 +247,12 @@ class RAGService:
         
         # Filter and get top K
         top_chunks = [
-            content for score, content in scored_chunks 
+            (score, content) for score, content in scored_chunks 
             if score >= similarity_threshold
         ][:top_k]
         
         if top_chunks:
-            top_scores = [score for score, _ in scored_chunks[:len(top_chunks)]]
+            top_scores = [score for score, _ in top_chunks]
             print(f"✅ Found {len(top_chunks)} chunks (scores: {[f'{s:.3f}' for s in top_scores]})")
         else:
             print(f"⚠️ No chunks above threshold {similarity_threshold}")
@@ -255,7 +269,8 @@ class RAGService:
         print(f"📄 Processing: {filename}")
         
         # Extract text
-        text = self.extract_text_from_pdf(pdf_path)
+        with INGESTION_STAGE_LATENCY.labels("extract").time():
+            text = self.extract_text_from_pdf(pdf_path)
         
         if not text or len(text.strip()) < 50:
             raise ValueError(f"Could not extract meaningful text from {filename}")
@@ -269,27 +284,37 @@ class RAGService:
         db.refresh(doc)
         
         # Split into chunks
-        chunks = self.text_splitter.split_text(text)
+        with INGESTION_STAGE_LATENCY.labels("split").time():
+            chunks = self.text_splitter.split_text(text)
         print(f"✂️  Split into {len(chunks)} chunks")
         
         # Save chunks
-        for i, chunk_text in enumerate(chunks):
-            chunk = DocumentChunk(
-                document_id=doc.id,
-                chunk_text=chunk_text,
-                chunk_index=i
-            )
-            db.add(chunk)
-        
-        db.commit()
+        with INGESTION_STAGE_LATENCY.labels("save").time():
+            for i, chunk_text in enumerate(chunks):
+                chunk = DocumentChunk(
+                    document_id=doc.id,
+                    chunk_text=chunk_text,
+                    chunk_index=i
+                )
+                db.add(chunk)
+            
+            db.commit()
         print(f"💾 Saved {len(chunks)} chunks to database")
         
         return doc
 
 
-# Global instance - no OCR by default (enable in routes if needed)
-rag_service = RAGService(
-    use_vision_ocr=False,  # Can enable with settings.USE_VISION_OCR
-    gemini_api_key=settings.GEMINI_API_KEY
-)
+# Global instance, built on first use - no OCR by default (enable in routes if needed)
+_rag_service: Optional[RAGService] = None
+_rag_service_lock = threading.Lock()
+
+
+def get_rag_service() -> RAGService:
+    """Shared RAGService (use_vision_ocr=False; can enable with settings.USE_VISION_OCR)"""
+    global _rag_service
+    if _rag_service is None:
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService(use_vision_ocr=False)
+    return _rag_service
 
@@ -0,0 +1,166 @@
+"""
+Resilience primitives for LLM calls
+Error classification, per-key circuit breakers and latency tracking
+"""
+import threading
+import time
+from collections import deque
+from typing import Optional
+from app.core.config import settings
+
+
+class LLMTimeoutError(Exception):
+    """The LLM call did not finish before its deadline"""
+
+
+class NoHealthyKeyError(Exception):
+    """Every API key is currently tripped by its circuit breaker"""
+
+
+class LLMBusyError(Exception):
+    """The global LLM concurrency cap stayed full for the whole queue timeout"""
+
+
+# Exception class names raised by google.api_core / grpc for each condition
+QUOTA_ERROR_NAMES = {"ResourceExhausted", "TooManyRequests"}
+TRANSIENT_ERROR_NAMES = {
+    "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+    "GatewayTimeout", "BadGateway", "Aborted", "LLMTimeoutError",
+}
+
+
+def _error_code(exc: Exception) -> Optional[int]:
+    """HTTP status code of a google.api_core exception, if any"""
+    code = getattr(exc, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_quota_error(exc: Exception) -> bool:
+    """True if the error means the key ran out of quota (HTTP 429)"""
+    if type(exc).__name__ in QUOTA_ERROR_NAMES or _error_code(exc) == 429:
+        return True
+    message = str(exc)
+    return "429" in message or "ResourceExhausted" in message or "quota" in message.lower()
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """True if the same request may succeed on another key or later"""
+    if is_quota_error(exc) or type(exc).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    code = _error_code(exc)
+    return code is not None and code >= 500
+
+
+class CircuitBreaker:
+    """
+    Per-key circuit breaker
+
+    closed    -> calls flow; consecutive failures (or slow calls) are counted
+    open      -> key is skipped until the cooldown expires
+    half_open -> one trial call decides between closed and open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = None,
+        slow_call_seconds: float = None,
+        cooldown_seconds: float = None,
+        clock=time.monotonic
+    ):
+        self.failure_threshold = failure_threshold or settings.LLM_BREAKER_FAILURE_THRESHOLD
+        self.slow_call_seconds = slow_call_seconds or settings.LLM_BREAKER_SLOW_CALL_SECONDS
+        self.cooldown_seconds = cooldown_seconds or settings.LLM_BREAKER_COOLDOWN_SECONDS
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.total_failures = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.cooldown_seconds:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Reserve a call on this key; False while the breaker is open"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def is_available(self) -> bool:
+        """Like allow_request, without reserving the half-open trial"""
+        with self._lock:
+            state = self._current_state()
+            return state == self.CLOSED or (state == self.HALF_OPEN and not self._trial_in_flight)
+
+    def record_success(self, latency: float):
+        if latency >= self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, trip: bool = False):
+        """Count a failure; trip=True opens the breaker immediately (e.g. quota)"""
+        with self._lock:
+            self.total_failures += 1
+            self._failures += 1
+            if trip or self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "total_failures": self.total_failures,
+                "times_opened": self.times_opened,
+            }
+
+
+class LatencyTracker:
+    """Rolling window of call latencies (seconds)"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """p in [0, 100]; None when there are no samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
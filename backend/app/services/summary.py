@@ -0,0 +1,130 @@
+"""
+Rolling conversation summaries
+Older messages of a chat session are folded into ChatSession.summary so the
+prompt only carries the summary plus the last few turns
+"""
+import logging
+import threading
+from typing import List, Dict, Optional, Callable
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# (previous_summary, new_messages) -> updated summary
+Summarizer = Callable[[Optional[str], List[Dict[str, str]]], str]
+
+
+class StubSummarizer:
+    """Deterministic local summarizer for tests - no API calls"""
+
+    def __init__(self, max_chars: int = 1000):
+        self.max_chars = max_chars
+        self.calls = 0
+
+    def __call__(self, previous_summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        self.calls += 1
+        lines = [previous_summary] if previous_summary else []
+        lines += [f"{msg['role']}: {msg['content'][:80]}" for msg in messages]
+        return "\n".join(lines)[-self.max_chars:]
+
+
+def get_default_summarizer() -> Summarizer:
+    """Summarizer selected by settings.SUMMARIZER"""
+    if settings.SUMMARIZER == "stub":
+        return StubSummarizer()
+
+    from app.services.gemini import get_gemini_service
+    return get_gemini_service().summarize_conversation
+
+
+class SummaryService:
+    """Keeps ChatSession.summary up to date in the background"""
+
+    def __init__(
+        self,
+        summarizer: Summarizer = None,
+        session_factory=SessionLocal,
+        every_n: int = None,
+        recent: int = None
+    ):
+        self._summarizer = summarizer
+        self.session_factory = session_factory
+        self.every_n = every_n if every_n is not None else settings.SUMMARY_EVERY_N_MESSAGES
+        self.recent = recent if recent is not None else settings.SUMMARY_RECENT_MESSAGES
+        self._in_progress = set()
+        self._lock = threading.Lock()
+
+    @property
+    def summarizer(self) -> Summarizer:
+        if self._summarizer is None:
+            self._summarizer = get_default_summarizer()
+        return self._summarizer
+
+    def needs_update(self, message_count: int, summary_message_count: int) -> bool:
+        """True when enough messages fell out of the recent window"""
+        unsummarized = message_count - (summary_message_count or 0) - self.recent
+        return unsummarized >= self.every_n
+
+    def update_session_summary(self, session_id: int) -> bool:
+        """
+        Fold messages older than the recent window into the session summary
+        Safe to call from a background task; returns True if the summary changed
+        """
+        with self._lock:
+            if session_id in self._in_progress:
+                return False
+            self._in_progress.add(session_id)
+
+        db = self.session_factory()
+        try:
+            session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+            if not session:
+                return False
+
+            covered = session.summary_message_count or 0
+            message_count = db.query(ChatMessage).filter(
+                ChatMessage.session_id == session_id
+            ).count()
+            if not self.needs_update(message_count, covered):
+                return False
+
+            target = message_count - self.recent
+            new_messages = db.query(ChatMessage.role, ChatMessage.content).filter(
+                ChatMessage.session_id == session_id
+            ).order_by(
+                ChatMessage.created_at.asc(), ChatMessage.id.asc()
+            ).offset(covered).limit(target - covered).all()
+
+            previous_summary = session.summary
+            db.commit()  # Don't hold the connection during the LLM call
+            
+            summary = self.summarizer(
+                previous_summary,
+                [{"role": role, "content": content} for role, content in new_messages]
+            )
+
+            # Keep updated_at untouched so the session list order does not change
+            db.query(ChatSession).filter(ChatSession.id == session_id).update({
+                ChatSession.summary: summary,
+                ChatSession.summary_message_count: target,
+                ChatSession.updated_at: ChatSession.updated_at
+            }, synchronize_session=False)
+            db.commit()
+            logger.info(f"📝 Session {session_id} summary now covers {target} messages")
+            return True
+
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Could not update summary of session {session_id}: {e}")
+            return False
+
+        finally:
+            db.close()
+            with self._lock:
+                self._in_progress.discard(session_id)
+
+
+# Global instance
+summary_service = SummaryService()
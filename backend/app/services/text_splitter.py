@@ -0,0 +1,178 @@
+"""
+Text splitter for school documents
+Replaces langchain's RecursiveCharacterTextSplitter, the only thing RAG used
+from langchain.
+
+- RecursiveTextSplitter gives the same chunks as RecursiveCharacterTextSplitter
+  with keep_separator=True and strip_whitespace=True (what RAGService used):
+  split on the first separator present in the text, merge pieces back up to
+  chunk_size with chunk_overlap, and recurse into pieces that are still too long
+- VietnameseTextSplitter splits sentences after . ! ? … (and closing quotes)
+  as one level, but not after abbreviations (TP., ThS., v.v.), initials or
+  list markers ("1.", "II.", "Điều 5."), so chunks don't start mid-name; it
+  also NFC-normalizes PDF text and never splits a letter from its diacritics
+
+Both run in linear time: each level scans its text once, and the overlap
+window is a deque instead of a list sliced on every pop.
+"""
+import re
+import unicodedata
+from collections import deque
+from typing import List, Sequence, Union
+from app.core.config import settings
+
+
+class SentenceBoundary:
+    """Separator that splits after a sentence-ending punctuation mark"""
+
+    # Punctuation, optional closing quotes/brackets, then the whitespace to split at
+    END = re.compile(r'([.!?…]+)(["”’»)\]]*)(\s+)')
+    # "1." / "II." / "a." / "Điều 5." at the start of a line
+    LIST_MARKER = re.compile(
+        r'\n\s*(?:(?:điều|chương|mục|khoản|phần|bài)\s+)?(?:\d+|[ivxlcdm]+|[a-z])$',
+        re.IGNORECASE
+    )
+    LAST_WORD = re.compile(r'(\w+)$')
+    ROMAN_DIGITS = set("ivxlcdm")
+    ABBREVIATIONS = {
+        "tp", "tx", "q", "p", "h", "tt", "gs", "pgs", "ts", "ths", "bs", "ks", "cn", "gv", "hs", "sv",
+        "st", "tr", "nxb", "vd", "vv", "no", "mr", "mrs", "ms", "dr",
+    }
+    # Characters before the punctuation checked for abbreviations and list markers
+    LOOKBEHIND = 32
+
+    def _is_boundary(self, text: str, end: int) -> bool:
+        """Whether the punctuation ending at text[end] ends a sentence"""
+        if text[end - 1] != "." or text[end - 2:end] == "..":
+            return True  # ! ? … and ellipses always end a sentence
+        word = self.LAST_WORD.search(text, max(0, end - 7), end - 1)
+        if word is None or len(word.group(1)) > 5:
+            return True  # Most sentences end in an ordinary word
+        word = word.group(1).lower()
+        if word in self.ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+            return False
+        if not (word.isdigit() or set(word) <= self.ROMAN_DIGITS):
+            return True
+        start = max(0, end - 1 - self.LOOKBEHIND)
+        before = ("\n" if start == 0 else "") + text[start:end - 1]
+        return not self.LIST_MARKER.search(before)
+
+    def split(self, text: str) -> List[str]:
+        """Pieces ending at sentence boundaries (whitespace goes to the next piece)"""
+        pieces = []
+        previous = 0
+        for match in self.END.finditer(text):
+            if self._is_boundary(text, match.end(1)):
+                pieces.append(text[previous:match.start(3)])
+                previous = match.start(3)
+        pieces.append(text[previous:])
+        return [piece for piece in pieces if piece]
+
+    def __repr__(self):
+        return "SentenceBoundary()"
+
+
+Separator = Union[str, SentenceBoundary]
+
+# Separators RAGService passed to langchain
+DEFAULT_SEPARATORS: List[Separator] = ["\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", ""]
+VIETNAMESE_SEPARATORS: List[Separator] = ["\n\n", "\n", SentenceBoundary(), "; ", ": ", ", ", " ", ""]
+
+
+class RecursiveTextSplitter:
+    """Splits text into chunks of at most chunk_size characters where possible"""
+
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None, separators: Sequence[Separator] = None):
+        self.chunk_size = chunk_size or settings.CHUNK_SIZE
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else settings.CHUNK_OVERLAP
+        if self.chunk_overlap > self.chunk_size:
+            raise ValueError(
+                f"Chunk overlap ({self.chunk_overlap}) is larger than chunk size ({self.chunk_size})"
+            )
+        self.separators = list(separators or DEFAULT_SEPARATORS)
+
+    def split_text(self, text: str) -> List[str]:
+        return self._split(text, self.separators)
+
+    def _characters(self, text: str) -> List[str]:
+        return list(text)
+
+    def _pieces(self, text: str, separators: Sequence[Separator]):
+        """(pieces, remaining separators) for the first separator present in text"""
+        for index, separator in enumerate(separators):
+            if separator == "":
+                return self._characters(text), []
+            if isinstance(separator, SentenceBoundary):
+                pieces = separator.split(text)
+                if len(pieces) > 1:
+                    return pieces, separators[index + 1:]
+            elif separator in text:
+                # The separator starts the piece after it, so joining pieces restores the text
+                parts = text.split(separator)
+                pieces = [parts[0]] + [separator + part for part in parts[1:]]
+                return [piece for piece in pieces if piece], separators[index + 1:]
+        return self._characters(text), []
+
+    def _split(self, text: str, separators: Sequence[Separator]) -> List[str]:
+        pieces, remaining = self._pieces(text, separators)
+        chunks = []
+        short = []
+        for piece in pieces:
+            if len(piece) < self.chunk_size:
+                short.append(piece)
+                continue
+            if short:
+                chunks.extend(self._merge(short))
+                short = []
+            if remaining:
+                chunks.extend(self._split(piece, remaining))
+            else:
+                chunks.append(piece)
+        if short:
+            chunks.extend(self._merge(short))
+        return chunks
+
+    def _merge(self, pieces: List[str]) -> List[str]:
+        """Pack consecutive pieces into chunks, starting each with up to chunk_overlap of the last"""
+        chunks = []
+        window = deque()
+        total = 0
+        for piece in pieces:
+            size = len(piece)
+            if total + size > self.chunk_size and window:
+                chunk = "".join(window).strip()
+                if chunk:
+                    chunks.append(chunk)
+                while total > self.chunk_overlap or (total + size > self.chunk_size and total > 0):
+                    total -= len(window.popleft())
+            window.append(piece)
+            total += size
+        chunk = "".join(window).strip()
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+
+class VietnameseTextSplitter(RecursiveTextSplitter):
+    """RecursiveTextSplitter with sentence-aware separators for Vietnamese documents"""
+
+    # A character and the combining marks after it
+    GRAPHEME = re.compile(r'.[\u0300-\u036f]*', re.DOTALL)
+
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None, separators: Sequence[Separator] = None):
+        super().__init__(chunk_size, chunk_overlap, separators or VIETNAMESE_SEPARATORS)
+
+    def split_text(self, text: str) -> List[str]:
+        return super().split_text(unicodedata.normalize('NFC', text))
+
+    def _characters(self, text: str) -> List[str]:
+        return self.GRAPHEME.findall(text)
+
+
+def get_text_splitter() -> RecursiveTextSplitter:
+    """Splitter selected by settings.TEXT_SPLITTER ("vietnamese" or "recursive")"""
+    if settings.TEXT_SPLITTER == "vietnamese":
+        return VietnameseTextSplitter()
+    if settings.TEXT_SPLITTER != "recursive":
+        raise ValueError(f"Unknown TEXT_SPLITTER: {settings.TEXT_SPLITTER}")
+    return RecursiveTextSplitter()
@@ -0,0 +1,166 @@
+"""
+LLM usage accounting
+Every Gemini call (chat, title, summary, OCR) is logged to llm_call_logs with
+its key, token counts, retries and latency. Rows are buffered and written in
+batches so a chat turn doesn't pay for an extra INSERT.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import LLMCallLog
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class UsageRecorder:
+    """Buffers LLM call records and writes them to llm_call_logs in batches"""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        enabled: bool = None,
+        flush_every: int = None,
+        flush_seconds: float = None
+    ):
+        self.session_factory = session_factory
+        self.enabled = enabled if enabled is not None else settings.LLM_USAGE_TRACKING_ENABLED
+        self.flush_every = flush_every or settings.LLM_USAGE_FLUSH_EVERY
+        self.flush_seconds = flush_seconds if flush_seconds is not None else settings.LLM_USAGE_FLUSH_SECONDS
+        self._buffer: List[Dict] = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def record(
+        self,
+        operation: str,
+        provider: str,
+        key_index: Optional[int],
+        latency_seconds: float,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        retries: int = 0,
+        used_rag: bool = False,
+        error: Optional[Exception] = None
+    ):
+        """Queue one call; flushes when the buffer is full or old enough"""
+        if not self.enabled:
+            return
+        row = {
+            "operation": operation,
+            "provider": provider,
+            "key_index": key_index,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "retries": retries,
+            "latency_ms": round(latency_seconds * 1000, 1),
+            "used_rag": used_rag,
+            "success": error is None,
+            "error": f"{type(error).__name__}: {error}"[:200] if error is not None else None,
+            "created_at": datetime.utcnow(),
+        }
+        with self._lock:
+            self._buffer.append(row)
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+            due = len(self._buffer) >= self.flush_every or now - self._oldest >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows in one short transaction"""
+        with self._lock:
+            rows, self._buffer, self._oldest = self._buffer, [], None
+        if not rows:
+            return
+        db = self.session_factory()
+        try:
+            db.bulk_insert_mappings(LLMCallLog, rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.dropped += len(rows)
+            logger.warning(f"⚠️ Could not save {len(rows)} LLM usage records: {e}")
+        finally:
+            db.close()
+
+    def report(self, db: Session, days: int = 7) -> dict:
+        """
+        Latency percentiles per operation and token totals per day per key
+
+        Buffered rows are flushed first so the report is up to date.
+        """
+        self.flush()
+        since = datetime.utcnow() - timedelta(days=days)
+
+        latencies: Dict[str, List[float]] = {}
+        rows = db.query(LLMCallLog.operation, LLMCallLog.latency_ms).filter(
+            LLMCallLog.created_at >= since,
+            LLMCallLog.success.is_(True)
+        ).all()
+        for operation, latency_ms in rows:
+            latencies.setdefault(operation, []).append(latency_ms)
+        latencies["all"] = [latency for _, latency in rows]
+
+        latency = {}
+        for operation, values in latencies.items():
+            values.sort()
+            latency[operation] = {
+                "count": len(values),
+                "p50_ms": _percentile(values, 50),
+                "p95_ms": _percentile(values, 95),
+                "p99_ms": _percentile(values, 99),
+            }
+
+        day = func.date(LLMCallLog.created_at)
+        daily = db.query(
+            day.label("day"),
+            LLMCallLog.key_index,
+            func.count(LLMCallLog.id),
+            func.sum(func.coalesce(LLMCallLog.prompt_tokens, 0)),
+            func.sum(func.coalesce(LLMCallLog.completion_tokens, 0)),
+            func.sum(LLMCallLog.retries),
+            func.count(LLMCallLog.id).filter(LLMCallLog.success.is_(False)),
+            func.count(LLMCallLog.id).filter(LLMCallLog.used_rag.is_(True)),
+        ).filter(
+            LLMCallLog.created_at >= since
+        ).group_by(day, LLMCallLog.key_index).order_by(day, LLMCallLog.key_index).all()
+
+        return {
+            "since": since,
+            "latency": latency,
+            "daily": [
+                {
+                    "day": str(row[0]),
+                    "key": row[1] + 1 if row[1] is not None else None,
+                    "calls": row[2],
+                    "prompt_tokens": row[3] or 0,
+                    "completion_tokens": row[4] or 0,
+                    "retries": row[5] or 0,
+                    "errors": row[6],
+                    "rag_calls": row[7],
+                }
+                for row in daily
+            ],
+        }
+
+
+# Global instance
+usage_recorder = UsageRecorder()
+atexit.register(usage_recorder.flush)
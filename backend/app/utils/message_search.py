@@ -0,0 +1,166 @@
+"""
+Full-text search over chat messages (teacher dashboard)
+
+Messages are indexed without diacritics (normalize_text), so "bat nat"
+finds "bắt nạt". The index is kept in sync by ChatMessage insert/delete
+events:
+- SQLite: FTS5 table chat_messages_fts (rowid = message id)
+- PostgreSQL: chat_message_search table with a GIN tsvector index
+- Other databases: ILIKE on chat_messages.content (no index)
+"""
+import logging
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from app.models.models import ChatMessage
+from app.utils.text import normalize_text, normalize_with_offsets
+
+logger = logging.getLogger(__name__)
+
+SQLITE_DDL = "CREATE VIRTUAL TABLE chat_messages_fts USING fts5(content_norm)"
+POSTGRES_DDL = [
+    """CREATE TABLE chat_message_search (
+        message_id INTEGER PRIMARY KEY REFERENCES chat_messages(id) ON DELETE CASCADE,
+        content_norm TEXT NOT NULL
+    )""",
+    "CREATE INDEX ix_chat_message_search_tsv ON chat_message_search "
+    "USING GIN (to_tsvector('simple', content_norm))",
+]
+BACKFILL_BATCH = 1000
+
+# Engines (by URL) whose search index exists; events are no-ops elsewhere
+_ready = set()
+
+
+def _index_table(dialect: str) -> Optional[str]:
+    return {"sqlite": "chat_messages_fts", "postgresql": "chat_message_search"}.get(dialect)
+
+
+def ensure_index(engine):
+    """Create the search index if missing and fill it from existing messages"""
+    table = _index_table(engine.dialect.name)
+    if table is not None and not inspect(engine).has_table(table):
+        with engine.begin() as conn:
+            for ddl in [SQLITE_DDL] if engine.dialect.name == "sqlite" else POSTGRES_DDL:
+                conn.execute(text(ddl))
+            _backfill(conn)
+    _ready.add(str(engine.url))
+
+
+def _backfill(conn):
+    last_id, indexed = 0, 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, content FROM chat_messages WHERE id > :last_id ORDER BY id LIMIT :batch"),
+            {"last_id": last_id, "batch": BACKFILL_BATCH}
+        ).all()
+        if not rows:
+            break
+        for message_id, content in rows:
+            _insert(conn, message_id, content)
+        last_id = rows[-1][0]
+        indexed += len(rows)
+    if indexed:
+        logger.info(f"🔎 Indexed {indexed} existing messages for search")
+
+
+def _insert(conn, message_id: int, content: str):
+    if conn.dialect.name == "sqlite":
+        sql = "INSERT INTO chat_messages_fts (rowid, content_norm) VALUES (:id, :content)"
+    else:
+        sql = "INSERT INTO chat_message_search (message_id, content_norm) VALUES (:id, :content)"
+    conn.execute(text(sql), {"id": message_id, "content": normalize_text(content)})
+
+
+@event.listens_for(ChatMessage, "after_insert")
+def _index_message(mapper, connection, target):
+    if str(connection.engine.url) in _ready and _index_table(connection.dialect.name):
+        _insert(connection, target.id, target.content)
+
+
+@event.listens_for(ChatMessage, "after_delete")
+def _unindex_message(mapper, connection, target):
+    if str(connection.engine.url) in _ready and connection.dialect.name == "sqlite":
+        # PostgreSQL rows go away with ON DELETE CASCADE
+        connection.execute(text("DELETE FROM chat_messages_fts WHERE rowid = :id"), {"id": target.id})
+
+
+def _query_terms(query: str) -> List[str]:
+    return normalize_text(query).split()
+
+
+def search_messages(
+    db: Session,
+    query: str,
+    role: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+) -> Tuple[int, list]:
+    """
+    Messages containing the query as a phrase (diacritics ignored), newest first
+
+    Returns (total, rows); rows have message_id, session_id, role, content,
+    created_at, session_title, user_id, username and full_name.
+    """
+    terms = _query_terms(query)
+    if not terms:
+        return 0, []
+
+    dialect = db.get_bind().dialect.name
+    params = {"limit": limit, "offset": offset}
+    if dialect == "sqlite":
+        source = "chat_messages_fts f JOIN chat_messages m ON m.id = f.rowid"
+        condition = "chat_messages_fts MATCH :match"
+        params["match"] = '"' + " ".join(terms) + '"'
+    elif dialect == "postgresql":
+        source = "chat_message_search f JOIN chat_messages m ON m.id = f.message_id"
+        condition = "to_tsvector('simple', f.content_norm) @@ phraseto_tsquery('simple', :match)"
+        params["match"] = " ".join(terms)
+    else:
+        source = "chat_messages m"
+        condition = "m.content ILIKE :match"
+        params["match"] = f"%{query.strip()}%"
+    if role:
+        condition += " AND m.role = :role"
+        params["role"] = role
+
+    joins = f"{source} JOIN chat_sessions s ON s.id = m.session_id JOIN users u ON u.id = s.user_id"
+    total = db.execute(text(f"SELECT COUNT(*) FROM {joins} WHERE {condition}"), params).scalar()
+    rows = db.execute(text(f"""
+        SELECT m.id AS message_id, m.session_id, m.role, m.content, m.created_at,
+               s.title AS session_title, u.id AS user_id, u.username, u.full_name
+        FROM {joins}
+        WHERE {condition}
+        ORDER BY m.id DESC
+        LIMIT :limit OFFSET :offset
+    """), params).mappings().all()
+    return total, rows
+
+
+def make_snippet(content: str, query: str, width: int = 160) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Window of `content` around the first match, with (start, end) offsets of
+    every match inside the snippet (diacritic-insensitive, whole words)
+    """
+    terms = _query_terms(query)
+    normalized, offsets = normalize_with_offsets(content)
+    if not terms or not offsets:
+        return content[:width], []
+    pattern = re.compile(r'\b' + r'\s+'.join(re.escape(term) for term in terms) + r'\b')
+    matches = [(offsets[m.start()], offsets[m.end() - 1] + 1) for m in pattern.finditer(normalized)]
+    if not matches:
+        return content[:width], []
+
+    start = max(0, matches[0][0] - width // 3)
+    end = min(len(content), start + width)
+    start = max(0, end - width)
+    snippet = content[start:end]
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(content) else ""
+    shift = len(prefix) - start
+    highlights = [
+        (max(s, start) + shift, min(e, end) + shift)
+        for s, e in matches if s < end and e > start
+    ]
+    return prefix + snippet + suffix, highlights
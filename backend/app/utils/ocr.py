@@ -1,22 +1,33 @@
 """Gemini Vision OCR for PDF scans (optional)"""
 import os
+import time
 from io import BytesIO
 from typing import List
 from pdf2image import convert_from_path
 from PIL import Image
-import google.generativeai as genai
+from app.core.config import settings
+from app.services.admission import ConcurrencyLimiter, Priority, llm_slots
+from app.services.llm_provider import LLMProvider, get_llm_provider
+from app.services.usage import UsageRecorder, usage_recorder
 
 
 class GeminiVisionOCR:
     """Gemini Vision OCR for processing scanned PDFs"""
     
-    def __init__(self, api_key: str):
-        if not api_key:
-            raise ValueError("Gemini API Key is required for OCR")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-        print("✅ Gemini Vision OCR initialized")
+    def __init__(
+        self,
+        provider: LLMProvider,
+        key_index: int = 0,
+        slots: ConcurrencyLimiter = None,
+        usage: UsageRecorder = None
+    ):
+        self.provider = provider
+        self.key_index = key_index
+        self.usage = usage or usage_recorder
+        self.model_name = settings.GEMINI_OCR_MODEL
+        # Pages share the global LLM cap, queued behind chat (Priority.BACKGROUND)
+        self.slots = slots or llm_slots
+        print(f"✅ Gemini Vision OCR initialized ({provider.name})")
     
     def extract_text_from_image(self, image: Image.Image) -> str:
         """Extract text from image using Gemini Vision"""
@@ -32,7 +43,24 @@ Quy tắc:
 
 Text:"""
             
-            response = self.model.generate_content([prompt, image])
+            timeout = settings.LLM_OCR_TIMEOUT_SECONDS
+            start = time.monotonic()
+            try:
+                with self.slots.slot(Priority.BACKGROUND, timeout=timeout):
+                    response = self.provider.generate(
+                        self.key_index,
+                        [prompt, image],
+                        model_name=self.model_name,
+                        timeout=max(0.1, start + timeout - time.monotonic())
+                    )
+            except Exception as e:
+                self.usage.record("ocr", self.provider.name, self.key_index, time.monotonic() - start, error=e)
+                raise
+            self.usage.record(
+                "ocr", self.provider.name, self.key_index, time.monotonic() - start,
+                prompt_tokens=response.prompt_tokens,
+                completion_tokens=response.completion_tokens
+            )
             return response.text.strip()
         
         except Exception as e:
@@ -87,7 +115,7 @@ Text:"""
         return full_text
 
 
-def init_gemini_vision_ocr(api_key: str) -> GeminiVisionOCR:
+def init_gemini_vision_ocr(provider: LLMProvider = None) -> GeminiVisionOCR:
     """Initialize Gemini Vision OCR"""
-    return GeminiVisionOCR(api_key)
+    return GeminiVisionOCR(provider or get_llm_provider())
 
@@ -0,0 +1,252 @@
+"""
+Local risk screen for student messages
+Flags messages about suicide, self-harm, abuse, bullying or severe distress
+before any LLM call, so they can be scheduled first, tagged on the
+ChatMessage row and shown in the teacher alert feed.
+
+The lexicon is compiled into two Aho–Corasick automata (accented and
+unaccented via normalize_text), so a message is scanned once regardless of
+lexicon size. Words typed with diacritics are matched against the accented
+terms only ("từ từ" must not match "tự tử"); runs of words typed without
+diacritics are matched against the unaccented forms (ambiguous, but a false
+positive only means a teacher looks at one more message). Both happen for
+mixed messages such as "con muon chet, mệt quá" (autocorrect accents a word).
+"""
+import json
+import logging
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+HIGH = "high"
+MEDIUM = "medium"
+
+# Category -> severity; "high" messages are crisis messages
+CATEGORY_LEVELS = {
+    "suicide": HIGH,
+    "self_harm": HIGH,
+    "abuse": HIGH,
+    "bullying": MEDIUM,
+    "distress": MEDIUM,
+}
+
+RISK_LEXICON: Dict[str, List[str]] = {
+    "suicide": [
+        "tự tử", "tự sát", "muốn chết", "chỉ muốn chết", "thà chết", "chết quách",
+        "không muốn sống", "chán sống", "sống không nổi", "không thiết sống", "không muốn tồn tại",
+        "kết thúc cuộc đời", "kết liễu cuộc đời", "kết liễu bản thân", "tìm đến cái chết",
+        "nhảy lầu", "nhảy cầu", "nhảy sông", "treo cổ", "uống thuốc ngủ", "uống thuốc chuột",
+        "thư tuyệt mệnh", "ra đi mãi mãi", "không còn trên đời",
+        "suicide", "kill myself", "want to die", "end my life",
+    ],
+    "self_harm": [
+        "tự làm đau", "tự hại", "tự làm hại", "tự hành hạ", "làm đau bản thân",
+        "rạch tay", "cắt tay", "rạch cổ tay", "cắt cổ tay", "tự cắt", "tự rạch",
+        "đập đầu vào tường", "tự đánh mình", "tự cào",
+        "self harm", "cutting myself", "hurt myself",
+    ],
+    "abuse": [
+        "bị xâm hại", "xâm hại tình dục", "bị hiếp", "hiếp dâm", "cưỡng hiếp",
+        "bị sờ mó", "bị sàm sỡ", "quấy rối tình dục", "bị ép quan hệ", "bị dụ dỗ",
+        "bị đánh đập", "bị bạo hành", "bạo hành gia đình", "bị bố đánh", "bị mẹ đánh",
+        "bị ba đánh", "bị đánh chảy máu", "bị nhốt", "bị tống tiền", "bị bỏ đói",
+    ],
+    "bullying": [
+        "bắt nạt", "bị bắt nạt", "bạo lực học đường", "bị đánh hội đồng", "bị cô lập", "bị tẩy chay",
+        "bị đe dọa", "bị tung ảnh", "bị bêu xấu", "bị trấn tiền", "bị chửi bới", "bị miệt thị",
+    ],
+    "distress": [
+        "tuyệt vọng", "trầm cảm", "không lối thoát", "không còn hy vọng", "muốn biến mất",
+        "là gánh nặng", "không ai cần mình", "không ai thương mình", "vô dụng quá",
+        "hoảng loạn", "mất ngủ triền miên", "khóc mỗi đêm",
+    ],
+}
+
+
+class _PlainFold(dict):
+    """str.translate table giving each character's normalize_text form (computed once per character)"""
+
+    def __missing__(self, code: int) -> str:
+        self[code] = normalize_text(chr(code))
+        return self[code]
+
+
+_PLAIN_FOLD = _PlainFold()
+
+
+def _words(text: str) -> str:
+    """Lowercase words separated by single spaces, padded for whole-word matching"""
+    return " " + " ".join(re.sub(r'[^\w\s]', ' ', text.lower()).split()) + " "
+
+
+class AhoCorasick:
+    """
+    Aho–Corasick automaton over characters
+    Finds every occurrence of every pattern in one pass over the text.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: str):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node].append(len(self.patterns))
+        self.patterns.append(pattern)
+
+    def _link(self):
+        """Breadth-first failure links; outputs of the fail state are merged in"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text: str) -> List[Tuple[int, int]]:
+        """(end index, pattern index) of every match"""
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                matches.extend((index, pattern) for pattern in output[node])
+        return matches
+
+    def find_patterns(self, text: str) -> List[int]:
+        """Indexes of the distinct patterns found in text (cheaper than search)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        hits = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                hits.add(node)
+        return sorted({pattern for node in hits for pattern in output[node]})
+
+
+class RiskResult:
+    """Outcome of screening one message"""
+    __slots__ = ("level", "categories", "terms")
+
+    def __init__(self, level: Optional[str] = None, categories: List[str] = None, terms: List[str] = None):
+        self.level = level
+        self.categories = categories or []
+        self.terms = terms or []
+
+    @property
+    def is_crisis(self) -> bool:
+        return self.level == HIGH
+
+    def __bool__(self):
+        return self.level is not None
+
+    def __repr__(self):
+        return f"RiskResult(level={self.level!r}, categories={self.categories}, terms={self.terms})"
+
+
+class RiskScreener:
+    """Scans messages for lexicon terms (whole words, case-insensitive)"""
+
+    def __init__(self, lexicon: Dict[str, List[str]] = None):
+        lexicon = lexicon or RISK_LEXICON
+        self.entries: List[Tuple[str, str]] = []  # (category, term) per pattern index
+        accented, plain = [], []
+        for category, terms in lexicon.items():
+            for term in terms:
+                self.entries.append((category, term))
+                accented.append(_words(unicodedata.normalize('NFC', term)))
+                plain.append(_words(normalize_text(term)))
+        self._accented = AhoCorasick(accented)
+        self._plain = AhoCorasick(plain)
+
+    @classmethod
+    def from_settings(cls) -> "RiskScreener":
+        """Built-in lexicon, extended by the JSON file at RISK_LEXICON_PATH if set"""
+        lexicon = {category: list(terms) for category, terms in RISK_LEXICON.items()}
+        if settings.RISK_LEXICON_PATH:
+            try:
+                with open(settings.RISK_LEXICON_PATH, encoding="utf-8") as f:
+                    for category, terms in json.load(f).items():
+                        lexicon.setdefault(category, []).extend(terms)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Could not load risk lexicon {settings.RISK_LEXICON_PATH}: {e}")
+        return cls(lexicon)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _plain_matches(self, words: str, found: set) -> set:
+        """Unaccented terms in a mixed message, unless every word they span carries diacritics"""
+        candidates = set(self._plain.find_patterns(words.translate(_PLAIN_FOLD))) - found
+        if not candidates:
+            return candidates
+        tokens = words.split()
+        plain_tokens = [token.translate(_PLAIN_FOLD) for token in tokens]
+        accented_at = []  # Per character of the padded plain text; spaces don't count
+        for token, plain in zip(tokens, plain_tokens):
+            accented_at.append(True)
+            accented_at.extend([not token.isascii()] * len(plain))
+        accented_at.append(True)
+        patterns = set()
+        for end, pattern in self._plain.search(" " + " ".join(plain_tokens) + " "):
+            if pattern in candidates and not all(accented_at[end - len(self._plain.patterns[pattern]) + 2:end]):
+                patterns.add(pattern)
+        return patterns
+
+    def screen(self, text: str) -> RiskResult:
+        words = _words(unicodedata.normalize('NFC', text))
+        if words.isascii():  # Typed without diacritics
+            patterns = self._plain.find_patterns(words)
+        else:
+            found = set(self._accented.find_patterns(words))
+            patterns = sorted(found | self._plain_matches(words, found))
+        if not patterns:
+            return RiskResult()
+
+        categories, terms = [], []
+        for pattern in patterns:
+            category, term = self.entries[pattern]
+            if category not in categories:
+                categories.append(category)
+            if term not in terms:
+                terms.append(term)
+        levels = [CATEGORY_LEVELS.get(category, MEDIUM) for category in categories]
+        return RiskResult(HIGH if HIGH in levels else MEDIUM, sorted(categories), terms)
+
+
+# Global instance
+risk_screener = RiskScreener.from_settings()
+
+
+def is_crisis_message(text: str) -> bool:
+    """True if the message contains a high-severity term"""
+    return risk_screener.screen(text).is_crisis
@@ -0,0 +1,80 @@
+"""Single-flight request coalescing for identical concurrent calls"""
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict
+from app.core.metrics import record_cache_lookup
+
+
+def normalize_request_key(text: str) -> str:
+    """
+    Normalize a user message into a coalescing key
+    Case, Unicode form, surrounding punctuation and repeated spaces are ignored
+    """
+    text = unicodedata.normalize('NFC', text).lower()
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip(" .,!?;:…\"'")
+
+
+class _Call:
+    """An in-flight computation shared by all callers with the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run a function at most once at a time per key
+
+    Callers arriving while a call for the same key is running wait for it
+    and receive its result (or exception) instead of running their own.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name  # cache label in metrics; a coalesced call counts as a hit
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+        record_cache_lookup(self.name, not leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+        }
@@ -0,0 +1,26 @@
+"""Vietnamese text normalization shared by the retrieval gate and message search"""
+import re
+import unicodedata
+from typing import List, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip diacritics (đ → d) and punctuation"""
+    text = unicodedata.normalize('NFD', text.lower())
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = text.replace('đ', 'd')
+    return re.sub(r'[^\w\s]', ' ', text)
+
+
+def normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """
+    normalize_text, plus the index in `text` of every normalized character
+    
+    Lets matches found in normalized text be highlighted in the original.
+    """
+    chars, offsets = [], []
+    for index, char in enumerate(text):
+        for piece in normalize_text(char):
+            chars.append(piece)
+            offsets.append(index)
+    return ''.join(chars), offsets
@@ -1,11 +1,11 @@
 """Initialize database tables"""
-from app.core.database import engine, Base
+from app.core.database import ensure_schema
 from app.models.models import User, ChatSession, ChatMessage, SchoolDocument, DocumentChunk
 
 print("🔧 Creating database tables...")
 
 # Create all tables
-Base.metadata.create_all(bind=engine)
+ensure_schema()
 
 print("✅ Database tables created successfully!")
 print("\nTables created:")
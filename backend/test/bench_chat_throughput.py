@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat throughput of our own stack with the fake LLM provider
+No API keys or network needed - Gemini latency is simulated
+
+Usage:
+    python test/bench_chat_throughput.py --users 20 --messages 10 --latency-ms 800
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chat throughput benchmark (fake LLM)")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent students")
+    parser.add_argument("--messages", type=int, default=10, help="Messages per student")
+    parser.add_argument("--latency-ms", type=float, default=800, help="Median fake LLM latency")
+    parser.add_argument("--distribution", default="lognormal", help="fixed | uniform | lognormal")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Configure before importing the app
+    db_dir = tempfile.mkdtemp(prefix="bench_chat_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_dir}/bench.db"
+    os.environ["SECRET_KEY"] = "bench-secret"
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_LATENCY_DISTRIBUTION"] = args.distribution
+    os.environ["FAKE_LLM_QUOTA_ERROR_RATE"] = str(args.quota_error_rate)
+    os.environ["SUMMARIZER"] = "stub"
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")  # Measure the pipeline, not the per-student limit
+    os.environ.setdefault("LLM_MAX_CONCURRENT_CALLS", "0")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from fastapi.testclient import TestClient
+    from app.core.database import ensure_schema
+    from app.main import app
+
+    ensure_schema()  # Normally done by the app's lifespan
+    client = TestClient(app)
+
+    print("╔═══════════════════════════════════════════════════════════╗")
+    print("║   ⚡ CHAT THROUGHPUT BENCHMARK (fake LLM provider)        ║")
+    print("╚═══════════════════════════════════════════════════════════╝\n")
+    print(f"👥 Users: {args.users}, 💬 messages/user: {args.messages}, "
+          f"⏱️ LLM latency: {args.latency_ms:.0f}ms ({args.distribution})\n")
+
+    # Register students and open one session each
+    tokens = []
+    for i in range(args.users):
+        resp = client.post("/api/auth/register", json={
+            "username": f"bench_{i}",
+            "email": f"bench_{i}@example.com",
+            "password": "bench123",
+            "role": "student"
+        })
+        token = resp.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        session_id = client.post("/api/chat/sessions", json={}, headers=headers).json()["id"]
+        tokens.append((headers, session_id))
+
+    def run_user(user):
+        headers, session_id = user
+        latencies = []
+        for n in range(args.messages):
+            start = time.perf_counter()
+            resp = client.post(
+                f"/api/chat/sessions/{session_id}/messages",
+                json={"content": f"Con thấy áp lực học tập quá, lần {n}"},
+                headers=headers
+            )
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        results = list(pool.map(run_user, tokens))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(lat for user in results for lat in user)
+    total = len(latencies)
+
+    def pct(p):
+        return latencies[min(total - 1, int(p / 100 * total))] * 1000
+
+    print(f"✅ {total} messages in {elapsed:.2f}s → {total / elapsed:.1f} msg/s")
+    print(f"   latency p50 {pct(50):.0f}ms | p95 {pct(95):.0f}ms | p99 {pct(99):.0f}ms "
+          f"| mean {statistics.mean(latencies) * 1000:.0f}ms")
+    print(f"   overhead vs LLM median: {statistics.median(latencies) * 1000 - args.latency_ms:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
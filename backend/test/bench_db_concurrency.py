@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark the database write path of send_message under concurrency
+Compares engine profiles ("default" SQLAlchemy settings vs "tuned") on a
+temporary SQLite file, and on PostgreSQL if --postgres-url is given.
+Writers save user + assistant messages through send_message's own save
+path; readers list sessions at the same time. No LLM calls are made.
+
+Usage:
+    python test/bench_db_concurrency.py --writers 16 --readers 4 --messages 50
+    python test/bench_db_concurrency.py --postgres-url postgresql://user:pw@localhost/bench
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Database concurrency benchmark")
+    parser.add_argument("--writers", type=int, default=16, help="Concurrent students sending messages")
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent session list readers")
+    parser.add_argument("--messages", type=int, default=50, help="Messages per writer")
+    parser.add_argument("--postgres-url", help="Also benchmark this (empty) PostgreSQL database")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from datetime import datetime
+    from sqlalchemy.orm import sessionmaker
+    from app.core.database import Base, create_db_engine
+    from app.models.models import User, ChatSession, ChatMessage
+    from app.routers.chat_router import _save_messages
+
+    def run(database_url, profile):
+        engine = create_db_engine(database_url, profile)
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        db = Session()
+        sessions = []
+        for i in range(args.writers):
+            user = User(email=f"w{i}@example.com", username=f"w{i}", hashed_password="x")
+            db.add(user)
+            db.flush()
+            session = ChatSession(user_id=user.id)
+            db.add(session)
+            db.flush()
+            sessions.append((user.id, session.id))
+        db.commit()
+        db.close()
+
+        errors = []
+        done = threading.Event()
+
+        def writer(ids):
+            user_id, session_id = ids
+            db = Session()
+            try:
+                for n in range(args.messages):
+                    try:
+                        db.get(ChatSession, session_id)
+                        db.query(ChatMessage.role, ChatMessage.content).filter(
+                            ChatMessage.session_id == session_id
+                        ).order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(10).all()
+                        db.commit()  # The LLM call happens here, outside any transaction
+                        user_message = ChatMessage(
+                            session_id=session_id, role="user", content=f"Con buồn lần {n}", created_at=datetime.utcnow()
+                        )
+                        ai_message = ChatMessage(
+                            session_id=session_id, role="assistant", content="Cô hiểu. " * 20, created_at=datetime.utcnow()
+                        )
+                        _save_messages(db, session_id, (user_id, True), [user_message, ai_message])
+                        db.commit()
+                    except Exception as e:
+                        db.rollback()
+                        errors.append(type(e).__name__)
+            finally:
+                db.close()
+
+        def reader(user_id):
+            db = Session()
+            reads = 0
+            try:
+                while not done.is_set():
+                    db.query(ChatSession.id, ChatSession.message_count, ChatSession.last_message_preview).filter(
+                        ChatSession.user_id == user_id
+                    ).order_by(ChatSession.updated_at.desc()).limit(100).all()
+                    db.commit()
+                    reads += 1
+            except Exception as e:
+                errors.append(type(e).__name__)
+            finally:
+                db.close()
+            return reads
+
+        with ThreadPoolExecutor(max_workers=args.readers) as read_pool:
+            read_futures = [read_pool.submit(reader, sessions[i % len(sessions)][0]) for i in range(args.readers)]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.writers) as write_pool:
+                list(write_pool.map(writer, sessions))
+            elapsed = time.perf_counter() - start
+            done.set()
+            reads = sum(future.result() for future in read_futures)
+
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        messages = args.writers * args.messages * 2 - 2 * len(errors)
+        return messages / elapsed, reads / elapsed, errors
+
+    targets = [("sqlite", f"sqlite:///{tempfile.mkdtemp(prefix='bench_db_')}/bench.db")]
+    if args.postgres_url:
+        targets.append(("postgresql", args.postgres_url))
+
+    print("╔═══════════════════════════════════════════════════════════╗")
+    print("║   🗄️ DATABASE CONCURRENCY BENCHMARK (send_message writes)  ║")
+    print("╚═══════════════════════════════════════════════════════════╝\n")
+    print(f"✍️ Writers: {args.writers} x {args.messages} messages, 👀 readers: {args.readers}\n")
+    print(f"{'database':>10} | {'profile':>8} | {'messages/s':>10} | {'reads/s':>9} | errors")
+    print("-" * 60)
+    for name, url in targets:
+        for profile in ("default", "tuned"):
+            messages_per_sec, reads_per_sec, errors = run(url, profile)
+            error_text = f"{len(errors)} ({', '.join(sorted(set(errors)))})" if errors else "0"
+            print(f"{name:>10} | {profile:>8} | {messages_per_sec:>10.0f} | {reads_per_sec:>9.0f} | {error_text}")
+
+
+if __name__ == "__main__":
+    main()
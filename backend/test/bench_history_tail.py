@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark loading chat history for send_message
+Full ascending load (old behaviour) vs the tail query (ORDER BY DESC LIMIT n)
+on sessions of 10, 1k and 10k messages, in a temporary SQLite database
+
+Usage:
+    python test/bench_history_tail.py --sizes 10 1000 10000 --repeat 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="History tail benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000], help="Messages per session")
+    parser.add_argument("--repeat", type=int, default=50, help="Loads per measurement")
+    parser.add_argument("--window", type=int, default=10, help="History messages sent to the LLM")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="bench_history_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_dir}/bench.db"
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ["LLM_PROVIDER"] = "fake"  # Importing the router builds the Gemini service
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app.core.database import SessionLocal, ensure_schema
+    from app.models.models import User, ChatSession, ChatMessage
+    from app.routers.chat_router import load_history_tail
+
+    ensure_schema()
+    db = SessionLocal()
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    db.add(user)
+    db.commit()
+
+    # Seed one session per size
+    sessions = {}
+    start_time = datetime(2024, 1, 1)
+    for size in args.sizes:
+        session = ChatSession(user_id=user.id, message_count=size)
+        db.add(session)
+        db.flush()
+        db.bulk_insert_mappings(ChatMessage, [
+            {
+                "session_id": session.id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"Tin nhắn số {i}: " + "con thấy áp lực học tập quá " * 10,
+                "created_at": start_time + timedelta(seconds=i),
+            }
+            for i in range(size)
+        ])
+        sessions[size] = session.id
+    db.commit()
+
+    def full_load(session_id):
+        chat_history = db.query(ChatMessage).filter(
+            ChatMessage.session_id == session_id
+        ).order_by(ChatMessage.created_at.asc()).all()
+        history = [{"role": msg.role, "content": msg.content} for msg in chat_history[:-1]]
+        db.expunge_all()
+        return history[-args.window:]
+
+    def tail_load(session_id):
+        return load_history_tail(db, session_id, limit=args.window)
+
+    def measure(load, session_id):
+        load(session_id)  # Warm up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            load(session_id)
+        return (time.perf_counter() - start) / args.repeat * 1000
+
+    print("╔═══════════════════════════════════════════════════════════╗")
+    print("║   📜 HISTORY LOAD BENCHMARK (send_message)                ║")
+    print("╚═══════════════════════════════════════════════════════════╝\n")
+    print(f"{'messages':>10} | {'full load':>12} | {'tail query':>12} | speedup")
+    print("-" * 56)
+    for size, session_id in sessions.items():
+        full_ms = measure(full_load, session_id)
+        tail_ms = measure(tail_load, session_id)
+        print(f"{size:>10} | {full_ms:>10.2f}ms | {tail_ms:>10.3f}ms | {full_ms / tail_ms:>6.1f}x")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
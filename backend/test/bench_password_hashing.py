@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput under a burst (start of a class period)
+Runs concurrent /api/auth/login requests against a temporary SQLite database
+for each bcrypt pool size, while a probe hits a cheap endpoint to show how
+much the burst delays other traffic. Each pool size runs in a subprocess
+because the pool is built from settings at import time.
+
+Usage:
+    python test/bench_password_hashing.py --logins 64 --concurrency 32 --workers 0 1 2 4
+    python test/bench_password_hashing.py --rounds 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Password hashing benchmark")
+    parser.add_argument("--logins", type=int, default=64, help="Logins in the burst")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4], help="PASSWORD_HASH_WORKERS values (0 = inline)")
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def run_one(args):
+    """Burst of logins in this process, using the environment's settings"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench_hash_')}/bench.db"
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from fastapi.testclient import TestClient
+    from app.core.database import ensure_schema
+    from app.main import app
+
+    ensure_schema()  # Normally done by the app's lifespan
+    client = TestClient(app)
+    credentials = {"username": "hs", "password": "matkhau123"}
+    client.post("/api/auth/register", json={**credentials, "email": "hs@example.com", "role": "student"})
+
+    done = threading.Event()
+    probe_latencies = []
+
+    def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get("/")
+            probe_latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    def login(_):
+        start = time.perf_counter()
+        response = client.post("/api/auth/login", json=credentials)
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    probe_thread.join()
+
+    latencies = [latency for latency, _ in results]
+    print(json.dumps({
+        "logins_per_sec": args.logins / elapsed,
+        "login_p95_ms": percentile(latencies, 95),
+        "probe_p50_ms": percentile(probe_latencies, 50),
+        "probe_p95_ms": percentile(probe_latencies, 95),
+        "errors": sum(1 for _, code in results if code != 200),
+    }))
+
+
+def main():
+    args = parse_args()
+    if args.run_one:
+        run_one(args)
+        return
+
+    print("╔═══════════════════════════════════════════════════════════╗")
+    print("║        🔐 PASSWORD HASHING BENCHMARK (login burst)         ║")
+    print("╚═══════════════════════════════════════════════════════════╝\n")
+    print(f"🔑 {args.logins} logins, {args.concurrency} concurrent clients, bcrypt rounds {args.rounds}, {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8} | {'logins/s':>8} | {'login p95':>9} | {'probe p50':>9} | {'probe p95':>9} | errors")
+    print("-" * 66)
+    for workers in args.workers:
+        env = dict(os.environ, PASSWORD_HASH_WORKERS=str(workers), BCRYPT_ROUNDS=str(args.rounds))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-one",
+             "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        label = "inline" if workers == 0 else str(workers)
+        print(f"{label:>8} | {result['logins_per_sec']:>8.1f} | {result['login_p95_ms']:>7.0f}ms | "
+              f"{result['probe_p50_ms']:>7.1f}ms | {result['probe_p95_ms']:>7.1f}ms | {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold start: import time, lifespan startup and first request
+Each run is a fresh interpreter against a new SQLite database, like a new
+replica on the autoscaler. Reports the median of --runs and which heavy
+modules got imported; with --max-import-ms / --max-ready-ms it exits 1 on a
+regression so it can run in CI.
+
+Usage:
+    python test/bench_startup.py --runs 5
+    python test/bench_startup.py --runs 3 --max-import-ms 2500 --max-ready-ms 4000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Modules that must only be imported when a feature first needs them
+HEAVY_MODULES = ("google.generativeai", "langchain", "PyPDF2", "tiktoken", "pdf2image")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to measure")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if median import time exceeds this")
+    parser.add_argument("--max-ready-ms", type=float, default=None, help="Fail if median time to first response exceeds this")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def run_one():
+    """Time one cold start in this process and print the numbers as JSON"""
+    start = time.perf_counter()
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.main import app
+    imported = time.perf_counter()
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        client.get("/")
+        ready = time.perf_counter()
+
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "lifespan_ms": (started - imported) * 1000,
+        "ready_ms": (ready - start) * 1000,
+        "heavy_modules": heavy,
+    }))
+
+
+def main():
+    args = parse_args()
+    if args.run_one:
+        run_one()
+        return
+
+    print("╔═══════════════════════════════════════════════════════════╗")
+    print("║             🚀 COLD START BENCHMARK                       ║")
+    print("╚═══════════════════════════════════════════════════════════╝\n")
+
+    results = []
+    for run in range(args.runs):
+        db_dir = tempfile.mkdtemp(prefix="bench_startup_")
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{db_dir}/bench.db",
+            "SECRET_KEY": os.environ.get("SECRET_KEY", "bench-secret"),
+        }
+        wall_start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-one"],
+            env=env, cwd=db_dir, capture_output=True, text=True, check=True
+        ).stdout
+        wall_ms = (time.perf_counter() - wall_start) * 1000
+        result = json.loads(output.strip().splitlines()[-1])
+        result["process_ms"] = wall_ms
+        results.append(result)
+        print(f"   run {run + 1}: import {result['import_ms']:.0f}ms, ready {result['ready_ms']:.0f}ms, "
+              f"process {wall_ms:.0f}ms")
+
+    def median(key):
+        return statistics.median(result[key] for result in results)
+
+    print("\n📊 Median over", args.runs, "runs")
+    print(f"   import app.main:        {median('import_ms'):8.0f} ms")
+    print(f"   lifespan startup:       {median('lifespan_ms'):8.0f} ms")
+    print(f"   import → first reply:   {median('ready_ms'):8.0f} ms")
+    print(f"   whole process:          {median('process_ms'):8.0f} ms")
+    heavy = sorted({name for result in results for name in result["heavy_modules"]})
+    print(f"   heavy modules at import: {', '.join(heavy) or 'none'}")
+
+    failures = []
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+    if args.max_import_ms is not None and median("import_ms") > args.max_import_ms:
+        failures.append(f"import took {median('import_ms'):.0f}ms > {args.max_import_ms:.0f}ms")
+    if args.max_ready_ms is not None and median("ready_ms") > args.max_ready_ms:
+        failures.append(f"first reply took {median('ready_ms'):.0f}ms > {args.max_ready_ms:.0f}ms")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("\n✅ Cold start within limits")
+
+
+if __name__ == "__main__":
+    main()
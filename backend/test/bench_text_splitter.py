@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark document chunking: langchain vs the built-in splitters
+Synthetic Vietnamese regulations text (paragraphs, numbered articles,
+abbreviations) and a worst case with no separators at all, which forces
+splitting down to single characters. ns/char staying flat as the input
+grows means linear time. langchain is only timed if it is installed.
+
+Usage:
+    python test/bench_text_splitter.py --sizes 100000 1000000 5000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+WORDS = (
+    "học sinh thí sinh phải có mặt tại phòng thi đúng giờ quy định mang theo thẻ dự thi "
+    "không được sử dụng điện thoại giáo viên coi thi lập biên bản trường THPT TP. Hồ Chí Minh "
+    "ThS. Nguyễn Văn An hội đồng kết quả điểm bài làm bị hủy v.v."
+).split()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Text splitter benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000, 5000000], help="Input sizes (chars)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="CHUNK_SIZE")
+    parser.add_argument("--chunk-overlap", type=int, default=200, help="CHUNK_OVERLAP")
+    return parser.parse_args()
+
+
+def regulations_text(length: int, rng: random.Random) -> str:
+    parts = []
+    total = 0
+    article = 0
+    while total < length:
+        article += 1
+        sentences = []
+        for _ in range(rng.randint(5, 60)):  # Long paragraphs get split at sentence level
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 25)))
+            sentences.append(sentence.capitalize() + rng.choice([".", ".", "!", "?", "; và", ","]))
+        text = f"Điều {article}. Quy định chung.\n1. " + " ".join(sentences) + "\n\n"
+        parts.append(text)
+        total += len(text)
+    return "".join(parts)[:length]
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app.services.text_splitter import DEFAULT_SEPARATORS, RecursiveTextSplitter, VietnameseTextSplitter
+
+    splitters = {
+        "recursive": RecursiveTextSplitter(args.chunk_size, args.chunk_overlap),
+        "vietnamese": VietnameseTextSplitter(args.chunk_size, args.chunk_overlap),
+    }
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        splitters = {
+            "langchain": RecursiveCharacterTextSplitter(
+                chunk_size=args.chunk_size,
+                chunk_overlap=args.chunk_overlap,
+                length_function=len,
+                separators=list(DEFAULT_SEPARATORS),
+            ),
+            **splitters,
+        }
+    except ImportError:
+        print("⚠️ langchain not installed - timing the built-in splitters only\n")
+
+    print("╔═══════════════════════════════════════════════════════════╗")
+    print("║            ✂️  TEXT SPLITTER BENCHMARK                     ║")
+    print("╚═══════════════════════════════════════════════════════════╝\n")
+    print(f"{'input':>13} | {'chars':>9} | {'splitter':>10} | {'ms':>8} | {'ns/char':>7} | chunks | same as langchain")
+    print("-" * 84)
+    rng = random.Random(42)
+    for size in args.sizes:
+        inputs = {
+            "regulations": regulations_text(size, rng),
+            "no spaces": "".join(rng.choice("abcdeghiklmnopqrstuvxy") for _ in range(size)),
+        }
+        for name, text in inputs.items():
+            reference = None
+            for splitter_name, splitter in splitters.items():
+                start = time.perf_counter()
+                chunks = splitter.split_text(text)
+                elapsed = time.perf_counter() - start
+                if splitter_name == "langchain":
+                    reference = chunks
+                same = "" if reference is None or splitter_name == "langchain" else ("yes" if chunks == reference else "no")
+                print(f"{name:>13} | {size:>9} | {splitter_name:>10} | {elapsed * 1000:>8.0f} | "
+                      f"{elapsed / size * 1e9:>7.0f} | {len(chunks):>6} | {same}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
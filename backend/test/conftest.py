@@ -0,0 +1,148 @@
+"""
+Shared pytest setup: environment, a fresh SQLite database per test and the
+real app on top of it with fake LLM keys
+
+Databases live under pytest's tmp_path, so nothing is left in /tmp beyond
+pytest's own few most recent runs.
+"""
+import os
+import sys
+from contextlib import ExitStack, contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.core.database import Base, create_db_engine, get_db
+from app.core.security import principal_cache
+from app.main import app
+from app.models.models import ChatMessage, ChatSession
+from app.routers import chat_router
+from app.services.admission import ConcurrencyLimiter, TokenBucketLimiter
+from app.services.gemini import GeminiService, get_gemini_service
+from app.services.llm_provider import FakeKey, FakeProvider
+from app.services.rag import RAGService
+from app.services.usage import UsageRecorder
+
+# Scripts that need a running server and real documents, not pytest tests
+collect_ignore = ["test_chat_history.py", "test_ocr_rag.py"]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine on an empty database with every table created"""
+    engine = create_db_engine(f"sqlite:///{tmp_path}/test.db")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
+
+
+class ChatAPI:
+    """TestClient plus direct access to the database behind it"""
+
+    def __init__(self, http: TestClient, session_factory, gemini: GeminiService):
+        self.http = http
+        self.Session = session_factory
+        self.gemini = gemini
+
+    def register(self, username: str, role: str = "student") -> dict:
+        response = self.http.post("/api/auth/register", json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "test123",
+            "role": role,
+            "full_name": username.title()
+        })
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def new_session(self, headers: dict) -> int:
+        return self.http.post("/api/chat/sessions", json={}, headers=headers).json()["id"]
+
+    def send(self, session_id: int, content: str, headers: dict):
+        return self.http.post(f"/api/chat/sessions/{session_id}/messages", json={"content": content}, headers=headers)
+
+    def messages(self, session_id: int) -> list:
+        with self.Session() as db:
+            return db.query(ChatMessage).filter(ChatMessage.session_id == session_id).order_by(ChatMessage.id).all()
+
+    def chat_session(self, session_id: int) -> ChatSession:
+        with self.Session() as db:
+            return db.get(ChatSession, session_id)
+
+    def alerts(self, headers: dict) -> list:
+        response = self.http.get("/api/teacher/alerts", headers=headers)
+        assert response.status_code == 200, response.text
+        return [item["content"] for item in response.json()["items"]]
+
+
+@contextmanager
+def _chat_api(session_factory, keys=None, slots: ConcurrencyLimiter = None, provider: FakeProvider = None, **overrides):
+    gemini = GeminiService(
+        provider=provider or FakeProvider(keys or [FakeKey()]),
+        usage=UsageRecorder(session_factory),
+        slots=slots or ConcurrencyLimiter(max_concurrent=0),
+        rag=RAGService()
+    )
+
+    def get_test_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    overrides = {"SUMMARY_ENABLED": False, **overrides}
+    saved_settings = {name: getattr(settings, name) for name in overrides}
+    saved_limiters = (chat_router.rate_limiter, chat_router.crisis_rate_limiter)
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    chat_router.rate_limiter = TokenBucketLimiter()
+    chat_router.crisis_rate_limiter = TokenBucketLimiter(settings.RATE_LIMIT_CRISIS_BURST, settings.RATE_LIMIT_CRISIS_PER_MINUTE)
+    app.dependency_overrides = {get_db: get_test_db, get_gemini_service: lambda: gemini}
+    principal_cache.clear()  # User ids repeat across test databases
+    try:
+        yield ChatAPI(TestClient(app), session_factory, gemini)
+    finally:
+        app.dependency_overrides = {}
+        chat_router.rate_limiter, chat_router.crisis_rate_limiter = saved_limiters
+        for name, value in saved_settings.items():
+            setattr(settings, name, value)
+        gemini.close()
+
+
+@pytest.fixture
+def make_client(session_factory):
+    """
+    make_client(keys=None, slots=None, provider=None, **overrides) -> ChatAPI
+
+    The app on this test's database, with its own limiters and fake LLM keys;
+    overrides are settings applied until the test ends (the rate limiters are
+    built from them).
+    """
+    with ExitStack() as stack:
+        yield lambda *args, **kwargs: stack.enter_context(_chat_api(session_factory, *args, **kwargs))
+
+
+@pytest.fixture
+def client(make_client) -> ChatAPI:
+    """The app with default settings and one fake LLM key"""
+    return make_client()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Evaluate the retrieval gate against logged student messages
+
+Labels come from a JSONL file ({"message": ..., "retrieve": true}) or, by
+default, from the real retriever: a logged message counts as needing RAG
+when search_chunks finds at least one chunk above the threshold.
+
+Usage:
+    python test/eval_retrieval_gate.py                    # last 1000 logged messages
+    python test/eval_retrieval_gate.py --labels gate.jsonl
+    python test/eval_retrieval_gate.py --train gate_model.json   # then set RETRIEVAL_GATE_MODEL_PATH
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models.models import ChatMessage
+from app.services.intent import NaiveBayesIntentClassifier, RetrievalGate
+from app.services.rag import RAGService
+
+
+def load_labels(path):
+    with open(path, encoding="utf-8") as f:
+        return [(row["message"], bool(row["retrieve"])) for row in map(json.loads, f) if row]
+
+
+def label_logged_messages(limit):
+    """Use search_chunks as the oracle for logged user messages"""
+    db = SessionLocal()
+    rag = RAGService()
+    try:
+        messages = db.query(ChatMessage.content).filter(
+            ChatMessage.role == "user"
+        ).order_by(ChatMessage.id.desc()).limit(limit).all()
+        return [(content, bool(rag.search_chunks(content, db, top_k=3))) for (content,) in messages]
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the RAG retrieval gate")
+    parser.add_argument("--labels", help="JSONL file with message/retrieve labels")
+    parser.add_argument("--limit", type=int, default=1000, help="Logged messages to label")
+    parser.add_argument("--train", help="Train the naive Bayes classifier and save it here")
+    args = parser.parse_args()
+
+    samples = load_labels(args.labels) if args.labels else label_logged_messages(args.limit)
+    if not samples:
+        print("⚠️ No messages to evaluate")
+        return
+
+    print("=" * 60)
+    print(f"🚦 Retrieval gate evaluation on {len(samples)} messages")
+    print("=" * 60)
+
+    classifier = None
+    if args.train:
+        classifier = NaiveBayesIntentClassifier.train(samples)
+        classifier.save(args.train)
+        print(f"💾 Classifier saved to {args.train}")
+
+    for name, gate in [("rules", RetrievalGate()), ("rules + classifier", RetrievalGate(classifier))]:
+        if name != "rules" and classifier is None:
+            continue
+        report = gate.evaluate(samples)
+        print(f"\n📊 {name}")
+        print(f"   skip rate {report['skip_rate']:.1%} | recall {report['recall']:.1%} "
+              f"| precision {report['precision']:.1%} | accuracy {report['accuracy']:.1%}")
+        print(f"   confusion {report['confusion']}")
+        print(f"   reasons {report['reasons']}")
+        for message in report["missed"][:5]:
+            print(f"   ❌ skipped but relevant: {message[:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Test admission control: per-user token buckets and the LLM concurrency cap
+No server or API key needed
+"""
+import threading
+import time
+
+from PIL import Image
+from app.services.admission import ConcurrencyLimiter, Priority, SQLiteTokenBucketLimiter, TokenBucketLimiter
+from app.services.llm_provider import FakeKey, FakeProvider
+from app.services.resilience import LLMBusyError
+from app.services.usage import UsageRecorder
+from app.utils.ocr import GeminiVisionOCR
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(capacity=3, per_minute=6, clock=clock)
+    assert [limiter.acquire(1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire(1) == 10.0  # One token every 10 seconds
+    assert limiter.acquire(2) == 0.0  # Other students have their own bucket
+    clock.now += 10
+    assert limiter.acquire(1) == 0.0
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_sqlite_buckets_are_shared_between_limiters(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    clock = FakeClock()
+    worker_a = SQLiteTokenBucketLimiter(path, capacity=2, per_minute=6, clock=clock)
+    worker_b = SQLiteTokenBucketLimiter(path, capacity=2, per_minute=6, clock=clock)
+    assert worker_a.acquire(7) == 0.0
+    assert worker_b.acquire(7) == 0.0
+    assert worker_a.acquire(7) > 0
+
+
+def test_concurrency_cap_queues_then_rejects():
+    slots = ConcurrencyLimiter(max_concurrent=1, queue_timeout=0.2)
+    release = threading.Event()
+
+    def hold():
+        with slots.slot():
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.05)
+    try:
+        with slots.slot():
+            assert False, "second call must not get a slot"
+    except LLMBusyError:
+        pass
+
+    threading.Timer(0.05, release.set).start()
+    with slots.slot():  # Waits for the holder, then runs
+        pass
+    holder.join()
+    stats = slots.stats()
+    assert stats["rejected"] == 1 and stats["queued"] == 2 and stats["peak_in_flight"] == 1
+
+
+def test_crisis_waiters_are_served_first():
+    slots = ConcurrencyLimiter(max_concurrent=1, queue_timeout=2.0, reserved_for_crisis=0)
+    order = []
+
+    def call(name, priority):
+        with slots.slot(priority):
+            order.append(name)
+
+    slots.acquire()
+    waiters = [
+        threading.Thread(target=call, args=("background", Priority.BACKGROUND)),
+        threading.Thread(target=call, args=("chat", Priority.CHAT)),
+        threading.Thread(target=call, args=("crisis", Priority.CRISIS)),
+    ]
+    for waiter in waiters:
+        waiter.start()
+        time.sleep(0.05)
+    assert slots.stats()["waiting"] == 3
+    slots.release()
+    for waiter in waiters:
+        waiter.join()
+    assert order == ["crisis", "chat", "background"]
+    assert slots.stats()["classes"]["crisis"]["queue_wait_p95_ms"] is not None
+
+
+def test_reserved_slots_admit_crisis_when_chat_is_full():
+    slots = ConcurrencyLimiter(max_concurrent=2, queue_timeout=0.1, reserved_for_crisis=1)
+    slots.acquire(Priority.CHAT)
+    try:
+        slots.acquire(Priority.CHAT)
+        assert False, "the last slot is reserved for crisis messages"
+    except LLMBusyError:
+        pass
+    slots.acquire(Priority.CRISIS)  # Starts immediately
+    assert slots.stats()["in_flight"] == 2
+    assert slots.stats()["classes"]["chat"]["rejected"] == 1
+
+
+def test_ocr_pages_take_background_slots():
+    slots = ConcurrencyLimiter(max_concurrent=1, queue_timeout=5.0, reserved_for_crisis=0)
+    key = FakeKey(reply="Điều 1. Quy định chung")
+    ocr = GeminiVisionOCR(FakeProvider([key]), slots=slots, usage=UsageRecorder(enabled=False))
+    page = Image.new("RGB", (8, 8))
+
+    pages = []
+    slots.acquire(Priority.CHAT)  # A chat reply holds the only slot
+    reader = threading.Thread(target=lambda: pages.append(ocr.extract_text_from_image(page)))
+    reader.start()
+    time.sleep(0.05)
+    assert key.calls == 0 and slots.stats()["classes"]["background"]["waiting"] == 1
+    slots.release()
+    reader.join()
+    assert pages == ["Điều 1. Quy định chung"] and key.calls == 1
+    assert slots.stats()["classes"]["background"]["admitted"] == 1
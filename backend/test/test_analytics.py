@@ -0,0 +1,91 @@
+"""
+Test the daily analytics rollups and their rebuild from chat history
+Uses a temporary SQLite database - no server needed
+"""
+from datetime import date, datetime, timedelta
+
+from app.models.models import ChatMessage, ChatSession, DailyActivity, StudentDailyActivity, User
+from app.services import analytics
+
+MONDAY = date(2026, 10, 12)
+TUESDAY = MONDAY + timedelta(days=1)
+
+
+def rollups(db) -> dict:
+    return {
+        "daily": sorted(
+            (row.day, row.messages, row.user_messages, row.new_sessions, row.active_students)
+            for row in db.query(DailyActivity).all()
+        ),
+        "students": sorted((row.day, row.user_id, row.messages) for row in db.query(StudentDailyActivity).all()),
+    }
+
+
+def record_a_week(db):
+    """Two students and a teacher chatting over two days, as send_message records it"""
+    analytics.record_new_session(db, day=MONDAY)
+    analytics.record_new_session(db, day=MONDAY)
+    analytics.record_messages(db, 1, True, user_messages=1, assistant_messages=0, day=MONDAY)  # Flagged, saved early
+    analytics.record_messages(db, 1, True, user_messages=0, assistant_messages=1, day=MONDAY)
+    analytics.record_messages(db, 1, True, user_messages=1, assistant_messages=1, day=MONDAY)
+    analytics.record_messages(db, 2, True, user_messages=1, assistant_messages=1, day=MONDAY)
+    analytics.record_messages(db, 3, False, user_messages=1, assistant_messages=1, day=MONDAY)  # Teacher
+    analytics.record_messages(db, 1, True, user_messages=1, assistant_messages=1, day=TUESDAY)
+    db.commit()
+
+
+EXPECTED = {
+    "daily": [(MONDAY, 8, 4, 2, 2), (TUESDAY, 2, 1, 0, 1)],
+    "students": [(MONDAY, 1, 4), (MONDAY, 2, 2), (TUESDAY, 1, 2)],
+}
+
+
+def test_counters_count_each_student_once_per_day(db):
+    record_a_week(db)
+    assert rollups(db) == EXPECTED
+
+
+def test_portable_fallback_matches_upserts(db):
+    insert_for = analytics._insert_for
+    analytics._insert_for = lambda db: None  # As on a database without ON CONFLICT
+    try:
+        record_a_week(db)
+    finally:
+        analytics._insert_for = insert_for
+    assert rollups(db) == EXPECTED
+
+
+def test_rebuild_recomputes_rollups_from_history(db):
+    student = User(email="an@example.com", username="an", hashed_password="x", role="student")
+    teacher = User(email="lan@example.com", username="lan", hashed_password="x", role="teacher")
+    db.add_all([student, teacher])
+    db.flush()
+
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    yesterday = today - timedelta(days=1)
+    for user, created_at, messages in [(student, yesterday, 4), (student, today, 2), (teacher, today, 2)]:
+        session = ChatSession(user_id=user.id, created_at=created_at)
+        db.add(session)
+        db.flush()
+        for n in range(messages):
+            db.add(ChatMessage(
+                session_id=session.id,
+                role="user" if n % 2 == 0 else "assistant",
+                content=f"tin nhắn {n}",
+                created_at=created_at + timedelta(minutes=n)
+            ))
+        db.flush()
+        analytics.record_new_session(db, day=created_at.date())
+        analytics.record_messages(db, user.id, user.role == "student", messages // 2, messages // 2, day=created_at.date())
+    db.commit()
+    recorded = rollups(db)
+
+    db.query(DailyActivity).update({"messages": 999, "active_students": 7}, synchronize_session=False)
+    db.commit()
+    analytics.rebuild_rollups(db)
+    assert rollups(db) == recorded
+
+    activity = analytics.get_daily_activity(db, days=2)
+    assert [point["messages"] for point in activity["days"]] == [4, 4]
+    assert [point["active_students"] for point in activity["days"]] == [1, 1]
+    assert activity["totals"] == {"messages": 8, "user_messages": 4, "new_sessions": 3, "active_students": 1}
@@ -0,0 +1,48 @@
+"""
+Test the token -> principal cache used by get_current_user
+Uses a temporary SQLite database - no server needed
+"""
+from fastapi import HTTPException
+from sqlalchemy import event
+from app.core.security import create_access_token, get_current_user, principal_cache
+from app.models.models import User
+
+
+def add_user(db) -> User:
+    user = User(email="gv@example.com", username="gv", hashed_password="x", role="student")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_repeated_requests_skip_the_users_query(engine, db):
+    user = add_user(db)
+    principal_cache.clear()
+    token = create_access_token({"sub": str(user.id)})
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+    first = get_current_user(token, db)
+    second = get_current_user(token, db)
+    assert (first.id, first.role, first.username) == (user.id, "student", "gv")
+    assert second is first
+    assert len(queries) == 1
+
+
+def test_user_changes_invalidate_cached_principal(db):
+    user = add_user(db)
+    principal_cache.clear()
+    token = create_access_token({"sub": str(user.id)})
+    assert get_current_user(token, db).role == "student"
+
+    user.role = "teacher"
+    db.commit()
+    assert get_current_user(token, db).role == "teacher"
+
+    db.delete(user)
+    db.commit()
+    try:
+        get_current_user(token, db)
+        assert False, "deleted user must not authenticate"
+    except HTTPException as e:
+        assert e.status_code == 401
@@ -0,0 +1,141 @@
+"""
+Test the chat endpoints end to end
+Runs the real app on a temporary SQLite database with fake LLM keys - no
+server or API key needed
+"""
+import threading
+import time
+
+from app.models.models import DEFAULT_SESSION_TITLE, ChatMessage, ChatSession
+from app.services.admission import ConcurrencyLimiter, Priority
+from app.services.llm_provider import FakeKey, FakeProvider
+
+
+class RecordingProvider(FakeProvider):
+    """FakeProvider that keeps every prompt and history it was sent"""
+
+    def __init__(self, keys=None):
+        super().__init__(keys)
+        self.prompts = []
+
+    def generate(self, key_index, contents, history=None, **kwargs):
+        self.prompts.append((contents, history))
+        return super().generate(key_index, contents, history=history, **kwargs)
+
+
+def test_failed_reply_saves_only_the_student_message_and_answers_503(make_client):
+    api = make_client([FakeKey(server_error_rate=1.0), FakeKey(server_error_rate=1.0)])
+    headers = api.register("an")
+    session_id = api.new_session(headers)
+
+    response = api.send(session_id, "Lịch thi học kỳ khi nào ạ?", headers)
+    assert response.status_code == 503
+
+    messages = api.messages(session_id)
+    assert [(message.role, message.content) for message in messages] == [("user", "Lịch thi học kỳ khi nào ạ?")]
+    assert api.chat_session(session_id).message_count == 1
+
+
+def test_flagged_message_reaches_teacher_alerts_before_the_reply(make_client):
+    key = FakeKey(hang=True)
+    api = make_client([key])
+    teacher = api.register("co_lan", role="teacher")
+    headers = api.register("binh")
+    session_id = api.new_session(headers)
+
+    replies = []
+    sender = threading.Thread(target=lambda: replies.append(api.send(session_id, "Con không muốn sống nữa", headers)))
+    sender.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not api.alerts(teacher) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert api.alerts(teacher) == ["Con không muốn sống nữa"]
+        assert not replies  # Still waiting on the LLM
+    finally:
+        key.release()
+        sender.join()
+    assert replies[0].status_code == 200
+    assert [message.role for message in api.messages(session_id)] == ["user", "assistant"]
+    assert api.chat_session(session_id).message_count == 2
+
+
+def test_busy_llm_keeps_flagged_messages_only(make_client):
+    slots = ConcurrencyLimiter(max_concurrent=1, queue_timeout=0.1, reserved_for_crisis=0)
+    api = make_client(slots=slots)
+    teacher = api.register("co_lan", role="teacher")
+    headers = api.register("chi")
+    session_id = api.new_session(headers)
+
+    slots.acquire(Priority.CRISIS)  # Every slot taken
+    try:
+        crisis = api.send(session_id, "Con muốn tự tử", headers)
+        ordinary = api.send(session_id, "Lịch thi học kỳ khi nào ạ?", headers)
+    finally:
+        slots.release()
+
+    assert crisis.status_code == 429 and crisis.headers["x-message-saved"] == "true"
+    assert ordinary.status_code == 429 and ordinary.headers["x-message-saved"] == "false"
+    assert api.alerts(teacher) == ["Con muốn tự tử"]
+    assert [message.content for message in api.messages(session_id)] == ["Con muốn tự tử"]
+    assert api.chat_session(session_id).message_count == 1
+
+
+def test_session_is_titled_after_a_failed_flagged_first_message(make_client):
+    slots = ConcurrencyLimiter(max_concurrent=1, queue_timeout=0.1, reserved_for_crisis=0)
+    api = make_client(slots=slots)
+    headers = api.register("giang")
+    session_id = api.new_session(headers)
+
+    slots.acquire(Priority.CRISIS)
+    try:
+        assert api.send(session_id, "Con muốn tự tử", headers).status_code == 429
+    finally:
+        slots.release()
+    assert api.chat_session(session_id).message_count == 1  # Saved for the alert feed
+
+    assert api.send(session_id, "Cô ơi con vẫn ở đây", headers).status_code == 200
+    assert api.chat_session(session_id).title != DEFAULT_SESSION_TITLE
+    titled = api.chat_session(session_id).title
+    assert api.send(session_id, "Con cảm ơn cô", headers).status_code == 200
+    assert api.chat_session(session_id).title == titled  # Titled once
+
+
+def test_crisis_messages_have_their_own_bucket_and_are_throttled_too(make_client):
+    api = make_client(RATE_LIMIT_BURST=2, RATE_LIMIT_CRISIS_BURST=4, RATE_LIMIT_PER_MINUTE=1, RATE_LIMIT_CRISIS_PER_MINUTE=1)
+    headers = api.register("dung")
+    session_id = api.new_session(headers)
+
+    ordinary = [api.send(session_id, f"Hôm nay con học bài {n}", headers).status_code for n in range(3)]
+    assert ordinary == [200, 200, 429]
+
+    # Hyperbole trips the risk screen, so crisis messages can't bypass the limiter
+    flagged = [api.send(session_id, "Bài tập khó muốn chết", headers) for _ in range(5)]
+    assert [response.status_code for response in flagged] == [200, 200, 200, 200, 429]
+    assert int(flagged[-1].headers["retry-after"]) > 0
+    assert api.chat_session(session_id).message_count == 2 * (2 + 4)
+
+
+def test_prompt_holds_the_summary_and_only_unsummarized_messages(make_client):
+    provider = RecordingProvider()
+    api = make_client(provider=provider)
+    headers = api.register("em")
+    session_id = api.new_session(headers)
+    with api.Session() as db:
+        for n in range(8):
+            db.add(ChatMessage(session_id=session_id, role="user" if n % 2 == 0 else "assistant", content=f"tin nhắn {n}"))
+        db.query(ChatSession).filter(ChatSession.id == session_id).update({
+            "message_count": 8,
+            "summary": "Em tên Hoa, lớp 10A, lo lắng về kỳ thi giữa kỳ.",
+            "summary_message_count": 6
+        })
+        db.commit()
+
+    assert api.send(session_id, "Con vẫn còn lo", headers).status_code == 200
+    [(prompt, history)] = provider.prompts
+    assert "Em tên Hoa, lớp 10A" in prompt and prompt.endswith("Con vẫn còn lo")
+    assert history == [
+        {"role": "user", "parts": ["tin nhắn 6"]},
+        {"role": "model", "parts": ["tin nhắn 7"]},
+    ]
+
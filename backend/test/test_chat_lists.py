@@ -0,0 +1,131 @@
+"""
+Test the session list, message pages and teacher overview
+Runs the real app on a temporary SQLite database with fake LLM keys - no
+server or API key needed
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+from app.core import database
+from app.core.database import ensure_schema
+from app.models.models import LAST_MESSAGE_PREVIEW_CHARS, ChatMessage, ChatSession, User
+from app.services.llm_provider import FakeKey
+
+LIST_COLUMNS = ("message_count", "last_message_preview", "last_message_at")
+
+
+def test_session_list_shows_last_message_and_count(make_client):
+    reply = "Lịch thi học kỳ I bắt đầu từ ngày 15/12. " * 20
+    api = make_client([FakeKey(reply=reply)], RATE_LIMIT_ENABLED=False)
+    headers = api.register("an")
+    older, newer = api.new_session(headers), api.new_session(headers)
+    for content in ["Lịch thi khi nào ạ?", "Thi mấy môn ạ?"]:
+        assert api.send(older, content, headers).status_code == 200
+    assert api.send(newer, "Chào cô", headers).status_code == 200
+    assert api.send(older, "Con cảm ơn cô", headers).status_code == 200  # Most recently active again
+
+    sessions = api.http.get("/api/chat/sessions", headers=headers).json()
+    assert [session["id"] for session in sessions] == [older, newer]
+    for session in sessions:
+        messages = api.messages(session["id"])
+        assert session["message_count"] == len(messages)
+        assert session["last_message"] == messages[-1].content[:LAST_MESSAGE_PREVIEW_CHARS]
+        assert api.chat_session(session["id"]).last_message_at == messages[-1].created_at
+
+
+def test_ensure_schema_backfills_list_columns_on_an_existing_database(engine):
+    with engine.begin() as conn:
+        for column in LIST_COLUMNS:  # As created before the list columns existed
+            conn.execute(text(f"ALTER TABLE chat_sessions DROP COLUMN {column}"))
+        conn.execute(text("INSERT INTO users (id, email, username, hashed_password, role) VALUES (1, 'an@example.com', 'an', 'x', 'student')"))
+        conn.execute(text("INSERT INTO chat_sessions (id, user_id, title) VALUES (1, 1, 'Lịch thi'), (2, 1, 'Trống')"))
+        conn.execute(text(
+            "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES "
+            "(1, 'user', 'Lịch thi khi nào ạ?', '2026-10-01 08:00:00'), "
+            "(1, 'assistant', 'Ngày 15/12 em nhé', '2026-10-01 08:00:05'), "
+            "(1, 'user', 'Con cảm ơn cô', '2026-10-01 08:00:05')"  # Same second: the higher id is the last message
+        ))
+
+    saved_engine = database.engine
+    database.engine = engine
+    try:
+        ensure_schema()
+    finally:
+        database.engine = saved_engine
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT id, {', '.join(LIST_COLUMNS)} FROM chat_sessions ORDER BY id")).all()
+    assert [tuple(row) for row in rows] == [
+        (1, 3, "Con cảm ơn cô", "2026-10-01 08:00:05"),
+        (2, 0, None, None),
+    ]
+
+
+def test_message_pages_walk_equal_timestamps_without_gaps(client):
+    headers = client.register("binh")
+    session_id = client.new_session(headers)
+    with client.Session() as db:
+        for n in range(8):  # Messages 2-6 share one timestamp, as a saved user/assistant pair does
+            created_at = datetime(2026, 10, 1, 8, 0, 10 if 2 <= n <= 6 else n)
+            db.add(ChatMessage(session_id=session_id, role="user", content=f"tin nhắn {n}", created_at=created_at))
+        db.commit()
+    expected = sorted(client.messages(session_id), key=lambda message: (message.created_at, message.id), reverse=True)
+
+    pages, before = [], None
+    while True:
+        params = {"limit": 3, **({"before": before} if before else {})}
+        response = client.http.get(f"/api/chat/sessions/{session_id}/messages", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        pages.append([message["id"] for message in page["messages"]])
+        assert page["has_more"] == (page["next_before"] is not None)
+        if not page["has_more"]:
+            break
+        before = page["next_before"]
+
+    assert pages == [[message.id for message in expected[i:i + 3]] for i in range(0, 8, 3)]
+    assert [message["content"] for message in page["messages"]] == ["tin nhắn 1", "tin nhắn 0"]
+
+    response = client.http.get(f"/api/chat/sessions/{session_id}/messages", params={"limit": 8}, headers=headers).json()
+    assert len(response["messages"]) == 8 and not response["has_more"] and response["next_before"] is None
+    bad = client.http.get(f"/api/chat/sessions/{session_id}/messages", params={"before": "not-a-cursor"}, headers=headers)
+    assert bad.status_code == 400
+
+
+def test_overview_counts_match_counting_every_message(make_client):
+    api = make_client(RATE_LIMIT_ENABLED=False)
+    teacher = api.register("co_lan", role="teacher")
+    conversations = {"an": [3, 1], "binh": [2, 0], "chi": []}
+    for username, sends in conversations.items():
+        headers = api.register(username)
+        for count in sends:
+            session_id = api.new_session(headers)
+            for n in range(count):
+                assert api.send(session_id, f"Câu hỏi {n}", headers).status_code == 200
+    api.new_session(teacher)  # Teachers are not listed
+
+    response = api.http.get("/api/teacher/overview", params={"sort": "messages"}, headers=teacher)
+    assert response.status_code == 200, response.text
+    overview = response.json()
+
+    with api.Session() as db:
+        naive = {}
+        for user in db.query(User).filter(User.role == "student"):
+            message_count, last_activity = 0, None
+            sessions = db.query(ChatSession).filter(ChatSession.user_id == user.id).all()
+            for session in sessions:
+                messages = db.query(ChatMessage).filter(ChatMessage.session_id == session.id).all()
+                message_count += len(messages)
+                active = max((message.created_at for message in messages), default=session.updated_at)
+                last_activity = max(last_activity or active, active)
+            naive[user.username] = {"session_count": len(sessions), "message_count": message_count, "last_activity": last_activity}
+    assert overview["total"] == 3
+    assert [item["username"] for item in overview["items"]] == ["an", "binh", "chi"]
+    for item in overview["items"]:
+        last_activity = item["last_activity"] and datetime.fromisoformat(item["last_activity"])
+        assert {**item, "last_activity": last_activity} == {**item, **naive[item["username"]]}
+    assert naive["binh"]["session_count"] == 2 and naive["chi"]["last_activity"] is None
+
+    page = api.http.get("/api/teacher/overview", params={"search": "bin", "limit": 1}, headers=teacher).json()
+    assert page["total"] == 1 and page["items"][0]["message_count"] == 4
+
@@ -0,0 +1,93 @@
+"""
+Test token-budget packing of history and RAG chunks
+Token counts use the character estimate (3 chars per token) so the
+numbers below don't depend on tiktoken - no server or network needed
+"""
+from contextlib import contextmanager
+
+from app.core.config import settings
+from app.services import context
+from app.services.context import ContextBuilder, count_tokens, truncate_to_tokens
+
+
+@contextmanager
+def character_estimate(encoding_name: str = None):
+    """Count tokens as if tiktoken were missing (optionally by really failing to load encoding_name)"""
+    saved = (context._encoding, context._encoding_loaded, settings.CONTEXT_TOKEN_ENCODING)
+    context._encoding, context._encoding_loaded = None, encoding_name is None
+    if encoding_name is not None:
+        settings.CONTEXT_TOKEN_ENCODING = encoding_name
+    try:
+        yield
+    finally:
+        context._encoding, context._encoding_loaded, settings.CONTEXT_TOKEN_ENCODING = saved
+
+
+def tokens(n: int, char: str = "x") -> str:
+    return char * (n * context.FALLBACK_CHARS_PER_TOKEN)
+
+
+def turns(*costs: int) -> list:
+    """History (oldest first) whose turn i costs costs[i] tokens and is made of chr(ord('a') + i)"""
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": tokens(cost, chr(ord("a") + i))}
+        for i, cost in enumerate(costs)
+    ]
+
+
+def builder(budget: int, min_history: int = 2, max_history: int = 10, min_chunk_tokens: int = 10) -> ContextBuilder:
+    return ContextBuilder("", budget=budget, max_history=max_history, min_history=min_history, min_chunk_tokens=min_chunk_tokens)
+
+
+def test_recent_history_is_reserved_before_chunks():
+    with character_estimate():
+        history = turns(20, 20, 20, 20)
+        packed, chunks, usage = builder(100).build(tokens(10), history, [(1.0, tokens(50, "k"))])
+    assert packed == history[-2:]  # The chunk would otherwise have taken their room
+    assert chunks == [tokens(50, "k")]
+    assert (usage.history_kept, usage.history_dropped, usage.total_tokens) == (2, 2, 100)
+
+
+def test_chunks_go_by_score_and_the_first_misfit_is_truncated():
+    ranked = [(0.2, tokens(30, "c")), (0.9, tokens(30, "a")), (0.5, tokens(30, "b"))]
+    with character_estimate():
+        _, chunks, usage = builder(50).build(tokens(2), [], ranked)
+        assert chunks == [tokens(30, "a"), tokens(18, "b")]
+        assert (usage.chunks_kept, usage.chunks_truncated, usage.chunks_dropped) == (2, 1, 1)
+        assert usage.total_tokens == 50
+
+        _, chunks, usage = builder(50, min_chunk_tokens=20).build(tokens(2), [], ranked)
+        assert chunks == [tokens(30, "a")]  # 18 tokens left: below min_chunk_tokens, not worth sending
+        assert (usage.chunks_kept, usage.chunks_truncated, usage.chunks_dropped) == (1, 0, 2)
+
+
+def test_template_overhead_is_refunded_when_no_chunk_fits():
+    with character_estimate():
+        history = turns(10, 10, 10)
+        packed, chunks, usage = builder(40, min_history=1, min_chunk_tokens=50).build(
+            tokens(1), history, [(1.0, tokens(100))], message_overhead=15
+        )
+    assert chunks == []
+    assert packed == history  # The 15 overhead tokens went back to older turns
+    assert usage.context_tokens == 0 and usage.total_tokens == 31
+
+
+def test_history_is_contiguous_and_capped():
+    with character_estimate():
+        history = turns(5, 5, 50, 5)
+        packed, _, usage = builder(31, min_history=4).build(tokens(1), history, [])
+        assert packed == history[-1:]  # The two small oldest turns would fit, but not past the gap
+        assert (usage.history_kept, usage.history_dropped) == (1, 3)
+
+        history = turns(*[1] * 12)
+        packed, _, usage = builder(1000, max_history=10).build(tokens(1), history, [])
+        assert packed == history[2:]
+        assert usage.history_dropped == 2
+
+
+def test_character_estimate_when_tiktoken_cannot_load():
+    with character_estimate("no-such-encoding"):
+        assert count_tokens("x" * 30) == 10
+        assert count_tokens("x") == 1 and count_tokens("") == 0
+        assert truncate_to_tokens("x" * 30, 4) == "x" * 12
+        assert context._encoding_loaded and context._encoding is None  # Not retried on every call
@@ -0,0 +1,148 @@
+"""
+Test deadlines, circuit breakers and hedging of Gemini calls
+Runs against FakeProvider - no API keys or network needed
+"""
+import time
+
+from app.core.config import settings
+from app.services.admission import Priority
+from app.services.gemini import GeminiService
+from app.services.llm_provider import FakeKey, FakeProvider, FakeQuotaError, GeminiProvider
+from app.services.resilience import CircuitBreaker, LLMTimeoutError
+from app.services.usage import UsageRecorder
+
+
+def make_service(keys):
+    """GeminiService whose key i behaves like keys[i]"""
+    return GeminiService(provider=FakeProvider(keys), usage=UsageRecorder(enabled=False))
+
+
+def test_deadline_releases_hung_call():
+    hung = FakeKey(hang=True)
+    service = make_service([hung])
+
+    start = time.monotonic()
+    try:
+        service._call_llm("Xin chào", timeout=0.3)
+        raise AssertionError("expected LLMTimeoutError")
+    except LLMTimeoutError:
+        pass
+    finally:
+        hung.release()
+
+    assert time.monotonic() - start < 1.0
+    assert service.timed_out_requests == 1
+
+
+def test_quota_error_moves_to_next_key_and_trips_breaker():
+    first = FakeKey(errors=[FakeQuotaError("429 quota exceeded")])
+    second = FakeKey(reply="từ key 2")
+    service = make_service([first, second])
+
+    assert service._send_chat([], "Xin chào") == "từ key 2"
+    assert service.current_key_index == 1
+    assert service.breakers[0].state == CircuitBreaker.OPEN
+
+
+def test_breaker_skips_failing_key():
+    failing = FakeKey(server_error_rate=1.0)
+    healthy = FakeKey(reply="ok")
+    service = make_service([failing, healthy])
+
+    for _ in range(settings.LLM_BREAKER_FAILURE_THRESHOLD):
+        service.current_key_index = 0
+        assert service._send_chat([], "Xin chào") == "ok"
+
+    assert service.breakers[0].state == CircuitBreaker.OPEN
+    calls_before = failing.calls
+    service.current_key_index = 0
+    assert service._send_chat([], "Xin chào") == "ok"
+    assert failing.calls == calls_before
+
+
+def test_non_retryable_error_is_raised():
+    broken = FakeKey(errors=[ValueError("400 invalid argument")])
+    service = make_service([broken, FakeKey()])
+
+    try:
+        service._send_chat([], "Xin chào")
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+
+def test_hedged_request_wins_on_fast_key():
+    slow = FakeKey(latency_ms=1500, reply="chậm")
+    fast = FakeKey(latency_ms=10, reply="nhanh")
+    service = make_service([slow, fast])
+    for _ in range(settings.LLM_HEDGE_MIN_SAMPLES):
+        service.latency.record(0.05)
+
+    original = (settings.LLM_HEDGING_ENABLED, settings.LLM_HEDGE_MIN_DELAY_SECONDS)
+    settings.LLM_HEDGING_ENABLED = True
+    settings.LLM_HEDGE_MIN_DELAY_SECONDS = 0.1
+    try:
+        start = time.monotonic()
+        assert service._send_chat([], "Xin chào") == "nhanh"
+        assert time.monotonic() - start < 1.0
+        assert service.hedged_requests == 1
+    finally:
+        settings.LLM_HEDGING_ENABLED, settings.LLM_HEDGE_MIN_DELAY_SECONDS = original
+
+
+def test_fake_provider_streams_and_reports_usage():
+    provider = FakeProvider([FakeKey(latency_ms=20, reply="Cô luôn ở đây lắng nghe con.")], stream_chunks=4)
+
+    chunks = list(provider.stream(0, "Con buồn quá"))
+    assert len(chunks) == 4
+    assert "".join(chunks) == "Cô luôn ở đây lắng nghe con."
+
+    response = provider.generate(0, "Con buồn quá", history=[])
+    assert response.prompt_tokens > 0 and response.completion_tokens > 0
+
+
+def test_fake_latency_distribution_is_deterministic():
+    first = FakeKey(latency_ms=100, distribution="lognormal", sigma=0.5, seed=7)
+    second = FakeKey(latency_ms=100, distribution="lognormal", sigma=0.5, seed=7)
+    assert [first._sample_latency() for _ in range(5)] == [second._sample_latency() for _ in range(5)]
+
+
+def test_gemini_models_are_pooled_per_key():
+    provider = GeminiProvider(api_keys=["key-a", "key-b"])  # Building models needs no network
+
+    first = provider._get_model(0, None, "system")
+    second = provider._get_model(1, None, "system")
+    assert provider._get_model(0, None, "system") is first
+    assert provider._get_model(1, None, "system") is second
+    assert first is not second and first._client is not second._client
+
+
+def test_crisis_calls_use_reserved_keys_first():
+    service = make_service([FakeKey(reply="key 1"), FakeKey(reply="key 2"), FakeKey(reply="key 3")])
+    service.crisis_keys = {2}
+
+    assert service._send_chat([], "Xin chào") == "key 1"
+    assert service._send_chat([], "Con muốn tự tử", priority=Priority.CRISIS) == "key 3"
+    assert service.current_key_index == 0  # Reserved keys never become the default
+
+    service.breakers[0].record_failure(trip=True)
+    service.breakers[1].record_failure(trip=True)
+    try:
+        service._send_chat([], "Xin chào")
+        raise AssertionError("ordinary calls must not use the reserved key")
+    except Exception as e:
+        assert "cooling down" in str(e)
+
+
+def test_breaker_half_open_after_cooldown():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=10, clock=lambda: now[0])
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    now[0] = 11.0
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # Only one trial call
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,73 @@
+"""
+Test per-call LLM usage accounting (llm_call_logs)
+Runs against FakeProvider and an in-memory SQLite database
+"""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.models.models import LLMCallLog
+from app.services.gemini import GeminiService
+from app.services.llm_provider import FakeKey, FakeProvider, FakeQuotaError
+from app.services.usage import UsageRecorder
+
+
+def make_recorder(**kwargs):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return UsageRecorder(session_factory=sessionmaker(bind=engine), enabled=True, **kwargs)
+
+
+def test_call_is_logged_with_key_retries_and_tokens():
+    recorder = make_recorder(flush_every=1)
+    keys = [FakeKey(errors=[FakeQuotaError("429 quota exceeded")]), FakeKey(reply="ok")]
+    service = GeminiService(provider=FakeProvider(keys), usage=recorder)
+
+    service._send_chat([], "Xin chào", used_rag=True)
+    service.generate_chat_title("Con buồn vì điểm thi")
+
+    db = recorder.session_factory()
+    try:
+        chat, title = db.query(LLMCallLog).order_by(LLMCallLog.id).all()
+    finally:
+        db.close()
+    assert (chat.operation, chat.key_index, chat.retries, chat.used_rag) == ("chat", 1, 1, True)
+    assert chat.prompt_tokens > 0 and chat.completion_tokens > 0
+    assert chat.success and chat.provider == "fake"
+    assert title.operation == "title" and not title.used_rag
+
+
+def test_records_are_buffered_until_flush():
+    recorder = make_recorder(flush_every=10, flush_seconds=60)
+    service = GeminiService(provider=FakeProvider([FakeKey(reply="ok")]), usage=recorder)
+
+    for _ in range(3):
+        service._send_chat([], "Xin chào")
+
+    db = recorder.session_factory()
+    try:
+        assert db.query(LLMCallLog).count() == 0
+        report = recorder.report(db, days=1)  # Flushes first
+    finally:
+        db.close()
+    assert report["latency"]["chat"]["count"] == 3
+    assert report["daily"][0]["key"] == 1 and report["daily"][0]["calls"] == 3
+
+
+def test_failed_call_is_logged():
+    recorder = make_recorder(flush_every=1)
+    service = GeminiService(provider=FakeProvider([FakeKey(errors=[ValueError("400 invalid argument")])]), usage=recorder)
+
+    try:
+        service._send_chat([], "Xin chào")
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+    db = recorder.session_factory()
+    try:
+        report = recorder.report(db, days=1)
+    finally:
+        db.close()
+    assert report["daily"][0]["errors"] == 1
+    assert "chat" not in report["latency"]  # Percentiles only cover successful calls
@@ -0,0 +1,45 @@
+"""
+Test diacritic-insensitive message search (SQLite FTS5)
+Uses a temporary SQLite database - no server needed
+"""
+from app.models.models import User, ChatSession, ChatMessage
+from app.utils.message_search import ensure_index, make_snippet, search_messages
+
+
+def add_session(db) -> ChatSession:
+    user = User(email="hs@example.com", username="hs", hashed_password="x")
+    db.add(user)
+    db.flush()
+    session = ChatSession(user_id=user.id, title="Chuyện ở lớp")
+    db.add(session)
+    db.commit()
+    return session
+
+
+def test_existing_messages_are_backfilled_and_new_ones_indexed(engine, db):
+    session = add_session(db)
+    db.add(ChatMessage(session_id=session.id, role="user", content="Con bị bạn bắt nạt ở trường"))
+    db.commit()
+
+    ensure_index(engine)
+    total, rows = search_messages(db, "bat nat")
+    assert total == 1 and rows[0]["session_title"] == "Chuyện ở lớp"
+
+    db.add(ChatMessage(session_id=session.id, role="assistant", content="Cô rất tiếc khi con bị BẮT NẠT."))
+    db.commit()
+    assert search_messages(db, "bắt nạt")[0] == 2
+    assert search_messages(db, "bắt nạt", role="assistant")[0] == 1
+    assert search_messages(db, "nạt bắt")[0] == 0  # Phrase, not bag of words
+
+    db.delete(session)
+    db.commit()
+    assert search_messages(db, "bat nat")[0] == 0
+
+
+def test_snippet_highlights_original_text():
+    content = "Mở đầu dài. " * 30 + "Con nghĩ tới chuyện Tự Tử nhiều lần. " + "Kết thúc. " * 30
+    snippet, highlights = make_snippet(content, "tu tu", width=80)
+    assert len(highlights) == 1
+    start, end = highlights[0]
+    assert snippet[start:end] == "Tự Tử"
+    assert snippet.startswith("…") and snippet.endswith("…")
@@ -0,0 +1,93 @@
+"""
+Test the Prometheus metrics middleware and multiprocess aggregation
+Uses a small FastAPI app and a temporary SQLite database - no server needed
+"""
+import os
+import subprocess
+import sys
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from app.core.config import Settings, settings
+from app.core.metrics import MetricsMiddleware, instrument_engine, metrics_endpoint
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_requests_are_labelled_by_route_template_with_query_counts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/metrics.db")
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": item_id}
+
+    route = "/items/{item_id}"
+    before = sample("http_request_duration_seconds_count", method="GET", route=route, status="200")
+    queries_before = sample("http_request_db_queries_sum", route=route)
+    client = TestClient(app)
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+    assert client.get("/items/0").status_code == 404
+    client.get("/missing")
+
+    assert sample("http_request_duration_seconds_count", method="GET", route=route, status="200") == before + 2
+    assert sample("http_request_duration_seconds_count", method="GET", route=route, status="404") >= 1
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") >= 1
+    assert sample("http_request_db_queries_sum", route=route) == queries_before + 6
+
+
+def test_scrape_requires_the_metrics_token_when_set():
+    app = FastAPI()
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+    client = TestClient(app)
+    saved = settings.METRICS_TOKEN
+    settings.METRICS_TOKEN = "scrape-secret"
+    try:
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+        assert response.status_code == 200 and "http_request_duration_seconds" in response.text
+    finally:
+        settings.METRICS_TOKEN = saved
+    assert Settings.model_fields["METRICS_ENABLED"].default is False  # Opt-in
+
+
+WORKER = """
+from app.core.metrics import CACHE_LOOKUPS, REQUEST_LATENCY
+REQUEST_LATENCY.labels("GET", "/", "200").observe(0.02)
+CACHE_LOOKUPS.labels("auth_principal", "hit").inc()
+"""
+
+SCRAPE = """
+from app.core.metrics import render_metrics
+print(render_metrics()[0].decode())
+"""
+
+
+def test_multiprocess_mode_sums_all_workers(tmp_path):
+    env = {
+        **os.environ,
+        "PYTHONPATH": BACKEND_DIR,
+        "PROMETHEUS_MULTIPROC_DIR": str(tmp_path),
+    }
+    for _ in range(2):  # Two worker processes
+        subprocess.run([sys.executable, "-c", WORKER], env=env, check=True)
+    output = subprocess.run(
+        [sys.executable, "-c", SCRAPE], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    assert 'cache_lookups_total{cache="auth_principal",result="hit"} 2.0' in output
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"} 2.0' in output
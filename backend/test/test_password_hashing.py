@@ -0,0 +1,30 @@
+"""
+Test bcrypt hashing through the bounded pool and rehash on login
+Uses a temporary SQLite database - no server needed
+"""
+from passlib.context import CryptContext
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_and_update_password, verify_password
+from app.models.models import User
+from app.routers.auth_router import login
+from app.schemas import UserLogin
+
+
+def test_hash_and_verify_use_configured_rounds():
+    hashed = get_password_hash("matkhau123")
+    assert f"${settings.BCRYPT_ROUNDS:02d}$" in hashed
+    assert verify_password("matkhau123", hashed)
+    assert not verify_password("sai", hashed)
+    assert verify_and_update_password("matkhau123", hashed) == (True, None)
+
+
+def test_login_upgrades_outdated_hash(db):
+    old_rounds = 5 if settings.BCRYPT_ROUNDS != 5 else 6
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=old_rounds).hash("matkhau123")
+    db.add(User(email="hs@example.com", username="hs", hashed_password=old_hash))
+    db.commit()
+
+    result = login(UserLogin(username="hs", password="matkhau123"), db)
+    assert result["access_token"]
+    new_hash = db.query(User.hashed_password).scalar()
+    assert new_hash != old_hash and f"${settings.BCRYPT_ROUNDS:02d}$" in new_hash
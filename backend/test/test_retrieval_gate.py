@@ -0,0 +1,58 @@
+"""
+Test the retrieval gate rules and its optional classifier
+No server or database needed
+"""
+from app.services.intent import NaiveBayesIntentClassifier, RetrievalGate
+
+
+def test_help_seeking_questions_retrieve_even_with_feelings():
+    gate = RetrievalGate(min_keywords=2)
+    assert gate.decide("Con buồn vì bị bạn bắt nạt, con nên làm gì?")[0]
+    assert gate.decide("Con buồn quá, con phải làm sao?") == (True, "question")
+    assert gate.decide("Con thấy áp lực, có nên gặp cô tư vấn không?") == (True, "question")
+    assert gate.decide("con lo lang qua, lam the nao de bot?") == (True, "question")  # Typed without diacritics
+
+
+def test_crisis_messages_always_retrieve():
+    gate = RetrievalGate(min_keywords=2)
+    assert gate.decide("con muốn tự tử") == (True, "risk")  # Would otherwise be too short
+    assert gate.decide("Con buồn quá, con muốn chết") == (True, "risk")  # Would otherwise be conversational
+    assert gate.decide("con muon chet") == (True, "risk")
+
+
+def test_school_topics_retrieve():
+    gate = RetrievalGate(min_keywords=2)
+    assert gate.decide("Học phí năm nay bao nhiêu?") == (True, "document_topic")
+    assert gate.decide("Con bị bắt nạt ở lớp") == (True, "document_topic")
+    assert gate.decide("quy che thi lai") == (True, "document_topic")
+
+
+def test_greetings_and_feelings_skip():
+    gate = RetrievalGate(min_keywords=2)
+    for message in ["Chào cô", "Cảm ơn cô nhiều ạ", "Con buồn quá huhu", "Hôm nay con thấy mệt"]:
+        assert gate.decide(message) == (False, "conversational"), message
+    assert gate.decide("ừ") == (False, "too_short")
+
+
+def test_classifier_decides_what_the_rules_leave_open():
+    classifier = NaiveBayesIntentClassifier.train([
+        ("thời khóa biểu lớp mười", True),
+        ("câu lạc bộ bóng đá trường", True),
+        ("hôm qua con đi chơi với bạn", False),
+        ("con kể cô nghe chuyện nhà", False),
+    ])
+    gate = RetrievalGate(classifier, min_keywords=2)
+    assert gate.decide("thời khóa biểu câu lạc bộ") == (True, "classifier")
+    assert gate.decide("con đi chơi với bạn") == (False, "classifier")
+    assert RetrievalGate(min_keywords=2).decide("con đi chơi với bạn") == (True, "default")
+
+
+def test_counters_and_evaluation():
+    gate = RetrievalGate(min_keywords=2)
+    assert gate.should_retrieve("Lịch thi học kỳ khi nào ạ?")
+    assert not gate.should_retrieve("Chào cô")
+    assert gate.stats() == {"performed": 1, "skipped": 1, "reasons": {"document_topic": 1, "conversational": 1}}
+
+    report = gate.evaluate([("Con nên làm gì khi bị bắt nạt?", True), ("Cảm ơn cô", False), ("Con buồn quá", True)])
+    assert report["confusion"] == {"tp": 1, "fp": 0, "tn": 1, "fn": 1}
+    assert report["missed"] == ["Con buồn quá"]
@@ -0,0 +1,80 @@
+"""
+Test the Aho–Corasick risk screen and the teacher alert feed
+Uses a temporary SQLite database - no server needed
+"""
+import random
+
+from app.models.models import User, ChatSession, ChatMessage
+from app.routers.teacher_router import get_risk_alerts
+from app.utils.risk import AhoCorasick, RiskScreener, is_crisis_message, risk_screener
+
+
+def test_automaton_matches_naive_search():
+    rng = random.Random(7)
+    for _ in range(200):
+        patterns = sorted({"".join(rng.choice("ab ") for _ in range(rng.randint(1, 4))) for _ in range(6)})
+        text = "".join(rng.choice("ab ") for _ in range(50))
+        expected = sorted(
+            (start + len(pattern) - 1, index)
+            for index, pattern in enumerate(patterns)
+            for start in range(len(text)) if text.startswith(pattern, start)
+        )
+        assert sorted(AhoCorasick(patterns).search(text)) == expected
+
+
+def test_screen_levels_and_categories():
+    result = risk_screener.screen("Con bị bố đánh đập suốt, con chỉ muốn chết thôi")
+    assert result.level == "high" and result.is_crisis
+    assert result.categories == ["abuse", "suicide"]
+    assert "muốn chết" in result.terms
+
+    assert risk_screener.screen("Em bị bạn bè bắt nạt ở lớp").level == "medium"
+    assert risk_screener.screen("con bi bat nat").categories == ["bullying"]
+    assert not risk_screener.screen("Cứ từ từ mà học nhé")
+    assert not risk_screener.screen("Cắt móng tay xong con đi học")  # Whole words only
+
+
+def test_crisis_check_ignores_diacritic_lookalikes():
+    assert is_crisis_message("Con không muốn sống nữa")
+    assert is_crisis_message("con muon tu tu")
+    assert not is_crisis_message("Cứ từ từ mà học nhé")
+    assert not is_crisis_message("Lịch thi học kỳ khi nào ạ?")
+
+
+def test_mixed_accented_and_unaccented_messages():
+    assert risk_screener.screen("con muon chet").is_crisis
+    assert risk_screener.screen("con muon chet, mệt quá").is_crisis  # Autocorrect accented one word
+    assert risk_screener.screen("con muốn chet").terms == ["muốn chết"]  # Even inside the phrase
+    assert risk_screener.screen("Cô ơi, con bi bat nat").categories == ["bullying"]
+    assert not risk_screener.screen("Cứ từ từ mà học nhé, con")  # Accented words still need accented terms
+
+
+def test_custom_lexicon_terms():
+    screener = RiskScreener({"custom": ["bỏ nhà đi"]})
+    assert len(screener) == 1
+    assert screener.screen("Con muốn BỎ NHÀ ĐI").categories == ["custom"]
+    assert screener.screen("con muon bo nha di").level == "medium"
+
+
+def test_alert_feed_pages_flagged_messages(db):
+    student = User(email="hs@example.com", username="hs", hashed_password="x")
+    db.add(student)
+    db.flush()
+    session = ChatSession(user_id=student.id, title="Tối nay")
+    db.add(session)
+    db.flush()
+    for content in ["Con muốn tự tử", "Hôm nay con ổn", "Con bị bắt nạt", "Con tuyệt vọng quá"]:
+        result = risk_screener.screen(content)
+        db.add(ChatMessage(
+            session_id=session.id, role="user", content=content,
+            risk_level=result.level, risk_categories=",".join(result.categories) or None
+        ))
+    db.commit()
+
+    first = get_risk_alerts(level=None, before=None, limit=2, current_teacher=None, db=db)
+    assert [item["content"] for item in first["items"]] == ["Con tuyệt vọng quá", "Con bị bắt nạt"]
+    second = get_risk_alerts(level=None, before=first["next_before"], limit=2, current_teacher=None, db=db)
+    assert [item["content"] for item in second["items"]] == ["Con muốn tự tử"]
+    assert second["next_before"] is None and second["items"][0]["terms"] == ["tự tử"]
+    high = get_risk_alerts(level="high", before=None, limit=10, current_teacher=None, db=db)
+    assert len(high["items"]) == 1
@@ -0,0 +1,92 @@
+"""
+Test the Server-Timing header and the sampling profiler
+Uses a small FastAPI app - no server or database needed
+"""
+import os
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.timing import SamplingProfiler, ServerTimingMiddleware, stage
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @stage("auth")
+    def authenticate():
+        return "student"
+
+    @app.get("/reply")
+    def reply():
+        authenticate()
+        with stage("llm"):
+            time.sleep(0.03)
+        with stage("llm"):  # Repeated stages add up
+            time.sleep(0.01)
+        return {"ok": True}
+
+    return app
+
+
+def parse(header):
+    return {name: float(value.split("=")[1]) for name, value in (part.split(";") for part in header.split(", "))}
+
+
+def test_header_lists_stage_durations():
+    response = TestClient(make_app()).get("/reply")
+    timings = parse(response.headers["server-timing"])
+    assert list(timings) == ["auth", "llm", "total"]
+    assert 40 <= timings["llm"] <= timings["total"]
+
+    with stage("outside a request"):  # No-op without the middleware
+        pass
+
+
+def test_profiler_writes_collapsed_stacks_when_requested(tmp_path):
+    directory = str(tmp_path)
+    saved = (settings.PROFILER_HEADER_ENABLED, settings.PROFILER_DIR, settings.PROFILER_INTERVAL_MS)
+    settings.PROFILER_HEADER_ENABLED, settings.PROFILER_DIR, settings.PROFILER_INTERVAL_MS = True, directory, 1.0
+    try:
+        client = TestClient(make_app())
+        client.get("/reply")
+        assert os.listdir(directory) == []  # Not sampled, not forced
+        client.get("/reply", headers={"X-Profile": "1"})
+    finally:
+        settings.PROFILER_HEADER_ENABLED, settings.PROFILER_DIR, settings.PROFILER_INTERVAL_MS = saved
+
+    [profile] = os.listdir(directory)
+    assert "_GET_reply_" in profile and profile.endswith("ms.folded")
+    with open(os.path.join(directory, profile)) as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.startswith("llm;") for line in lines)
+    assert any("test_server_timing.py:reply" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_profile_is_finished_off_the_event_loop(tmp_path):
+    app = make_app()
+    threads = {}
+
+    @app.get("/loop")
+    async def loop():
+        threads["event loop"] = threading.get_ident()
+        return {"ok": True}
+
+    def stop(profiler):
+        threads["stop"] = threading.get_ident()
+        original_stop(profiler)
+
+    original_stop = SamplingProfiler.stop
+    saved = (settings.PROFILER_HEADER_ENABLED, settings.PROFILER_DIR)
+    settings.PROFILER_HEADER_ENABLED, settings.PROFILER_DIR = True, str(tmp_path)
+    SamplingProfiler.stop = stop
+    try:
+        assert TestClient(app).get("/loop", headers={"X-Profile": "1"}).status_code == 200
+    finally:
+        SamplingProfiler.stop = original_stop
+        settings.PROFILER_HEADER_ENABLED, settings.PROFILER_DIR = saved
+    assert threads["stop"] != threads["event loop"]  # Joining the sampler must not block other requests
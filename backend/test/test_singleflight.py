@@ -0,0 +1,110 @@
+"""
+Test single-flight coalescing of identical concurrent calls
+No server or API key needed
+"""
+import threading
+import time
+import unicodedata
+
+from prometheus_client import REGISTRY
+from app.utils.singleflight import SingleFlight, normalize_request_key
+
+FOLLOWERS = 4
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def run_concurrently(flight: SingleFlight, fn):
+    """Start a leader and FOLLOWERS callers on one key; returns (outcomes, threads) once all have joined the call"""
+    outcomes = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            outcome = flight.do("lịch thi", fn)
+        except Exception as e:
+            outcome = e
+        with lock:
+            outcomes.append(outcome)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    wait_until(lambda: flight.stats()["in_flight"] == 1)
+    followers = [threading.Thread(target=call) for _ in range(FOLLOWERS)]
+    for follower in followers:
+        follower.start()
+    wait_until(lambda: flight.coalesced == FOLLOWERS)
+    return outcomes, [leader] + followers
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight("test_result_flight")
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return ["chunk"]
+
+    outcomes, threads = run_concurrently(flight, fn)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(outcomes) == FOLLOWERS + 1
+    assert all(outcome is outcomes[0] for outcome in outcomes)  # The very same object
+
+
+def test_followers_receive_the_leaders_exception():
+    flight = SingleFlight("test_error_flight")
+    release = threading.Event()
+    error = TimeoutError("Gemini call exceeded 30s deadline")
+
+    def fn():
+        release.wait(5)
+        raise error
+
+    outcomes, threads = run_concurrently(flight, fn)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(outcomes) == FOLLOWERS + 1
+    assert all(outcome is error for outcome in outcomes)
+
+
+def test_key_is_released_after_completion():
+    flight = SingleFlight("test_release_flight")
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2  # Not cached: finished calls are not shared
+    try:
+        flight.do("k", lambda: 1 / 0)
+    except ZeroDivisionError:
+        pass
+    assert flight.do("k", lambda: 3) == 3  # A failure doesn't stick either
+    assert flight.stats() == {"executed": 4, "coalesced": 0, "in_flight": 0}
+
+
+def test_counters_and_metrics_count_hits_and_misses():
+    name = "test_counter_flight"
+    flight = SingleFlight(name)
+    release = threading.Event()
+    outcomes, threads = run_concurrently(flight, lambda: release.wait(5))
+    release.set()
+    for thread in threads:
+        thread.join()
+    flight.do("another key", lambda: None)
+
+    assert flight.stats() == {"executed": 2, "coalesced": FOLLOWERS, "in_flight": 0}
+    assert REGISTRY.get_sample_value("cache_lookups_total", {"cache": name, "result": "hit"}) == FOLLOWERS
+    assert REGISTRY.get_sample_value("cache_lookups_total", {"cache": name, "result": "miss"}) == 2
+
+
+def test_request_keys_ignore_case_spacing_and_punctuation():
+    assert normalize_request_key("  Lịch THI   học kỳ?? ") == "lịch thi học kỳ"
+    assert normalize_request_key(unicodedata.normalize("NFD", "Lịch thi")) == "lịch thi"
@@ -0,0 +1,43 @@
+"""
+Test that importing the app stays cheap
+Runs in a fresh interpreter without any API key - no server needed
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK = """
+import json, os, sys
+from app.main import app
+import app.services.gemini as gemini
+after_import = {
+    "heavy": [m for m in ("google.generativeai", "langchain", "PyPDF2", "tiktoken") if m in sys.modules],
+    "service_built": gemini._gemini_service is not None,
+    "db_created": os.path.exists("startup.db"),
+}
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    status = client.get("/").status_code
+    after_startup = {"status": status, "db_created": os.path.exists("startup.db")}
+print(json.dumps({"import": after_import, "startup": after_startup}))
+"""
+
+
+def test_import_builds_no_services_and_touches_no_database(tmp_path):
+    env = {
+        **os.environ,
+        "PYTHONPATH": BACKEND_DIR,
+        "DATABASE_URL": "sqlite:///./startup.db",
+        "SECRET_KEY": "test-secret",
+        "LLM_PROVIDER": "gemini",
+        "GEMINI_API_KEY": "",  # Would have raised at import before services were lazy
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", CHECK], cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result["import"] == {"heavy": [], "service_built": False, "db_created": False}
+    assert result["startup"] == {"status": 200, "db_created": True}
@@ -0,0 +1,91 @@
+"""
+Test rolling session summaries with the local stub summarizer
+Uses a temporary SQLite database - no server or API key needed
+"""
+from datetime import datetime, timedelta
+
+from app.models.models import ChatMessage, ChatSession, User
+from app.services.summary import StubSummarizer, SummaryService
+
+LAST_ACTIVE = datetime(2026, 10, 1, 8, 30)
+
+
+def new_chat(session_factory, message_count: int) -> int:
+    """Id of a new chat with message_count numbered messages"""
+    with session_factory() as db:
+        user = User(email="an@example.com", username="an", hashed_password="x")
+        db.add(user)
+        db.flush()
+        session = ChatSession(user_id=user.id, updated_at=LAST_ACTIVE)
+        db.add(session)
+        db.commit()
+        session_id = session.id
+    add_messages(session_factory, session_id, 0, message_count)
+    return session_id
+
+
+def add_messages(session_factory, session_id: int, start: int, count: int):
+    with session_factory() as db:
+        for n in range(start, start + count):
+            db.add(ChatMessage(
+                session_id=session_id,
+                role="user" if n % 2 == 0 else "assistant",
+                content=f"tin nhắn {n}",
+                created_at=LAST_ACTIVE - timedelta(hours=1) + timedelta(seconds=n)
+            ))
+        db.commit()
+
+
+def load(session_factory, session_id: int) -> ChatSession:
+    with session_factory() as db:
+        return db.get(ChatSession, session_id)
+
+
+def test_needs_update_once_enough_messages_leave_the_recent_window():
+    service = SummaryService(StubSummarizer(), every_n=4, recent=2)
+    assert not service.needs_update(5, 0)
+    assert service.needs_update(6, 0)
+    assert not service.needs_update(9, 4)
+    assert service.needs_update(10, 4)
+    assert service.needs_update(6, None)
+
+
+def test_summary_covers_older_messages_in_order_and_keeps_updated_at(session_factory):
+    session_id = new_chat(session_factory, 10)
+    stub = StubSummarizer()
+    service = SummaryService(stub, session_factory=session_factory, every_n=4, recent=2)
+
+    assert service.update_session_summary(session_id)
+    session = load(session_factory, session_id)
+    assert session.summary_message_count == 8
+    assert session.summary.splitlines() == [
+        f"{'user' if n % 2 == 0 else 'assistant'}: tin nhắn {n}" for n in range(8)
+    ]
+    assert session.updated_at == LAST_ACTIVE  # Session list order unchanged
+
+    add_messages(session_factory, session_id, 10, 3)
+    assert not service.update_session_summary(session_id)  # Only 3 new messages outside the window
+    add_messages(session_factory, session_id, 13, 1)
+    assert service.update_session_summary(session_id)
+    session = load(session_factory, session_id)
+    assert session.summary_message_count == 12
+    assert session.summary.splitlines()[-4:] == [
+        "user: tin nhắn 8", "assistant: tin nhắn 9", "user: tin nhắn 10", "assistant: tin nhắn 11"
+    ]
+    assert len(session.summary.splitlines()) == 12  # Previous summary carried over, nothing repeated
+    assert stub.calls == 2
+    assert session.updated_at == LAST_ACTIVE
+
+
+def test_failed_summary_keeps_the_previous_one(session_factory):
+    session_id = new_chat(session_factory, 10)
+    SummaryService(StubSummarizer(), session_factory=session_factory, every_n=4, recent=2).update_session_summary(session_id)
+    add_messages(session_factory, session_id, 10, 4)
+
+    def broken(previous_summary, messages):
+        raise RuntimeError("503 The service is currently unavailable.")
+
+    before = load(session_factory, session_id)
+    assert not SummaryService(broken, session_factory=session_factory, every_n=4, recent=2).update_session_summary(session_id)
+    after = load(session_factory, session_id)
+    assert (after.summary, after.summary_message_count) == (before.summary, 8)
@@ -0,0 +1,84 @@
+"""
+Test the built-in text splitters
+Parity with langchain's RecursiveCharacterTextSplitter (the splitter RAG
+used before) is checked on random inputs when langchain is installed.
+"""
+import random
+import unicodedata
+
+import pytest
+
+from app.services.text_splitter import (
+    DEFAULT_SEPARATORS,
+    RecursiveTextSplitter,
+    SentenceBoundary,
+    VietnameseTextSplitter
+)
+
+try:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+except ImportError:
+    RecursiveCharacterTextSplitter = None
+
+REGULATION = (
+    "Trường THPT ở TP. Hồ Chí Minh do ThS. Nguyễn V. An phụ trách. Con học lớp 12. "
+    "Cô nói: “Cố lên nhé!” Rồi sao? Thôi được... Hết v.v. và các mục khác.\n"
+    "Điều 5. Thí sinh phải có mặt.\n1. Mang thẻ.\nII. Quy định chung."
+)
+
+
+def test_recursive_splitter_keeps_langchain_chunks():
+    # Recorded from RecursiveCharacterTextSplitter(chunk_size=60, chunk_overlap=15, separators=DEFAULT_SEPARATORS)
+    assert RecursiveTextSplitter(60, 15).split_text(REGULATION) == [
+        "Trường THPT ở TP. Hồ Chí Minh do ThS. Nguyễn V. An phụ trách",
+        ". An phụ trách. Con học lớp 12",
+        ". Cô nói: “Cố lên nhé!” Rồi sao? Thôi được... Hết v.v",
+        ". Hết v.v. và các mục khác.",
+        "Điều 5. Thí sinh phải có mặt.\n1. Mang thẻ.",
+        "1. Mang thẻ.\nII. Quy định chung.",
+    ]
+
+
+def test_recursive_splitter_matches_langchain_on_random_text():
+    if RecursiveCharacterTextSplitter is None:
+        pytest.skip("langchain not installed")
+    rng = random.Random(3)
+    words = "học sinh thi lớp trường Điều 1 TP. Hồ Chí Minh quy chế điểm".split()
+    separators = ["\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", "  ", ""]
+    for _ in range(500):
+        text = "".join(rng.choice(words) + rng.choice(separators) for _ in range(rng.randint(0, 80)))
+        text += "x" * rng.randint(0, 60)
+        chunk_size = rng.randint(5, 120)
+        chunk_overlap = rng.randint(0, chunk_size)
+        reference = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=list(DEFAULT_SEPARATORS)
+        )
+        assert RecursiveTextSplitter(chunk_size, chunk_overlap).split_text(text) == reference.split_text(text)
+
+
+def test_sentence_boundaries_skip_abbreviations_and_list_markers():
+    assert [piece.strip() for piece in SentenceBoundary().split(REGULATION)] == [
+        "Trường THPT ở TP. Hồ Chí Minh do ThS. Nguyễn V. An phụ trách.",
+        "Con học lớp 12.",
+        "Cô nói: “Cố lên nhé!”",
+        "Rồi sao?",
+        "Thôi được...",
+        "Hết v.v. và các mục khác.",
+        "Điều 5. Thí sinh phải có mặt.",
+        "1. Mang thẻ.",
+        "II. Quy định chung.",
+    ]
+
+
+def test_vietnamese_splitter_chunks_end_at_sentences():
+    chunks = VietnameseTextSplitter(60, 15).split_text(REGULATION)
+    assert chunks[1] == "V. An phụ trách."
+    assert not any(chunk.startswith(".") for chunk in chunks)
+
+    decomposed = unicodedata.normalize("NFD", "Học sinh không được sử dụng điện thoại")
+    chunks = VietnameseTextSplitter(4, 0).split_text(decomposed.replace(" ", ""))
+    assert all(unicodedata.category(chunk[0]) != "Mn" for chunk in chunks)
+    assert "".join(chunks) == unicodedata.normalize("NFC", decomposed).replace(" ", "")
@@ -4,6 +4,14 @@ import { chatAPI } from '../services/api';
 import ReactMarkdown from 'react-markdown';
 import './Chat.css';
 
+const REPLY_FAILED_MESSAGE = `Ối, cô xin lỗi em! Có vẻ cô đang gặp chút vấn đề kỹ thuật. 😅
+
+Em thử hỏi lại câu hỏi một lần nữa nhé? Hoặc nếu vấn đề vẫn tiếp diễn, em có thể thử:
+- Làm mới trang và thử lại
+- Liên hệ với ban quản lý kỹ thuật
+
+Cô sẽ cố gắng hỗ trợ em tốt hơn! 💪`;
+
 function Chat() {
   const { user, logout } = useAuth();
   const [sessions, setSessions] = useState([]);
@@ -12,13 +20,24 @@ function Chat() {
   const [inputMessage, setInputMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const [sidebarOpen, setSidebarOpen] = useState(window.innerWidth > 768);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const messagesEndRef = useRef(null);
+  const messagesContainerRef = useRef(null);
+  const keepScrollRef = useRef(null);
 
   useEffect(() => {
     loadSessions();
   }, []);
 
   useEffect(() => {
+    // Older page prepended: keep the viewport on the same message
+    if (keepScrollRef.current !== null) {
+      const container = messagesContainerRef.current;
+      container.scrollTop = container.scrollHeight - keepScrollRef.current;
+      keepScrollRef.current = null;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -44,22 +63,45 @@ function Chat() {
     }
   };
 
-  const loadSession = async (sessionId) => {
+  const loadSession = async (session) => {
     try {
-      const response = await chatAPI.getSession(sessionId);
-      setCurrentSession(response.data);
-      setMessages(response.data.messages || []);
+      // Only the latest page; older messages load when scrolling up
+      const response = await chatAPI.getMessages(session.id);
+      setCurrentSession(session);
+      setMessages([...response.data.messages].reverse());
+      setOlderCursor(response.data.next_before);
     } catch (error) {
       console.error('Error loading session:', error);
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!olderCursor || loadingOlder || !currentSession) return;
+    setLoadingOlder(true);
+    try {
+      const response = await chatAPI.getMessages(currentSession.id, { before: olderCursor });
+      const container = messagesContainerRef.current;
+      keepScrollRef.current = container.scrollHeight - container.scrollTop;
+      setMessages((prev) => [...[...response.data.messages].reverse(), ...prev]);
+      setOlderCursor(response.data.next_before);
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  const handleMessagesScroll = (e) => {
+    if (e.target.scrollTop === 0) loadOlderMessages();
+  };
+
   const createNewChat = async () => {
     try {
       const response = await chatAPI.createSession({ title: 'Cuộc trò chuyện mới' });
       setSessions([response.data, ...sessions]);
       setCurrentSession(response.data);
       setMessages([]);
+      setOlderCursor(null);
     } catch (error) {
       console.error('Error creating session:', error);
     }
@@ -99,6 +141,20 @@ function Chat() {
       loadSessions();
     } catch (error) {
       console.error('Error sending message:', error);
+      if (error.response?.status === 429 && error.response.headers['x-message-saved'] !== 'true') {
+        // Throttled: nothing was saved, let the student resend the same text
+        setMessages((prev) => prev.filter((m) => m !== userMessage));
+        setInputMessage(userMessage.content);
+        const wait = error.response.headers['retry-after'] || 5;
+        window.alert(`Cô đang bận trả lời nhiều bạn, em đợi khoảng ${wait} giây rồi gửi lại nhé!`);
+      } else {
+        // Reply failed (the student's message is saved): show an apology that is not stored
+        setMessages((prev) => [...prev, {
+          role: 'assistant',
+          content: REPLY_FAILED_MESSAGE,
+          created_at: new Date().toISOString(),
+        }]);
+      }
     } finally {
       setLoading(false);
     }
@@ -112,6 +168,7 @@ function Chat() {
       if (currentSession?.id === sessionId) {
         setCurrentSession(null);
         setMessages([]);
+        setOlderCursor(null);
       }
     } catch (error) {
       console.error('Error deleting session:', error);
@@ -135,7 +192,7 @@ function Chat() {
             <div
               key={session.id}
               className={`session-item ${currentSession?.id === session.id ? 'active' : ''}`}
-              onClick={() => loadSession(session.id)}
+              onClick={() => loadSession(session)}
             >
               <div className="session-title">{session.title}</div>
               <div className="session-actions">
@@ -162,7 +219,9 @@ function Chat() {
           <h2>{currentSession?.title || 'Chatbot Tâm Lý Học Sinh'}</h2>
         </div>
 
-        <div className="messages-container">
+        <div className="messages-container" ref={messagesContainerRef} onScroll={handleMessagesScroll}>
+          {loadingOlder && <div className="loading-older">Đang tải tin nhắn cũ...</div>}
+
           {messages.length === 0 && !currentSession && (
             <div className="welcome-message">
               <h1>🎓 Chatbot Tâm Lý</h1>
@@ -171,7 +230,7 @@ function Chat() {
           )}
 
           {messages.map((message, index) => (
-            <div key={index} className={`message ${message.role}`}>
+            <div key={message.id || `pending-${index}`} className={`message ${message.role}`}>
               <div className="message-avatar">{message.role === 'user' ? '👤' : '🤖'}</div>
               <div className="message-content">
                 <ReactMarkdown>{message.content}</ReactMarkdown>
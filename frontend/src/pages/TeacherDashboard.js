@@ -4,26 +4,52 @@ import { teacherAPI, documentAPI } from '../services/api';
 import ReactMarkdown from 'react-markdown';
 import './TeacherDashboard.css';
 
+const STUDENTS_PAGE_SIZE = 50;
+const ALERTS_PAGE_SIZE = 50;
+const RISK_CATEGORY_LABELS = {
+  suicide: 'Tự tử',
+  self_harm: 'Tự hại',
+  abuse: 'Bạo hành / xâm hại',
+  bullying: 'Bắt nạt',
+  distress: 'Khủng hoảng cảm xúc',
+};
+
 function TeacherDashboard() {
   const { user, logout } = useAuth();
   const [students, setStudents] = useState([]);
+  const [studentsTotal, setStudentsTotal] = useState(0);
   const [selectedStudent, setSelectedStudent] = useState(null);
+  const [studentSessions, setStudentSessions] = useState([]);
   const [selectedSession, setSelectedSession] = useState(null);
   const [loading, setLoading] = useState(false);
   const [activeTab, setActiveTab] = useState('students');
   const [documents, setDocuments] = useState([]);
   const [uploadingDoc, setUploadingDoc] = useState(false);
+  const [alerts, setAlerts] = useState([]);
+  const [alertsCursor, setAlertsCursor] = useState(null);
 
   useEffect(() => {
-    loadStudentsHistory();
+    loadStudents();
     loadDocuments();
+    loadAlerts();
   }, []);
 
-  const loadStudentsHistory = async () => {
+  const loadAlerts = async (before = null) => {
+    try {
+      const response = await teacherAPI.getAlerts({ before, limit: ALERTS_PAGE_SIZE });
+      setAlerts(before ? [...alerts, ...response.data.items] : response.data.items);
+      setAlertsCursor(response.data.next_before);
+    } catch (error) {
+      console.error('Error loading alerts:', error);
+    }
+  };
+
+  const loadStudents = async (offset = 0) => {
     setLoading(true);
     try {
-      const response = await teacherAPI.getAllStudentsHistory();
-      setStudents(response.data);
+      const response = await teacherAPI.getStudentsOverview({ offset, limit: STUDENTS_PAGE_SIZE });
+      setStudents(offset === 0 ? response.data.items : [...students, ...response.data.items]);
+      setStudentsTotal(response.data.total);
     } catch (error) {
       console.error('Error loading students:', error);
     } finally {
@@ -31,6 +57,18 @@ function TeacherDashboard() {
     }
   };
 
+  const selectStudent = async (student) => {
+    setSelectedStudent(student);
+    setSelectedSession(null);
+    setStudentSessions([]);
+    try {
+      const response = await teacherAPI.getStudentSessions(student.user_id);
+      setStudentSessions(response.data);
+    } catch (error) {
+      console.error('Error loading student sessions:', error);
+    }
+  };
+
   const loadDocuments = async () => {
     try {
       const response = await documentAPI.getDocuments();
@@ -88,27 +126,65 @@ function TeacherDashboard() {
           <button className={`tab-btn ${activeTab === 'documents' ? 'active' : ''}`} onClick={() => setActiveTab('documents')}>
             📄 Tài Liệu
           </button>
+          <button className={`tab-btn ${activeTab === 'alerts' ? 'active' : ''}`} onClick={() => { setActiveTab('alerts'); loadAlerts(); }}>
+            🚨 Cảnh Báo
+          </button>
         </div>
 
         {activeTab === 'students' && (
           <div className="students-list">
-            {loading ? (
+            {loading && students.length === 0 ? (
               <div className="loading">Đang tải...</div>
             ) : (
               students.map((student) => (
                 <div
                   key={student.user_id}
                   className={`student-item ${selectedStudent?.user_id === student.user_id ? 'active' : ''}`}
-                  onClick={() => { setSelectedStudent(student); setSelectedSession(null); }}
+                  onClick={() => selectStudent(student)}
                 >
                   <div className="student-info">
                     <div className="student-name">{student.full_name || student.username}</div>
                     <div className="student-email">{student.email}</div>
                   </div>
-                  <div className="student-stats">{student.sessions.length} cuộc trò chuyện</div>
+                  <div className="student-stats">{student.session_count} cuộc trò chuyện</div>
                 </div>
               ))
             )}
+            {students.length < studentsTotal && (
+              <button className="load-more-btn" onClick={() => loadStudents(students.length)} disabled={loading}>
+                {loading ? 'Đang tải...' : 'Xem thêm'}
+              </button>
+            )}
+          </div>
+        )}
+
+        {activeTab === 'alerts' && (
+          <div className="students-list">
+            {alerts.length === 0 ? (
+              <p className="no-docs">Chưa có cảnh báo nào</p>
+            ) : (
+              alerts.map((alert) => (
+                <div
+                  key={alert.message_id}
+                  className={`student-item alert-item ${alert.risk_level} ${selectedSession?.id === alert.session_id ? 'active' : ''}`}
+                  onClick={() => viewSessionDetails(alert.session_id)}
+                >
+                  <div className="student-info">
+                    <div className="student-name">{alert.full_name || alert.username}</div>
+                    <div className="alert-categories">
+                      {alert.categories.map((category) => RISK_CATEGORY_LABELS[category] || category).join(', ')}
+                    </div>
+                  </div>
+                  <div className="alert-content">{alert.content}</div>
+                  <div className="student-stats">{new Date(alert.created_at).toLocaleString('vi-VN')}</div>
+                </div>
+              ))
+            )}
+            {alertsCursor && (
+              <button className="load-more-btn" onClick={() => loadAlerts(alertsCursor)}>
+                Xem thêm
+              </button>
+            )}
           </div>
         )}
 
@@ -156,6 +232,11 @@ function TeacherDashboard() {
             <h2>Chọn một học sinh để xem lịch sử trò chuyện</h2>
             <p>Danh sách học sinh được hiển thị ở bên trái</p>
           </div>
+        ) : activeTab === 'alerts' && !selectedSession ? (
+          <div className="empty-state">
+            <h2>🚨 Cảnh Báo Rủi Ro</h2>
+            <p>Tin nhắn của học sinh có dấu hiệu tự hại, bạo hành hoặc khủng hoảng. Chọn một cảnh báo để xem cuộc trò chuyện</p>
+          </div>
         ) : activeTab === 'documents' ? (
           <div className="empty-state">
             <h2>📚 Quản Lý Tài Liệu</h2>
@@ -187,18 +268,18 @@ function TeacherDashboard() {
         ) : (
           <div className="sessions-grid">
             <h2>Lịch sử trò chuyện của {selectedStudent.full_name || selectedStudent.username}</h2>
-            {selectedStudent.sessions.length === 0 ? (
+            {studentSessions.length === 0 ? (
               <p className="no-sessions">Học sinh chưa có cuộc trò chuyện nào</p>
             ) : (
               <div className="sessions-list-teacher">
-                {selectedStudent.sessions.map((session) => (
+                {studentSessions.map((session) => (
                   <div key={session.id} className="session-card" onClick={() => viewSessionDetails(session.id)}>
                     <div className="session-card-header">
                       <h3>{session.title}</h3>
                       <div className="session-card-date">{new Date(session.created_at).toLocaleDateString('vi-VN')}</div>
                     </div>
                     <div className="session-card-body">
-                      <div className="session-messages-count">{session.messages.length} tin nhắn</div>
+                      <div className="session-messages-count">{session.message_count} tin nhắn</div>
                       <div className="session-last-update">Cập nhật: {new Date(session.updated_at).toLocaleString('vi-VN')}</div>
                     </div>
                   </div>
@@ -23,14 +23,18 @@ export const chatAPI = {
   createSession: (data) => api.post('/api/chat/sessions', data),
   getSessions: () => api.get('/api/chat/sessions'),
   getSession: (sessionId) => api.get(`/api/chat/sessions/${sessionId}`),
+  getMessages: (sessionId, params) => api.get(`/api/chat/sessions/${sessionId}/messages`, { params }),
   sendMessage: (sessionId, message) => api.post(`/api/chat/sessions/${sessionId}/messages`, message),
   deleteSession: (sessionId) => api.delete(`/api/chat/sessions/${sessionId}`),
 };
 
 export const teacherAPI = {
   getAllStudentsHistory: () => api.get('/api/teacher/students'),
-  getStudentSessions: (studentId) => api.get(`/api/teacher/students/${studentId}/sessions`),
+  getStudentsOverview: (params) => api.get('/api/teacher/overview', { params }),
+  getStudentSessions: (studentId, params) => api.get(`/api/teacher/students/${studentId}/sessions`, { params }),
   getSessionDetails: (sessionId) => api.get(`/api/teacher/sessions/${sessionId}`),
+  searchMessages: (params) => api.get('/api/teacher/search', { params }),
+  getAlerts: (params) => api.get('/api/teacher/alerts', { params }),
 };
 
 export const documentAPI = {